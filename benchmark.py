@@ -0,0 +1,348 @@
+"""CSC111 Winter 2021 Project - benchmark.py
+
+OBJECTIVE: Measure graph construction, connectivity checks and pathfinding without starting the
+pygame window, on randomly generated maps of any size.
+
+Maps are generated with the same tile distribution main.py uses (by default, 20% obstacles and
+the rest split evenly between normal and slow tiles), from a fixed seed so runs are comparable.
+They are generated as one byte per tile (see mapfile.random_tiles), and maps with more than
+WEIGHTED_MAX_TILES tiles are benchmarked on a GridGraph unless a backend is given, so that even a
+4096x4096 map never creates a Python object per tile.
+Results are written as JSON: for every map and phase, the median and 95th percentile latency,
+the number of nodes expanded (for searches) and the peak memory allocated.
+
+The a_star_exits phase is a single A* search towards NUM_EXITS exits spread along the right edge of
+the map, using a ManhattanHeuristic table for all of them.
+
+The landmark_preprocessing and a_star_landmarks phases are skipped on maps with more than
+LANDMARK_MAX_VERTICES vertices, where choosing landmarks takes longer than the rest of the run.
+
+The contraction_query phase answers the same queries as the searches with a ContractionHierarchy,
+whose preprocessing is timed in contraction_preprocessing. Both are skipped on maps with more than
+CONTRACTION_MAX_VERTICES vertices, where preprocessing takes minutes.
+
+The a_star_time_sliced phase times every SearchTask.step call of an A* search limited to
+SLICE_EXPANSIONS expansions per call, which is the most a frame ever waits for a search.
+
+The swarm_step phase times SWARM_STEPS calls of swarm.Swarm.step, moving SWARM_UNITS units spawned
+at random locations connected to the goal. It is skipped on maps with more than
+SWARM_MAX_VERTICES vertices.
+
+Sample Usage (from the command line):
+    python benchmark.py --sizes 16x9 256x256 --densities 0.1 0.3 --output bench.json
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import vertex_graph
+from mapfile import TILE_TYPES, random_tiles
+from pathfinding import a_star_pathfinding, FlowField, SearchStats, SearchTask
+from heuristics import ManhattanHeuristic, LandmarkHeuristic
+from contraction import ContractionHierarchy
+from swarm import Swarm
+
+# The map sizes benchmarked when none are given. Sizes up to 4096x4096 may be given explicitly.
+DEFAULT_SIZES = [(16, 9), (64, 64), (256, 256)]
+
+# The largest number of tiles a map may have to be benchmarked on a WeightedGraph by default.
+WEIGHTED_MAX_TILES = 65536
+
+# The number of locations expanded per SearchTask.step call in the a_star_time_sliced phase.
+SLICE_EXPANSIONS = 256
+
+# The number of units moved, and the number of frames timed, in the swarm_step phase, and the
+# largest number of vertices a map may have for it to be run.
+SWARM_UNITS = 10000
+SWARM_STEPS = 60
+SWARM_MAX_VERTICES = 1000000
+
+# The number of exits searched for at once in the a_star_exits phase.
+NUM_EXITS = 8
+
+# The largest number of vertices a map may have for the landmark phases to be run.
+LANDMARK_MAX_VERTICES = 100000
+
+# The largest number of vertices a map may have for the contraction phases to be run.
+CONTRACTION_MAX_VERTICES = 100000
+
+
+def goal_location(width: int, height: int) -> Tuple[int, int]:
+    """Return the location of the goal on a generated width x height map: the middle of the right
+    edge, which is where main.py's goal is on its 16x9 map.
+    """
+    return (width - 1, height // 2)
+
+
+def generate_tiles(width: int, height: int, obstacle_density: float = 0.2,
+                   seed: int = 0) -> bytearray:
+    """Return the tile types of a randomly generated width x height game map, as in
+    mapfile.MapFile.tiles.
+
+    Each tile is an obstacle with probability obstacle_density, and otherwise normal or slow with
+    equal probability. The goal tile is placed at goal_location(width, height).
+
+    Preconditions:
+        - width > 0 and height > 0
+        - 0 <= obstacle_density < 1
+    """
+    return random_tiles(width, height, goal_location(width, height), random.Random(seed),
+                        obstacle_density)
+
+
+def generate_map(width: int, height: int, obstacle_density: float = 0.2,
+                 seed: int = 0) -> Dict[Tuple[int, int], str]:
+    """Return the map generated by generate_tiles as a dictionary representation,
+    in the same format main.py uses.
+
+    Preconditions:
+        - width > 0 and height > 0
+        - 0 <= obstacle_density < 1
+    """
+    tiles = generate_tiles(width, height, obstacle_density, seed)
+    return {(node // height, node % height): TILE_TYPES[code] for node, code in enumerate(tiles)}
+
+
+def run_benchmark(width: int, height: int, obstacle_density: float = 0.2, seed: int = 0,
+                  repeats: int = 5, queries: int = 20, backend: str = 'auto') -> Dict[str, Any]:
+    """Benchmark every phase on one generated map, and return the results.
+
+    Graph construction is timed repeats times. Connectivity checks and searches are timed once
+    for each of (up to) queries start locations, chosen at random among the tiles connected to
+    the goal.
+
+    backend is 'weighted' for WeightedGraph (dict_to_graph), 'grid' for GridGraph (built straight
+    from the tile bytes by bytes_to_grid_graph), or 'auto' for 'weighted' on maps with at most
+    WEIGHTED_MAX_TILES tiles and 'grid' otherwise.
+
+    Preconditions:
+        - backend in {'auto', 'weighted', 'grid'}
+        - repeats > 0 and queries > 0
+    """
+    if backend == 'auto':
+        backend = 'weighted' if width * height <= WEIGHTED_MAX_TILES else 'grid'
+    tiles = generate_tiles(width, height, obstacle_density, seed)
+    goal_loc = goal_location(width, height)
+    phases = {}
+
+    if backend == 'weighted':
+        build = vertex_graph.dict_to_graph
+        build_args = (generate_map(width, height, obstacle_density, seed),)
+    else:
+        build = vertex_graph.bytes_to_grid_graph
+        build_args = (width, height, tiles, TILE_TYPES)
+
+    # Graph construction
+    build_times = [_time_call(build, *build_args)[1] for _ in range(repeats)]
+    graph, build_memory = _peak_memory(build, *build_args)
+    phases['graph_construction'] = _summarise(build_times, build_memory)
+
+    # Connectivity: building the component index on the first call, then single queries.
+    _, first_time = _time_call(graph.connected, goal_loc, goal_loc)
+    phases['connectivity_index'] = _summarise([first_time], None)
+
+    # Start locations are picked from the tile bytes, rather than from a set of every vertex.
+    num_vertices = len(tiles) - tiles.count(TILE_TYPES.index('obstacle'))
+    candidates = _random_vertices(graph, width, height, queries, random.Random(seed))
+    phases['connectivity_check'] = _summarise(
+        [_time_call(graph.connected, loc, goal_loc)[1] for loc in candidates], None)
+
+    starts = [loc for loc in candidates if graph.connected(loc, goal_loc)]
+
+    # Heuristic preprocessing
+    manhattan, manhattan_time = _time_call(ManhattanHeuristic, graph, goal_loc)
+    phases['manhattan_preprocessing'] = _summarise([manhattan_time], None)
+    searches = [('dijkstra', True, None), ('a_star', False, None),
+                ('a_star_manhattan', False, manhattan)]
+    if num_vertices <= LANDMARK_MAX_VERTICES:
+        landmarks, landmark_time = _time_call(LandmarkHeuristic, graph, goal_loc)
+        phases['landmark_preprocessing'] = _summarise([landmark_time], None)
+        searches.append(('a_star_landmarks', False, landmarks))
+
+    # Searches, in both pathfinding modes and with each heuristic.
+    for phase, is_dstra, heuristic in searches:
+        times = []
+        all_stats = []
+        for start_loc in starts:
+            stats = SearchStats()
+            times.append(_time_call(a_star_pathfinding, graph, start_loc, is_dstra, stats,
+                                    None, None, 'auto', heuristic, goal_loc)[1])
+            all_stats.append(stats)
+
+        memory = _peak_memory(a_star_pathfinding, graph, starts[0], is_dstra, None,
+                              None, None, 'auto', heuristic, goal_loc)[1] \
+            if len(starts) > 0 else None
+        phases[phase] = _summarise(times, memory)
+        for counter in ('nodes_expanded', 'heap_pushes', 'stale_pops', 'peak_open_size'):
+            phases[phase][counter + '_median'] = \
+                _percentile([getattr(stats, counter) for stats in all_stats], 50) \
+                if len(all_stats) > 0 else None
+
+    # One search towards several exits (including the goal) along the right edge of the map.
+    exits = {(width - 1, height * i // NUM_EXITS) for i in range(NUM_EXITS)} | {goal_loc}
+    exits = {loc for loc in exits if graph.has_vertex(loc)}
+    exit_heuristic, exit_time = _time_call(ManhattanHeuristic, graph, exits)
+    phases['exits_preprocessing'] = _summarise([exit_time], None)
+    exit_stats = [SearchStats() for _ in starts]
+    phases['a_star_exits'] = _summarise(
+        [_time_call(a_star_pathfinding, graph, start_loc, False, stats,
+                    None, None, 'auto', exit_heuristic, exits)[1]
+         for start_loc, stats in zip(starts, exit_stats)], None)
+    phases['a_star_exits']['num_exits'] = len(exits)
+    phases['a_star_exits']['nodes_expanded_median'] = \
+        _percentile([stats.nodes_expanded for stats in exit_stats], 50) \
+        if len(exit_stats) > 0 else None
+
+    # Contraction hierarchy: preprocessing once, then the same queries as the searches above.
+    if num_vertices <= CONTRACTION_MAX_VERTICES:
+        hierarchy, contraction_time = _time_call(ContractionHierarchy, graph)
+        phases['contraction_preprocessing'] = _summarise([contraction_time], None)
+        phases['contraction_preprocessing']['num_shortcuts'] = hierarchy.num_shortcuts
+        phases['contraction_query'] = _summarise(
+            [_time_call(hierarchy.find_path, start_loc, goal_loc)[1] for start_loc in starts], None)
+
+    # Time-sliced A*: the latency of each step, rather than of each whole search.
+    slice_times = []
+    for start_loc in starts:
+        task = SearchTask(graph, start_loc, goal=goal_loc)
+        done = False
+        while not done:
+            done, step_time = _time_call(task.step, SLICE_EXPANSIONS)
+            slice_times.append(step_time)
+    phases['a_star_time_sliced'] = _summarise(slice_times, None)
+    phases['a_star_time_sliced']['max_ms'] = max(slice_times) if len(slice_times) > 0 else None
+
+    # Swarm: the time each frame takes to move SWARM_UNITS units along a flow field.
+    if num_vertices <= SWARM_MAX_VERTICES:
+        field = FlowField(graph, goal_loc)
+        swarm = Swarm(graph, field)
+        spawn_rng = random.Random(seed)
+        reachable = sorted(field.distance)
+        swarm.spawn_many(spawn_rng.choice(reachable) for _ in range(SWARM_UNITS))
+        num_units = len(swarm)
+        phases['swarm_step'] = _summarise([_time_call(swarm.step)[1]
+                                           for _ in range(SWARM_STEPS)], None)
+        phases['swarm_step']['num_units'] = num_units
+        phases['swarm_step']['units_remaining'] = len(swarm)
+
+    return {'width': width, 'height': height, 'obstacle_density': obstacle_density,
+            'seed': seed, 'backend': backend, 'num_vertices': num_vertices,
+            'num_queries': len(starts), 'phases': phases}
+
+
+def _random_vertices(graph: Union[vertex_graph.WeightedGraph, vertex_graph.GridGraph],
+                     width: int, height: int, count: int,
+                     rng: random.Random) -> List[Tuple[int, int]]:
+    """Return count random vertices of graph, a width x height map, picked with replacement.
+
+    Return fewer if count * 100 random locations include fewer vertices than that.
+    """
+    picked = []
+    for _ in range(count * 100):
+        if len(picked) == count:
+            break
+        loc = (rng.randrange(width), rng.randrange(height))
+        if graph.has_vertex(loc):
+            picked.append(loc)
+    return picked
+
+
+def _time_call(function: Callable, *args: Any) -> Tuple[Any, float]:
+    """Call function(*args), and return its return value and the time it took in milliseconds.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _peak_memory(function: Callable, *args: Any) -> Tuple[Any, int]:
+    """Call function(*args), and return its return value and the peak number of bytes
+    allocated while it ran.
+
+    This is a separate call from the timed ones, since tracing memory slows everything down.
+    """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Return the given percentile of values, using the nearest-rank method.
+
+    Preconditions:
+        - len(values) > 0
+        - 0 < percent <= 100
+    """
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def _summarise(times: List[float], peak_memory: Union[int, None]) -> Dict[str, Any]:
+    """Return the summary statistics recorded for one phase.
+    """
+    if len(times) == 0:
+        return {'samples': 0, 'median_ms': None, 'p95_ms': None, 'peak_memory_bytes': peak_memory}
+    return {'samples': len(times),
+            'median_ms': _percentile(times, 50),
+            'p95_ms': _percentile(times, 95),
+            'peak_memory_bytes': peak_memory}
+
+
+def _parse_size(text: str) -> Tuple[int, int]:
+    """Parse a map size given on the command line, such as '16x9'.
+    """
+    width, height = text.lower().split('x')
+    return (int(width), int(height))
+
+
+def main(argv: List[str]) -> None:
+    """Run the benchmarks described by the command line arguments argv.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark graph building and pathfinding.')
+    parser.add_argument('--sizes', nargs='+', type=_parse_size, default=DEFAULT_SIZES,
+                        help='map sizes as WIDTHxHEIGHT, from 16x9 up to 4096x4096')
+    parser.add_argument('--densities', nargs='+', type=float, default=[0.2],
+                        help='obstacle densities, between 0 and 1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='number of timed graph constructions per map')
+    parser.add_argument('--queries', type=int, default=20,
+                        help='number of start locations searched per map')
+    parser.add_argument('--backend', choices=['auto', 'weighted', 'grid'], default='auto',
+                        help=f'graph type (default: weighted up to {WEIGHTED_MAX_TILES} tiles, '
+                             f'and grid above)')
+    parser.add_argument('--output', help='JSON file to write results to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': []}
+
+    for width, height in args.sizes:
+        for density in args.densities:
+            report['results'].append(run_benchmark(width, height, density, args.seed,
+                                                   args.repeats, args.queries, args.backend))
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
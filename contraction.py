@@ -0,0 +1,361 @@
+"""CSC111 Winter 2021 Project - contraction.py
+
+OBJECTIVE: Define ContractionHierarchy, which answers many shortest path queries on a map that is
+not being edited much faster than a_star_pathfinding, after some preprocessing.
+
+Preprocessing "contracts" the locations of the graph one at a time, least important first.
+Contracting a location removes it from the graph, adding a shortcut edge between two of its
+neighbours wherever the only shortest path between them ran through it. The order locations were
+contracted in is their rank. Every shortest path then has a version which only climbs in rank up
+to its highest location and only descends after it, so a query is a bidirectional Dijkstra search
+that only follows edges to higher ranked locations, from both endpoints. Each shortcut remembers
+the location it skips, which is how a path of shortcuts is unpacked back into tiles.
+
+Editing a tile makes the hierarchy stale. A stale hierarchy is rebuilt before the next query,
+reusing the previous contraction order, which skips the work of choosing an order. In background
+mode it is instead rebuilt on a separate thread, and queries fall back to a_star_pathfinding until
+the new hierarchy is ready.
+
+Geisberger, Sanders, Schultes and Delling's paper "Contraction Hierarchies: Faster and Simpler
+Hierarchical Routing in Road Networks" (2008) was referred to during the implementation of this
+file.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import copy
+import math
+import queue
+import threading
+from heapq import heapify, heappush, heappop
+from typing import Tuple, List, Dict, Union, Optional
+import vertex_graph as vg
+from pathfinding import GOAL_LOC, a_star_pathfinding
+
+# Witness searches give up after settling this many locations, and add the shortcut instead.
+# Extra shortcuts never make queries wrong, only a little slower.
+_WITNESS_SETTLE_LIMIT = 64
+
+
+class ContractionHierarchy:
+    """A contraction hierarchy of a WeightedGraph or GridGraph, for fast shortest path queries.
+
+    Instance Attributes:
+        - graph: The graph the hierarchy is built on.
+        - version: The version of graph which the hierarchy was built for.
+        - background: Whether a stale hierarchy is rebuilt on a background thread, instead of
+                      before the next query.
+        - num_shortcuts: The number of shortcut edges added by contraction.
+        - rebuilds: The number of times the hierarchy has been rebuilt after edits.
+
+    Representation Invariants:
+        - len(self._locs) == len(self._up)
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    version: int
+    background: bool
+    num_shortcuts: int
+    rebuilds: int
+
+    # Private Instance Attributes:
+    #     - _locs: The location of every node, by node id. Node ids are only used internally.
+    #     - _ids: Maps every location to its node id.
+    #     - _up: The edges from each node to nodes of higher rank, as (node id, weight) pairs.
+    #     - _middle: Maps each shortcut (a, b), where a < b, to the node id it skips.
+    #     - _order: Every location, in the order it was contracted.
+    #     - _results: (version, contraction) pairs built by the background thread.
+    #     - _thread: The background thread currently rebuilding the hierarchy, if any.
+    _locs: List[Tuple[int, int]]
+    _ids: Dict[Tuple[int, int], int]
+    _up: List[List[Tuple[int, int]]]
+    _middle: Dict[Tuple[int, int], int]
+    _order: List[Tuple[int, int]]
+    _results: queue.Queue
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 background: bool = False) -> None:
+        """Build the contraction hierarchy of graph.
+
+        Preconditions:
+            - graph is a GridGraph, or a WeightedGraph built by dict_to_graph
+        """
+        self.graph = graph
+        self.background = background
+        self.rebuilds = 0
+        self._results = queue.Queue()
+        self._thread = None
+        self._install(graph.version, _contract(graph, None))
+
+    def is_stale(self) -> bool:
+        """Return whether self.graph was edited since the hierarchy was built.
+        """
+        return self.version != self.graph.version
+
+    def find_path(self, start_loc: Tuple[int, int],
+                  goal_loc: Tuple[int, int] = GOAL_LOC) -> Optional[List[Tuple[int, int]]]:
+        """Return a shortest path from start_loc to goal_loc, including both, in the same format
+        as pathfinding.a_star_pathfinding. Return None if there is no path.
+
+        A stale hierarchy is rebuilt first. In background mode, a rebuild is started instead
+        (if one is not already running), and the path is found by a_star_pathfinding.
+
+        Preconditions:
+            - self.graph.has_vertex(start_loc) and self.graph.has_vertex(goal_loc)
+        """
+        if self.is_stale():
+            if not self.background:
+                self.rebuild()
+            elif not self._poll():
+                return a_star_pathfinding(self.graph, start_loc, goal=goal_loc)
+
+        return self._query(self._ids[start_loc], self._ids[goal_loc])
+
+    def rebuild(self) -> None:
+        """Rebuild the hierarchy for the current version of self.graph, contracting locations in
+        the same order as before.
+        """
+        self._install(self.graph.version, _contract(self.graph, self._order))
+        self.rebuilds += 1
+
+    def close(self) -> None:
+        """Wait for the background thread to finish, if it is running.
+        """
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self) -> bool:
+        """Install the newest hierarchy built by the background thread if it is for the current
+        version of self.graph, and return whether the hierarchy is now up to date. Otherwise,
+        start a rebuild if none is running.
+        """
+        while True:
+            try:
+                version, contraction = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if version == self.graph.version:
+                self._install(version, contraction)
+                self.rebuilds += 1
+
+        if self._thread is not None and not self._thread.is_alive():
+            self._thread = None
+
+        if self.is_stale() and self._thread is None:
+            # The thread works on its own copy, since self.graph may be edited while it runs.
+            if isinstance(self.graph, vg.WeightedGraph):
+                replica = self.graph.to_grid_graph()
+            else:
+                replica = copy.deepcopy(self.graph)
+            version, order = self.graph.version, self._order
+            self._thread = threading.Thread(
+                target=lambda: self._results.put((version, _contract(replica, order))),
+                daemon=True)
+            self._thread.start()
+
+        return not self.is_stale()
+
+    def _install(self, version: int, contraction: tuple) -> None:
+        """Start using contraction, as returned by _contract, built for the given version of
+        self.graph.
+        """
+        self._locs, self._up, self._middle, self._order = contraction
+        self._ids = {loc: i for i, loc in enumerate(self._locs)}
+        self.num_shortcuts = len(self._middle)
+        self.version = version
+
+    def _query(self, source: int, target: int) -> Optional[List[Tuple[int, int]]]:
+        """Return a shortest path from the node source to the node target, as locations,
+        or None if there is none.
+        """
+        up = self._up
+        dist = ({source: 0}, {target: 0})
+        parent = ({source: None}, {target: None})
+        priorityqs = ([(0, source)], [(0, target)])
+        best_cost = math.inf
+        meeting = None
+
+        while len(priorityqs[0]) != 0 or len(priorityqs[1]) != 0:
+            if len(priorityqs[1]) == 0 or \
+                    (len(priorityqs[0]) != 0 and priorityqs[0][0][0] <= priorityqs[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            d, node = heappop(priorityqs[side])
+            if d > dist[side][node]:
+                continue  # Stale entry
+            if d >= best_cost:
+                # Nothing left on this side can lead to a cheaper path.
+                priorityqs[side].clear()
+                continue
+
+            other_dist = dist[1 - side].get(node)
+            if other_dist is not None and d + other_dist < best_cost:
+                best_cost = d + other_dist
+                meeting = node
+
+            for neighbour, weight in up[node]:
+                if d + weight < dist[side].get(neighbour, math.inf):
+                    dist[side][neighbour] = d + weight
+                    parent[side][neighbour] = node
+                    heappush(priorityqs[side], (d + weight, neighbour))
+
+        if meeting is None:
+            return None
+
+        # Join the two upward paths at meeting, then unpack every shortcut along the way.
+        nodes = [meeting]
+        while parent[0][nodes[-1]] is not None:
+            nodes.append(parent[0][nodes[-1]])
+        nodes.reverse()
+        while parent[1][nodes[-1]] is not None:
+            nodes.append(parent[1][nodes[-1]])
+
+        path = [self._locs[source]]
+        for i in range(len(nodes) - 1):
+            self._unpack(nodes[i], nodes[i + 1], path)
+        return path
+
+    def _unpack(self, a: int, b: int, path: List[Tuple[int, int]]) -> None:
+        """Append the locations of the path represented by the edge from node a to node b to
+        path, excluding a itself.
+        """
+        middle = self._middle
+        stack = [(a, b)]
+        while len(stack) != 0:
+            a, b = stack.pop()
+            skipped = middle.get((a, b) if a < b else (b, a))
+            if skipped is None:  # An edge of the graph itself
+                path.append(self._locs[b])
+            else:
+                stack.append((skipped, b))
+                stack.append((a, skipped))
+
+
+def _contract(graph: Union[vg.WeightedGraph, vg.GridGraph],
+              order: Optional[List[Tuple[int, int]]]) -> tuple:
+    """Contract every location of graph, and return (locations, upward edges, shortcut middles,
+    contraction order) as described in ContractionHierarchy.
+
+    If order is None, the next location contracted is always the one with the smallest edge
+    difference (shortcuts added minus edges removed) plus number of contracted neighbours, which
+    keeps the number of shortcuts low and spreads contraction evenly across the map. Otherwise,
+    locations are contracted in the given order, after any locations missing from it.
+    """
+    locs = sorted(graph.get_all_vertices())
+    ids = {loc: i for i, loc in enumerate(locs)}
+
+    # The edges between nodes not contracted yet, including shortcuts.
+    adjacent = [{} for _ in locs]
+    for i, loc in enumerate(locs):
+        for neighbour_loc, weight in graph.iter_edges(loc):
+            adjacent[i][ids[neighbour_loc]] = weight
+
+    up = [[] for _ in locs]
+    middle = {}
+    contracted_neighbours = [0] * len(locs)
+    contracted_order = []
+
+    def contract(node: int, shortcuts: List[Tuple[int, int, int]]) -> None:
+        for a, b, cost in shortcuts:
+            if cost < adjacent[a].get(b, math.inf):
+                adjacent[a][b] = adjacent[b][a] = cost
+                middle[(a, b) if a < b else (b, a)] = node
+        up[node] = list(adjacent[node].items())
+        for neighbour in adjacent[node]:
+            del adjacent[neighbour][node]
+            contracted_neighbours[neighbour] += 1
+        adjacent[node] = {}
+        contracted_order.append(locs[node])
+
+    if order is not None:
+        listed = [ids[loc] for loc in order if loc in ids]
+        missing = set(range(len(locs))).difference(listed)
+        for node in sorted(missing) + listed:
+            contract(node, _shortcuts(adjacent, node))
+    else:
+        def priority(node: int) -> Tuple[int, List[Tuple[int, int, int]]]:
+            shortcuts = _shortcuts(adjacent, node)
+            return (len(shortcuts) - len(adjacent[node]) + contracted_neighbours[node],
+                    shortcuts)
+
+        priorityq = [(priority(node)[0], node) for node in range(len(locs))]
+        heapify(priorityq)
+        done = [False] * len(locs)
+        while len(priorityq) != 0:
+            _, node = heappop(priorityq)
+            if done[node]:
+                continue
+            # Priorities go out of date as neighbours are contracted, so check again (lazily).
+            new_priority, shortcuts = priority(node)
+            if len(priorityq) != 0 and new_priority > priorityq[0][0]:
+                heappush(priorityq, (new_priority, node))
+                continue
+            contract(node, shortcuts)
+            done[node] = True
+
+    return locs, up, middle, contracted_order
+
+
+def _shortcuts(adjacent: List[Dict[int, int]], node: int) -> List[Tuple[int, int, int]]:
+    """Return the shortcuts (a, b, cost) needed to contract node: one for every pair of its
+    neighbours a < b whose shortest path (as far as a limited witness search can tell) runs
+    through node.
+    """
+    neighbours = sorted(adjacent[node].items())
+    shortcuts = []
+    for i in range(len(neighbours) - 1):
+        a, weight_a = neighbours[i]
+        targets = {b: weight_a + weight_b for b, weight_b in neighbours[i + 1:]}
+        witness = _witness_distances(adjacent, a, node, targets)
+        for b, cost in targets.items():
+            if witness.get(b, math.inf) > cost:
+                shortcuts.append((a, b, cost))
+    return shortcuts
+
+
+def _witness_distances(adjacent: List[Dict[int, int]], source: int, excluded: int,
+                       targets: Dict[int, int]) -> Dict[int, int]:
+    """Run Dijkstra's Algorithm from source without passing through excluded, until every node in
+    targets is settled, no path can be cheaper than the largest value in targets, or
+    _WITNESS_SETTLE_LIMIT nodes are settled.
+
+    Return the (possibly tentative) distances found. A tentative distance is still the cost of a
+    real path, so it never hides a shortcut that is needed.
+    """
+    max_cost = max(targets.values())
+    remaining = set(targets)
+    dist = {source: 0}
+    priorityq = [(0, source)]
+    settled = 0
+
+    while len(priorityq) != 0 and len(remaining) != 0 and settled < _WITNESS_SETTLE_LIMIT:
+        d, node = heappop(priorityq)
+        if d > dist[node]:
+            continue
+        if d > max_cost:
+            break
+        settled += 1
+        remaining.discard(node)
+
+        for neighbour, weight in adjacent[node].items():
+            if neighbour != excluded and d + weight < dist.get(neighbour, math.inf):
+                dist[neighbour] = d + weight
+                heappush(priorityq, (d + weight, neighbour))
+
+    return dist
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['copy', 'math', 'queue', 'threading', 'heapq', 'vertex_graph',
+                          'pathfinding'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,239 @@
+"""CSC111 Winter 2021 Project - frame_profiler.py
+
+OBJECTIVE: Define FrameProfiler, which times each phase of every frame of a game loop, for
+finding out what makes the frame rate drop.
+
+A frame is split into phases by calling mark at the end of each one, which costs a single clock
+read. The last FrameProfiler.window samples of each phase are kept for rolling percentiles (as
+shown on the HUD of main.py), and optionally every phase of the last trace_frames frames is kept,
+to be written out as a trace:
+    - a .json path is written in the Chrome trace event format, which chrome://tracing,
+      Perfetto (ui.perfetto.dev) and speedscope can open
+    - a .csv path is written as one row per phase of every frame
+
+Sample Usage:
+>>> profiler = FrameProfiler(trace_frames=100)
+>>> for _ in range(3):
+...     profiler.begin_frame()
+...     profiler.mark('events')
+...     profiler.mark('draw')
+...     profiler.end_frame()
+>>> profiler.phases
+['events', 'draw', 'frame']
+>>> profiler.frames
+3
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import csv
+import json
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+# The name of the phase covering a whole frame.
+FRAME = 'frame'
+
+
+class FrameProfiler:
+    """Rolling timings of each phase of a game loop's frames.
+
+    Every frame starts with begin_frame and finishes with end_frame. In between, mark(phase) ends
+    the named phase, which started at the previous mark (or at begin_frame). end_frame also
+    records the time of the whole frame, as the phase FRAME.
+
+    Instance Attributes:
+        - window: The number of most recent samples of each phase that percentiles are taken over.
+        - trace_frames: The number of most recent frames kept for write_trace, or 0 if no trace
+                        is kept.
+        - phases: The name of every phase seen so far, in the order they were first marked.
+        - frames: The number of frames finished so far.
+
+    Representation Invariants:
+        - self.window > 0
+        - self.trace_frames >= 0
+    """
+    window: int
+    trace_frames: int
+    phases: List[str]
+    frames: int
+
+    # Private Instance Attributes:
+    #     - _origin: The clock reading all trace timestamps are relative to.
+    #     - _frame_start: The clock reading at the last begin_frame.
+    #     - _last_mark: The clock reading at the last mark (or begin_frame).
+    #     - _current: The (phase, start, end) clock readings marked so far in this frame.
+    #     - _samples: Maps each phase to its most recent durations, in seconds.
+    #     - _trace: The (frame number, frame start, frame end, phases) of the most recent frames,
+    #               where phases is as in _current.
+    _origin: float
+    _frame_start: float
+    _last_mark: float
+    _current: List[Tuple[str, float, float]]
+    _samples: Dict[str, Deque[float]]
+    _trace: Deque[Tuple[int, float, float, List[Tuple[str, float, float]]]]
+
+    def __init__(self, window: int = 600, trace_frames: int = 0) -> None:
+        """Initialise a profiler with no frames, keeping window samples of each phase and
+        trace_frames frames for write_trace.
+
+        Preconditions:
+            - window > 0
+            - trace_frames >= 0
+        """
+        self.window = window
+        self.trace_frames = trace_frames
+        self.phases = []
+        self.frames = 0
+        self._origin = time.perf_counter()
+        self._frame_start = self._origin
+        self._last_mark = self._origin
+        self._current = []
+        self._samples = {}
+        self._trace = deque(maxlen=max(trace_frames, 1))
+
+    def begin_frame(self) -> None:
+        """Start a new frame, and its first phase.
+        """
+        self._frame_start = self._last_mark = time.perf_counter()
+        self._current = []
+
+    def mark(self, phase: str) -> None:
+        """End the named phase of this frame, and start the next one.
+        """
+        now = time.perf_counter()
+        self._current.append((phase, self._last_mark, now))
+        self._last_mark = now
+
+    def end_frame(self) -> None:
+        """Finish this frame, recording the duration of each of its phases and of the frame.
+        """
+        now = time.perf_counter()
+        for phase, start, end in self._current:
+            self._sample(phase, end - start)
+        self._sample(FRAME, now - self._frame_start)
+        if self.trace_frames > 0:
+            self._trace.append((self.frames, self._frame_start, now, self._current))
+        self.frames += 1
+
+    def last(self, phase: str) -> float:
+        """Return the most recent duration of phase, in milliseconds.
+
+        Preconditions:
+            - phase in self.phases
+        """
+        return self._samples[phase][-1] * 1000
+
+    def percentile(self, phase: str, percent: float) -> float:
+        """Return the given percentile of the recent durations of phase, in milliseconds,
+        using the nearest-rank method.
+
+        Preconditions:
+            - phase in self.phases
+            - 0 < percent <= 100
+
+        >>> profiler = FrameProfiler()
+        >>> for duration in [0.001, 0.004, 0.002, 0.003]:
+        ...     profiler._sample('draw', duration)
+        >>> round(profiler.percentile('draw', 50), 6)
+        2.0
+        >>> round(profiler.percentile('draw', 99), 6)
+        4.0
+        """
+        samples = sorted(self._samples[phase])
+        rank = -(-len(samples) * percent // 100)  # The ceiling of len(samples) * percent / 100
+        return samples[max(int(rank), 1) - 1] * 1000
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return the last, 50th and 99th percentile durations of every phase, in milliseconds.
+        """
+        return {phase: {'last': self.last(phase),
+                        'p50': self.percentile(phase, 50),
+                        'p99': self.percentile(phase, 99)}
+                for phase in self.phases}
+
+    def hud_lines(self) -> List[str]:
+        """Return the lines of text shown on the profiler HUD: the current frame time, then the
+        rolling 50th and 99th percentile durations of every phase.
+        """
+        if self.frames == 0:
+            return []
+        frame_time = self.last(FRAME)
+        lines = [f'frame {frame_time:6.2f} ms ({1000 / max(frame_time, 0.001):5.1f} fps)',
+                 f'{"phase":<8}{"p50":>7}{"p99":>7}']
+        for phase in self.phases:
+            lines.append(f'{phase:<8}{self.percentile(phase, 50):7.2f}'
+                         f'{self.percentile(phase, 99):7.2f}')
+        return lines
+
+    def write_trace(self, path: str) -> None:
+        """Write every phase of the kept frames to path: as CSV if path ends in '.csv', and in the
+        Chrome trace event format otherwise.
+        """
+        if path.lower().endswith('.csv'):
+            self._write_csv(path)
+        else:
+            self._write_chrome_trace(path)
+
+    def _write_chrome_trace(self, path: str) -> None:
+        """Write the kept frames to path in the Chrome trace event format.
+
+        Every frame and each of its phases is a complete ('X') event, with timestamps in
+        microseconds. Phases lie within their frame, so viewers nest them under it.
+        """
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 0, 'tid': 0,
+                   'args': {'name': 'game loop'}}]
+        origin = self._origin
+        for number, frame_start, frame_end, phases in self._traced_frames():
+            events.append({'name': FRAME, 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': round((frame_start - origin) * 1e6, 3),
+                           'dur': round((frame_end - frame_start) * 1e6, 3),
+                           'args': {'frame': number}})
+            for phase, start, end in phases:
+                events.append({'name': phase, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': round((start - origin) * 1e6, 3),
+                               'dur': round((end - start) * 1e6, 3)})
+
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+    def _write_csv(self, path: str) -> None:
+        """Write the kept frames to path as CSV, with one row per phase of every frame (and one
+        for the whole frame), with times in milliseconds.
+        """
+        origin = self._origin
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'phase', 'start_ms', 'duration_ms'])
+            for number, frame_start, frame_end, phases in self._traced_frames():
+                for phase, start, end in phases + [(FRAME, frame_start, frame_end)]:
+                    writer.writerow([number, phase, f'{(start - origin) * 1000:.4f}',
+                                     f'{(end - start) * 1000:.4f}'])
+
+    def _traced_frames(self) -> List[Tuple[int, float, float, List[Tuple[str, float, float]]]]:
+        """Return the kept frames, oldest first.
+        """
+        return list(self._trace) if self.trace_frames > 0 else []
+
+    def _sample(self, phase: str, duration: float) -> None:
+        """Record a duration of phase, in seconds.
+        """
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = deque(maxlen=self.window)
+            self.phases.append(phase)
+        samples.append(duration)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['csv', 'json', 'time', 'collections'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
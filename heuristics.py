@@ -0,0 +1,238 @@
+"""CSC111 Winter 2021 Project - heuristics.py
+
+OBJECTIVE: Define heuristic functions for pathfinding.a_star_pathfinding which are tighter than
+plain Euclidean distance, so that A* expands fewer locations.
+
+ManhattanHeuristic is a precomputed table of Manhattan distance to the goal (or to the nearest of
+several goals), scaled by the smallest edge weight. Since every step between adjacent tiles costs
+at least that much, it never overestimates.
+
+LandmarkHeuristic is the ALT heuristic (A*, Landmarks and the Triangle inequality): the exact
+distances from a few landmark tiles to every other tile are computed in advance, and for any
+location v, |d(L, goal) - d(L, v)| is a lower bound on the distance from v to the goal. The
+landmark distances are kept up to date across tile edits by one IncrementalPlanner per landmark.
+
+Both are callables taking a location, and are passed to a_star_pathfinding as its heuristic.
+
+Goldberg and Harrelson's paper "Computing the Shortest Path: A* Search Meets Graph Theory" (2005)
+was referred to during the implementation of LandmarkHeuristic.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from collections import deque
+from typing import Tuple, List, Dict, Union, FrozenSet
+import math
+import vertex_graph as vg
+from pathfinding import GOAL_LOC, Goals, goal_set
+from incremental import IncrementalPlanner
+
+
+class ManhattanHeuristic:
+    """Manhattan distance to the nearest goal, multiplied by the smallest edge weight of the graph.
+
+    Looking up a location costs the same however many goals there are, so a single
+    a_star_pathfinding search towards many goals is about as fast as one towards a single goal.
+
+    min_weight is read from the graph once, when the table is computed. A tile edit can add an
+    edge cheaper than that (such as the first normal-normal edge on a map of slow tiles), after
+    which this heuristic may overestimate: create a new ManhattanHeuristic whenever
+    graph.min_edge_weight() drops below min_weight. LandmarkHeuristic does this itself.
+
+    Instance Attributes:
+        - goals: The locations distances are measured to.
+        - min_weight: The smallest edge weight of the graph, which every step costs at least.
+        - integral: Whether every value of this heuristic is an integer.
+    """
+    goals: FrozenSet[Tuple[int, int]]
+    min_weight: Union[int, float]
+    integral: bool
+
+    # Private Instance Attributes:
+    #     - _table: The heuristic value of every vertex of the graph, when this was created.
+    _table: Dict[Tuple[int, int], Union[int, float]]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 goal_loc: Goals = GOAL_LOC) -> None:
+        """Precompute the heuristic value of every vertex in graph.
+
+        goal_loc is a single goal location or a collection of them, as in a_star_pathfinding.
+        With several goals, the Manhattan distance to the nearest one is found for every tile
+        by a single breadth-first search from all of the goals at once, over the whole tile
+        lattice (obstacles included).
+
+        Preconditions:
+            - graph was built by dict_to_graph or dict_to_grid_graph
+            - every goal location is on the map
+        """
+        self.goals = goal_set(goal_loc)
+        self.min_weight = graph.min_edge_weight()
+        self.integral = isinstance(self.min_weight, int)
+
+        if len(self.goals) == 1:
+            goal_x, goal_y = next(iter(self.goals))
+            self._table = {(x, y): self.min_weight * (abs(goal_x - x) + abs(goal_y - y))
+                           for x, y in graph.get_all_vertices()}
+            return
+
+        width, height = graph.get_dimension()
+        steps = {goal: 0 for goal in self.goals}
+        queue = deque(self.goals)
+        while len(queue) != 0:
+            loc = queue.popleft()
+            for neighbour in vg.lattice_neighbours(loc):
+                if neighbour not in steps and 0 <= neighbour[0] < width \
+                        and 0 <= neighbour[1] < height:
+                    steps[neighbour] = steps[loc] + 1
+                    queue.append(neighbour)
+
+        self._table = {loc: self.min_weight * steps[loc] for loc in graph.get_all_vertices()}
+
+    def __call__(self, loc: Tuple[int, int]) -> Union[int, float]:
+        """Return the estimated distance from loc to the nearest goal.
+
+        Locations which became vertices after the table was computed are worked out directly.
+        """
+        if loc in self._table:
+            return self._table[loc]
+        return self.min_weight * min(abs(goal_x - loc[0]) + abs(goal_y - loc[1])
+                                     for goal_x, goal_y in self.goals)
+
+
+class LandmarkHeuristic:
+    """The ALT heuristic for a single goal, which is never smaller than ManhattanHeuristic.
+
+    Landmarks are chosen by farthest-point selection: each new landmark is the location farthest
+    from all of the landmarks chosen before it, so that they end up spread around the edges of
+    the map. A landmark which becomes an obstacle is replaced by a newly chosen one.
+
+    Instance Attributes:
+        - graph: The graph the heuristic is for.
+        - goal_loc: The location distances are measured to.
+        - version: The version of graph which the landmark distances are up to date with.
+        - integral: Whether every value of this heuristic is an integer.
+
+    Representation Invariants:
+        - len(self._planners) == len(self._distances)
+        - all(self.goal_loc in distances for distances in self._distances)
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    goal_loc: Tuple[int, int]
+    version: int
+    integral: bool
+
+    # Private Instance Attributes:
+    #     - _num_landmarks: The number of landmarks to keep.
+    #     - _manhattan: The ManhattanHeuristic for goal_loc, which is the fallback lower bound.
+    #     - _planners: An IncrementalPlanner leading to each landmark.
+    #     - _distances: The distance from every location to each landmark,
+    #         as returned by _planners[i].compute_all().
+    #     - _cache: The heuristic values worked out since the last refresh.
+    _num_landmarks: int
+    _manhattan: ManhattanHeuristic
+    _planners: List[IncrementalPlanner]
+    _distances: List[Dict[Tuple[int, int], Union[int, float]]]
+    _cache: Dict[Tuple[int, int], Union[int, float]]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 goal_loc: Tuple[int, int] = GOAL_LOC, num_landmarks: int = 4) -> None:
+        """Choose the landmarks and compute their distances to every location.
+
+        Preconditions:
+            - graph.has_vertex(goal_loc)
+            - num_landmarks > 0
+        """
+        self.graph = graph
+        self.goal_loc = goal_loc
+        self._num_landmarks = num_landmarks
+        self._manhattan = ManhattanHeuristic(graph, goal_loc)
+        self.integral = self._manhattan.integral and graph.max_edge_weight() is not None
+        self._planners = []
+        self._distances = []
+        self._choose_landmarks()
+
+    @property
+    def landmarks(self) -> List[Tuple[int, int]]:
+        """The locations of the current landmarks."""
+        return [planner.goal_loc for planner in self._planners]
+
+    def __call__(self, loc: Tuple[int, int]) -> Union[int, float]:
+        """Return the estimated distance from loc to the goal.
+        """
+        if self.version != self.graph.version:
+            self.refresh()
+
+        if loc in self._cache:
+            return self._cache[loc]
+
+        estimate = self._manhattan(loc)
+        for distances in self._distances:
+            # Every landmark reaches the goal, but loc may be cut off from them.
+            if loc in distances:
+                estimate = max(estimate, abs(distances[self.goal_loc] - distances[loc]))
+        self._cache[loc] = estimate
+        return estimate
+
+    def refresh(self) -> None:
+        """Bring the landmark distances up to date with every edit made to self.graph.
+
+        Each landmark's IncrementalPlanner only repairs the distances that the edits changed.
+        Landmarks which became obstacles, or were cut off from the goal, are replaced. The
+        fallback ManhattanHeuristic is recomputed if an edit added an edge cheaper than its
+        min_weight, so that it never overestimates.
+        """
+        if self.graph.min_edge_weight() < self._manhattan.min_weight:
+            self._manhattan = ManhattanHeuristic(self.graph, self.goal_loc)
+            self.integral = self._manhattan.integral and self.graph.max_edge_weight() is not None
+
+        planners, self._planners, self._distances = self._planners, [], []
+        for planner in planners:
+            if self.graph.has_vertex(planner.goal_loc):
+                distances = planner.compute_all()
+                if self.goal_loc in distances:
+                    self._planners.append(planner)
+                    self._distances.append(distances)
+        self._choose_landmarks()
+
+    def _choose_landmarks(self) -> None:
+        """Add landmarks until there are self._num_landmarks of them (or every vertex is one),
+        then reset the cache.
+        """
+        if len(self._planners) == 0:
+            # Start from the location farthest from the goal.
+            self._add_landmark(self.goal_loc)
+            self._planners.pop()
+            seed_distances = self._distances.pop()
+            self._add_landmark(max(seed_distances, key=lambda loc: (seed_distances[loc], loc)))
+
+        while len(self._planners) < self._num_landmarks:
+            # Only locations connected to the goal are considered, since the first landmark is.
+            nearest = {loc: min(distances.get(loc, math.inf) for distances in self._distances)
+                       for loc in self._distances[0]}
+            farthest = max(nearest, key=lambda loc: (nearest[loc], loc))
+            if nearest[farthest] == 0:  # Every location is already a landmark
+                break
+            self._add_landmark(farthest)
+
+        self.version = self.graph.version
+        self._cache = {}
+
+    def _add_landmark(self, loc: Tuple[int, int]) -> None:
+        """Make loc a landmark, and compute its distance to every location.
+        """
+        planner = IncrementalPlanner(self.graph, loc)
+        self._planners.append(planner)
+        self._distances.append(planner.compute_all())
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['vertex_graph', 'pathfinding', 'incremental', 'math', 'collections'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
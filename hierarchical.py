@@ -0,0 +1,421 @@
+"""CSC111 Winter 2021 Project - hierarchical.py
+
+OBJECTIVE: Define HierarchicalGraph, which finds paths on large maps using hierarchical
+pathfinding (HPA*) instead of a flat search over every tile.
+
+The map is split into square clusters of tiles. Wherever two neighbouring clusters can be crossed
+between, one or two "entrance" tiles are picked on each side of their shared border. The entrances
+and the costs of travelling between entrances of the same cluster make up a much smaller abstract
+graph. A query searches the abstract graph, and then turns each step of the abstract path back
+into tiles with a small search restricted to a single cluster.
+
+That path is only allowed to cross between clusters at their entrances, which can make it a long
+detour. Unless refine=False is given, find_path then runs A* restricted to the corridor of
+clusters the path passes through, widened by _CORRIDOR_RADIUS clusters on every side, and returns
+the shortest path within the corridor instead. In randomised checks against
+pathfinding.a_star_pathfinding (30 seeds of 48x32, 40x40 and 64x24 maps, 20-30% obstacles, with
+cluster sizes 2, 3, 4, 8 and 16), unrefined paths cost up to 3.0 times the shortest path (and
+1.1 to 1.2 times on average), while refined paths cost at most 1.35 times the shortest path with
+clusters of 2 to 4 tiles, and 1.04 times with clusters of 8 or more (1.00 to 1.02 times on
+average). Neither is a guaranteed bound: a corridor can still miss a shorter route around a long
+wall. Refining is not free: on a 256x256 map with 16 tile clusters, it took find_path from about
+20 ms to about 70 ms per query, against about 150 ms for a_star_pathfinding.
+
+pathfinding.hierarchical_pathfinding is the entry point from pathfinding, which keeps one
+HierarchicalGraph per graph.
+
+Botea, Mueller and Schaeffer's paper "Near Optimal Hierarchical Path-Finding" (2004) was referred
+to during the implementation of this file.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import Tuple, List, Dict, Union, Optional, Set
+from heapq import heappush, heappop
+import vertex_graph as vg
+from pathfinding import GOAL_LOC
+
+# Entrances at least this many tiles wide get a transition at each end instead of one in the middle.
+_WIDE_ENTRANCE = 6
+
+# The number of clusters the refinement corridor extends past the clusters of the abstract path.
+_CORRIDOR_RADIUS = 1
+
+
+class HierarchicalGraph:
+    """An abstract graph of cluster entrances, built on top of a WeightedGraph or GridGraph.
+
+    After the underlying graph is edited with set_tile, find_path calls refresh, which rebuilds
+    only the clusters whose tiles (or borders) were edited.
+
+    Instance Attributes:
+        - graph: The underlying graph.
+        - cluster_size: The width and height, in tiles, of every cluster.
+        - version: The version of graph which the abstract graph is up to date with.
+
+    Representation Invariants:
+        - self.cluster_size > 0
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    cluster_size: int
+    version: int
+
+    # Private Instance Attributes:
+    #     - _dimension: The (width, height) of the tile map.
+    #     - _borders: Maps each pair of neighbouring clusters (c1, c2), where c1 < c2, to the
+    #         transitions between them. Each transition is a pair of adjacent tiles (a, b),
+    #         where a is in c1 and b is in c2.
+    #     - _intra: Maps each cluster to the shortest distances between its entrance tiles,
+    #         travelling only inside the cluster.
+    #     - _crossings: Maps each entrance tile to the tiles across its borders and the edge
+    #         weights, gathered from _borders. None when it needs to be gathered again.
+    _dimension: Tuple[int, int]
+    _borders: Dict[Tuple[Tuple[int, int], Tuple[int, int]], List[Tuple[Tuple[int, int],
+                                                                     Tuple[int, int]]]]
+    _intra: Dict[Tuple[int, int], Dict[Tuple[int, int], Dict[Tuple[int, int], int]]]
+    _crossings: Optional[Dict[Tuple[int, int], List[Tuple[Tuple[int, int], int]]]]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 cluster_size: int = 16) -> None:
+        """Build the abstract graph for every cluster of the given graph.
+
+        Preconditions:
+            - cluster_size > 0
+            - graph is a GridGraph, or a WeightedGraph built by dict_to_graph
+        """
+        self.graph = graph
+        self.cluster_size = cluster_size
+        self._rebuild_all()
+
+    def find_path(self, start_loc: Tuple[int, int], goal_loc: Tuple[int, int] = GOAL_LOC,
+                  refine: bool = True) -> Optional[List[Tuple[int, int]]]:
+        """Return a path from start_loc to goal_loc, including both, in the same format as
+        pathfinding.a_star_pathfinding. Return None if there is no path.
+
+        When refine is True, the path is shortened by an A* search restricted to the corridor
+        of clusters around it (see the module docstring).
+
+        Preconditions:
+            - self.graph.has_vertex(start_loc) and self.graph.has_vertex(goal_loc)
+        """
+        self.refresh()
+
+        start_cluster = self.cluster_of(start_loc)
+        goal_cluster = self.cluster_of(goal_loc)
+
+        # Temporary abstract edges from start_loc, and into goal_loc, within their clusters.
+        start_edges = self._cluster_distances(start_loc, self._entrances(start_cluster))
+        goal_edges = self._cluster_distances(goal_loc, self._entrances(goal_cluster))
+        if start_cluster == goal_cluster:
+            direct = self._cluster_distances(start_loc, {goal_loc})
+            if goal_loc in direct:
+                start_edges[goal_loc] = direct[goal_loc]
+
+        abstract_path = self._abstract_search(start_loc, goal_loc, start_edges, goal_edges)
+        if abstract_path is None:
+            return None
+
+        # Refine each step of the abstract path into tiles.
+        full_path = [start_loc]
+        for i in range(len(abstract_path) - 1):
+            a, b = abstract_path[i], abstract_path[i + 1]
+            if self.cluster_of(a) != self.cluster_of(b):  # An inter-cluster transition
+                full_path.append(b)
+            elif a != b:
+                full_path.extend(self._cluster_path(a, b)[1:])
+
+        if not refine:
+            return full_path
+        return self._corridor_path(start_loc, goal_loc, self._corridor(full_path))
+
+    def refresh(self) -> None:
+        """Bring the abstract graph up to date with every edit made to self.graph.
+
+        For each edited tile, the borders it lies on are recomputed, followed by the
+        intra-cluster distances of every cluster touching those borders.
+        """
+        if self.version == self.graph.version:
+            return
+
+        changed = self.graph.changes_since(self.version)
+        if changed is None or self.graph.get_dimension() != self._dimension:
+            self._rebuild_all()
+            return
+
+        dirty_clusters = set()
+        for loc in changed:
+            cluster = self.cluster_of(loc)
+            dirty_clusters.add(cluster)
+            for neighbour in vg.lattice_neighbours(loc):
+                neighbour_cluster = self.cluster_of(neighbour)
+                if neighbour_cluster != cluster and self._in_map(neighbour):
+                    self._build_border(min(cluster, neighbour_cluster),
+                                       max(cluster, neighbour_cluster))
+                    dirty_clusters.add(neighbour_cluster)
+
+        for cluster in dirty_clusters:
+            self._build_intra(cluster)
+
+        self.version = self.graph.version
+
+    def cluster_of(self, loc: Tuple[int, int]) -> Tuple[int, int]:
+        """Return the (column, row) of the cluster containing loc.
+        """
+        return (loc[0] // self.cluster_size, loc[1] // self.cluster_size)
+
+    def num_abstract_nodes(self) -> int:
+        """Return the number of entrance tiles in the abstract graph.
+        """
+        return sum(len(nodes) for nodes in self._intra.values())
+
+    def _rebuild_all(self) -> None:
+        """Rebuild every border and every cluster from scratch.
+        """
+        self._dimension = self.graph.get_dimension()
+        self.version = self.graph.version
+        self._borders = {}
+        self._intra = {}
+        self._crossings = None
+
+        columns = -(-self._dimension[0] // self.cluster_size)
+        rows = -(-self._dimension[1] // self.cluster_size)
+        for cx in range(columns):
+            for cy in range(rows):
+                if cx + 1 < columns:
+                    self._build_border((cx, cy), (cx + 1, cy))
+                if cy + 1 < rows:
+                    self._build_border((cx, cy), (cx, cy + 1))
+
+        for cx in range(columns):
+            for cy in range(rows):
+                self._build_intra((cx, cy))
+
+    def _build_border(self, c1: Tuple[int, int], c2: Tuple[int, int]) -> None:
+        """Recompute the transitions between neighbouring clusters c1 and c2.
+
+        Each maximal run of crossable tile pairs along the border is one entrance.
+        Narrow entrances get one transition in the middle, and wide ones get one at each end.
+
+        Preconditions:
+            - c1 < c2, and c1 and c2 are horizontally or vertically adjacent
+        """
+        size = self.cluster_size
+        if c1[0] != c2[0]:  # c2 is to the right of c1
+            x = c2[0] * size
+            pairs = [((x - 1, y), (x, y))
+                     for y in range(c1[1] * size, min((c1[1] + 1) * size, self._dimension[1]))]
+        else:  # c2 is below c1
+            y = c2[1] * size
+            pairs = [((x, y - 1), (x, y))
+                     for x in range(c1[0] * size, min((c1[0] + 1) * size, self._dimension[0]))]
+
+        transitions = []
+        run = []
+        for a, b in pairs + [(None, None)]:  # The sentinel ends the final run
+            if a is not None and self.graph.has_vertex(a) and self.graph.has_vertex(b):
+                run.append((a, b))
+            elif len(run) > 0:
+                if len(run) >= _WIDE_ENTRANCE:
+                    transitions.extend([run[0], run[-1]])
+                else:
+                    transitions.append(run[len(run) // 2])
+                run = []
+
+        self._borders[(c1, c2)] = transitions
+        self._crossings = None
+
+    def _build_intra(self, cluster: Tuple[int, int]) -> None:
+        """Recompute the distances between the entrance tiles of cluster.
+        """
+        entrances = self._entrances(cluster)
+        self._intra[cluster] = {loc: self._cluster_distances(loc, entrances - {loc})
+                                for loc in entrances}
+
+    def _entrances(self, cluster: Tuple[int, int]) -> Set[Tuple[int, int]]:
+        """Return the set of entrance tiles in cluster, from all of its borders.
+        """
+        cx, cy = cluster
+        entrances = set()
+        for c1, c2, side in (((cx - 1, cy), cluster, 1), ((cx, cy - 1), cluster, 1),
+                             (cluster, (cx + 1, cy), 0), (cluster, (cx, cy + 1), 0)):
+            for transition in self._borders.get((c1, c2), []):
+                entrances.add(transition[side])
+        return entrances
+
+    def _abstract_search(self, start_loc: Tuple[int, int], goal_loc: Tuple[int, int],
+                         start_edges: Dict[Tuple[int, int], int],
+                         goal_edges: Dict[Tuple[int, int], int]) \
+            -> Optional[List[Tuple[int, int]]]:
+        """Return the shortest path from start_loc to goal_loc through the abstract graph,
+        with start_loc and goal_loc temporarily joined to it by start_edges and goal_edges.
+
+        goal_edges maps entrance tiles in goal_loc's cluster to their distance from goal_loc.
+        The heuristic is 2 (the cheapest edge weight) times the Manhattan distance.
+        """
+        if self._crossings is None:
+            self._crossings = {}
+            for transitions in self._borders.values():
+                for a, b in transitions:
+                    weight = self.graph.get_weight(a, b)
+                    self._crossings.setdefault(a, []).append((b, weight))
+                    self._crossings.setdefault(b, []).append((a, weight))
+        crossings = self._crossings
+
+        priorityq = [(0, start_loc)]
+        came_from = {start_loc: None}
+        cost_to_loc = {start_loc: 0}
+        done = set()
+
+        while len(priorityq) != 0:
+            current_loc = heappop(priorityq)[1]
+            if current_loc in done:
+                continue
+            done.add(current_loc)
+
+            if current_loc == goal_loc:
+                path = [goal_loc]
+                while came_from[path[-1]] is not None:
+                    path.append(came_from[path[-1]])
+                path.reverse()
+                return path
+
+            # start_loc and goal_loc may themselves be entrance tiles, so check every kind of edge.
+            edges = list(self._intra[self.cluster_of(current_loc)].get(current_loc, {}).items()) \
+                + crossings.get(current_loc, [])
+            if current_loc == start_loc:
+                edges.extend(start_edges.items())
+            if current_loc in goal_edges:
+                edges.append((goal_loc, goal_edges[current_loc]))
+
+            for neighbour_loc, weight in edges:
+                cost = cost_to_loc[current_loc] + weight
+                if neighbour_loc not in cost_to_loc or cost < cost_to_loc[neighbour_loc]:
+                    cost_to_loc[neighbour_loc] = cost
+                    came_from[neighbour_loc] = current_loc
+                    heuristic = 2 * (abs(goal_loc[0] - neighbour_loc[0])
+                                     + abs(goal_loc[1] - neighbour_loc[1]))
+                    heappush(priorityq, (cost + heuristic, neighbour_loc))
+
+        return None
+
+    def _cluster_distances(self, source: Tuple[int, int],
+                           targets: Set[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
+        """Return the shortest distances from source to each of targets that can be reached
+        without leaving source's cluster.
+        """
+        dist, _ = self._cluster_dijkstra(source, targets)
+        return {loc: dist[loc] for loc in targets if loc in dist}
+
+    def _cluster_path(self, source: Tuple[int, int],
+                      target: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Return a shortest path from source to target without leaving their cluster.
+
+        Preconditions:
+            - self.cluster_of(source) == self.cluster_of(target)
+            - target can be reached from source within their cluster
+        """
+        _, came_from = self._cluster_dijkstra(source, {target})
+        path = [target]
+        while came_from[path[-1]] is not None:
+            path.append(came_from[path[-1]])
+        path.reverse()
+        return path
+
+    def _cluster_dijkstra(self, source: Tuple[int, int], targets: Set[Tuple[int, int]]) \
+            -> Tuple[Dict[Tuple[int, int], int], Dict[Tuple[int, int], Optional[Tuple[int, int]]]]:
+        """Run Dijkstra's Algorithm from source, restricted to source's cluster, until every
+        location in targets has been finalised.
+
+        Return the distances and came_from dictionary of the search.
+        """
+        cluster = self.cluster_of(source)
+        dist = {source: 0}
+        came_from = {source: None}
+        remaining = set(targets)
+        priorityq = [(0, source)]
+        done = set()
+
+        while len(priorityq) != 0 and len(remaining) != 0:
+            d, current_loc = heappop(priorityq)
+            if current_loc in done:
+                continue
+            done.add(current_loc)
+            remaining.discard(current_loc)
+
+            for neighbour_loc, weight in self.graph.iter_edges(current_loc):
+                if self.cluster_of(neighbour_loc) == cluster and \
+                        (neighbour_loc not in dist or d + weight < dist[neighbour_loc]):
+                    dist[neighbour_loc] = d + weight
+                    came_from[neighbour_loc] = current_loc
+                    heappush(priorityq, (d + weight, neighbour_loc))
+
+        return dist, came_from
+
+    def _corridor(self, path: List[Tuple[int, int]]) -> Set[Tuple[int, int]]:
+        """Return the clusters within _CORRIDOR_RADIUS clusters of any location on path.
+        """
+        radius = _CORRIDOR_RADIUS
+        corridor = set()
+        for cx, cy in {self.cluster_of(loc) for loc in path}:
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    corridor.add((cx + dx, cy + dy))
+        return corridor
+
+    def _corridor_path(self, start_loc: Tuple[int, int], goal_loc: Tuple[int, int],
+                       corridor: Set[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Return a shortest path from start_loc to goal_loc which only passes through tiles in
+        the given clusters, found by A* with the Manhattan distance times the smallest edge
+        weight as its heuristic.
+
+        Preconditions:
+            - some path from start_loc to goal_loc lies within corridor
+        """
+        min_weight = self.graph.min_edge_weight()
+        goal_x, goal_y = goal_loc
+        priorityq = [(0, start_loc)]
+        came_from = {start_loc: None}
+        cost_to_loc = {start_loc: 0}
+        done = set()
+
+        while len(priorityq) != 0:
+            current_loc = heappop(priorityq)[1]
+            if current_loc == goal_loc:
+                break
+            if current_loc in done:
+                continue
+            done.add(current_loc)
+
+            for neighbour_loc, weight in self.graph.iter_edges(current_loc):
+                cost = cost_to_loc[current_loc] + weight
+                if self.cluster_of(neighbour_loc) in corridor and \
+                        (neighbour_loc not in cost_to_loc or cost < cost_to_loc[neighbour_loc]):
+                    cost_to_loc[neighbour_loc] = cost
+                    came_from[neighbour_loc] = current_loc
+                    heuristic = min_weight * (abs(goal_x - neighbour_loc[0])
+                                              + abs(goal_y - neighbour_loc[1]))
+                    heappush(priorityq, (cost + heuristic, neighbour_loc))
+
+        path = [goal_loc]
+        while came_from[path[-1]] is not None:
+            path.append(came_from[path[-1]])
+        path.reverse()
+        return path
+
+    def _in_map(self, loc: Tuple[int, int]) -> bool:
+        """Return whether loc lies on the tile map.
+        """
+        return 0 <= loc[0] < self._dimension[0] and 0 <= loc[1] < self._dimension[1]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['vertex_graph', 'pathfinding', 'heapq'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,218 @@
+"""CSC111 Winter 2021 Project - incremental.py
+
+OBJECTIVE: Define IncrementalPlanner, which keeps shortest paths to a goal up to date across
+tile edits by repairing its previous search instead of starting over.
+
+The planner runs Lifelong Planning A* (LPA*) backwards from the goal, with a heuristic of 0 so
+that the same search can serve every start location, as in D* Lite. After tiles are edited with
+set_tile, only the edited tiles and their neighbours are re-examined, and the repair spreads only
+as far as distances actually changed.
+
+Koenig, Likhachev and Furcy's paper "Lifelong Planning A*" (2004) was referred to during the
+implementation of this file.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import Tuple, List, Dict, Union, Optional
+from heapq import heappush, heappop
+import math
+import vertex_graph as vg
+from pathfinding import GOAL_LOC
+
+
+class IncrementalPlanner:
+    """Shortest distances and next steps from any location to a single goal, which are repaired
+    incrementally after the graph is edited.
+
+    It can be used wherever a pathfinding.FlowField is used, through next_loc and path_from.
+    Distances are only computed as far as the queries so far have needed.
+
+    Instance Attributes:
+        - graph: The graph being planned on.
+        - goal_loc: The location every path leads to.
+        - version: The version of graph which the search state is up to date with.
+        - expansions: The total number of locations expanded so far, across all repairs.
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    goal_loc: Tuple[int, int]
+    version: int
+    expansions: int
+
+    # Private Instance Attributes:
+    #     - _g: The current distance estimate to goal_loc of each location. Missing means infinity.
+    #     - _rhs: The one-step lookahead distance of each location: the smallest g + edge weight
+    #         over its neighbours. Missing means infinity.
+    #     - _queue: A priority queue of (key, location) for locations whose g and rhs differ.
+    #         Entries whose key no longer matches _queued are stale and skipped.
+    #     - _queued: Maps each location in _queue to its current key.
+    _g: Dict[Tuple[int, int], float]
+    _rhs: Dict[Tuple[int, int], float]
+    _queue: List[Tuple[float, Tuple[int, int]]]
+    _queued: Dict[Tuple[int, int], float]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 goal_loc: Tuple[int, int] = GOAL_LOC) -> None:
+        """Initialise the planner. No search is done until the first query.
+
+        Preconditions:
+            - graph.has_vertex(goal_loc)
+        """
+        self.graph = graph
+        self.goal_loc = goal_loc
+        self.expansions = 0
+        self._reset()
+
+    def refresh(self) -> None:
+        """Bring the search state up to date with every edit made to self.graph.
+
+        Each edited tile and its neighbours have their lookahead distance recomputed, which puts
+        the ones whose distance may have changed back into the queue. The actual repair happens
+        lazily, during the next query.
+        """
+        if self.version == self.graph.version:
+            return
+
+        changed = self.graph.changes_since(self.version)
+        if changed is None:
+            self._reset()
+            return
+
+        for loc in changed:
+            if self.graph.has_vertex(loc):
+                self._update_vertex(loc)
+            else:  # loc became an obstacle, so it is no longer part of any path
+                self._g.pop(loc, None)
+                self._rhs.pop(loc, None)
+                self._queued.pop(loc, None)
+
+            for neighbour in vg.lattice_neighbours(loc):
+                if self.graph.has_vertex(neighbour):
+                    self._update_vertex(neighbour)
+
+        self.version = self.graph.version
+
+    def distance(self, loc: Tuple[int, int]) -> Optional[float]:
+        """Return the shortest distance from loc to the goal, or None if loc cannot reach it.
+
+        Preconditions:
+            - self.graph.has_vertex(loc)
+        """
+        self.refresh()
+        self._compute(loc)
+        if self._g.get(loc, math.inf) == math.inf:
+            return None
+        return self._g[loc]
+
+    def next_loc(self, loc: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Return the next location on a shortest path from loc to the goal.
+
+        Return None if loc is the goal, or is not connected to the goal.
+        """
+        self.refresh()
+        if loc == self.goal_loc or not self.graph.has_vertex(loc):
+            return None
+
+        self._compute(loc)
+        if self._g.get(loc, math.inf) == math.inf:
+            return None
+
+        best_loc, best_cost = None, math.inf
+        for neighbour_loc, weight in self.graph.iter_edges(loc):
+            cost = self._g.get(neighbour_loc, math.inf) + weight
+            if cost < best_cost:
+                best_loc, best_cost = neighbour_loc, cost
+        return best_loc
+
+    def path_from(self, loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Return a shortest path from loc to the goal, including both endpoints,
+        in the same format as pathfinding.a_star_pathfinding.
+
+        Return an empty list if loc is not connected to the goal.
+        """
+        if loc != self.goal_loc and self.next_loc(loc) is None:
+            return []
+
+        full_path = [loc]
+        while full_path[-1] != self.goal_loc:
+            full_path.append(self.next_loc(full_path[-1]))
+        return full_path
+
+    def compute_all(self) -> Dict[Tuple[int, int], float]:
+        """Finish the search over every location connected to the goal, and return the
+        distance of each one from the goal.
+        """
+        self.refresh()
+        self._compute(None)
+        return {loc: dist for loc, dist in self._g.items() if dist != math.inf}
+
+    def _reset(self) -> None:
+        """Throw away all search state, and start again from just the goal.
+        """
+        self.version = self.graph.version
+        self._g = {}
+        self._rhs = {self.goal_loc: 0}
+        self._queue = [(0, self.goal_loc)]
+        self._queued = {self.goal_loc: 0}
+
+    def _update_vertex(self, loc: Tuple[int, int]) -> None:
+        """Recompute the lookahead distance of loc, and queue it if it is now inconsistent.
+        """
+        if loc != self.goal_loc:
+            self._rhs[loc] = min((self._g.get(neighbour_loc, math.inf) + weight
+                                  for neighbour_loc, weight in self.graph.iter_edges(loc)),
+                                 default=math.inf)
+
+        g = self._g.get(loc, math.inf)
+        rhs = self._rhs.get(loc, math.inf)
+        if g != rhs:
+            key = min(g, rhs)
+            if self._queued.get(loc) != key:
+                self._queued[loc] = key
+                heappush(self._queue, (key, loc))
+        else:
+            self._queued.pop(loc, None)
+
+    def _compute(self, target_loc: Optional[Tuple[int, int]]) -> None:
+        """Expand inconsistent locations until target_loc is consistent and nothing left in
+        the queue could change its distance. When target_loc is None, empty the queue.
+        """
+        while len(self._queue) != 0:
+            key, loc = self._queue[0]
+            if self._queued.get(loc) != key:  # Stale entry
+                heappop(self._queue)
+                continue
+
+            if target_loc is not None:
+                target_g = self._g.get(target_loc, math.inf)
+                target_rhs = self._rhs.get(target_loc, math.inf)
+                if key >= min(target_g, target_rhs) and target_g == target_rhs:
+                    return
+
+            heappop(self._queue)
+            del self._queued[loc]
+            self.expansions += 1
+
+            if self._g.get(loc, math.inf) > self._rhs.get(loc, math.inf):
+                # Overconsistent: a shorter path was found, so lock it in.
+                self._g[loc] = self._rhs[loc]
+            else:
+                # Underconsistent: the old path got longer, so start over for this location.
+                self._g[loc] = math.inf
+                self._update_vertex(loc)
+
+            for neighbour_loc, _ in self.graph.iter_edges(loc):
+                self._update_vertex(neighbour_loc)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['vertex_graph', 'pathfinding', 'heapq', 'math'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -5,39 +5,53 @@ PLEASE REFER TO THE [COMPUTATIONAL OVERVIEW] SECTION IN THE REPORT BEFORE READIN
 OBJECTIVE: Run the main game loop, allowing for an interactive visualisation of Dijkstra's Algorithm
 and A* pathfinding on a 16x9 grid map.
 
+The game state itself (the map, enemy units and warning timers) lives in a simulation.Simulation,
+which is advanced in fixed 1/60 second ticks. This file only passes player input to it and draws it.
+
+Sample Usage (from the command line):
+    python main.py              (plays on a random 16x9 map)
+    python main.py level.map    (plays on a map saved with mapfile.py; only the top-left 16x9
+                                 tiles are shown)
+    python main.py --hud --trace frames.json
+                                (shows the frame profiler HUD, and writes the timings of the
+                                 last 10 minutes of frames to frames.json on quitting)
+
+Every frame is timed phase by phase with a frame_profiler.FrameProfiler: event handling, updates,
+drawing, pushing the drawing to the display and waiting for the next frame. F3 shows or hides the
+HUD of rolling 50th and 99th percentile phase times. A trace ending in .json is written in the
+Chrome trace event format (open it in chrome://tracing or ui.perfetto.dev); one ending in .csv
+has a row per phase of every frame.
+
 This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
 """
-import random
-from typing import List, Tuple, Dict
+import argparse
+import sys
 
 import pygame
 
-import vertex_graph
 import gameobjects
-from pathfinding import a_star_pathfinding
+from frame_profiler import FrameProfiler
+from mapfile import open_map
+from renderer import Renderer, render_text_panel
+from simulation import Simulation, random_grid
+from sprites import get_sprite, preload_sprites
 from tools import convert_pos_to_loc
 
 
-def refresh_enemies(enemies: List[gameobjects.Enemy],
-                    grid: Dict[Tuple[int, int], str],
-                    graph: vertex_graph.WeightedGraph) -> None:
-    """For all enemies deployed on-screen,
-    snap their positions to the centre of their nearest/current grid,
-    and update their grid and path information.
-
-    Called when there is a change in map state:
-        - pathfinding algorithm change
-        - change in tile type
-    """
-
-    for enemy in enemies:
-        enemy.set_loc(enemy.get_loc())  # Snap to current tile centre
-        enemy.grid = grid  # Update grid
-        path = a_star_pathfinding(graph, enemy.get_loc(), is_dstra)  # Calculate new path
-        enemy.set_working_path(path)  # Update path
+# The number of frames between updates of the profiler HUD, and the number of frames kept for
+# --trace (10 minutes at 60 FPS).
+HUD_REFRESH_FRAMES = 15
+TRACE_FRAMES = 36000
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play the pathfinding game.')
+    parser.add_argument('map', nargs='?', help='a map file written by mapfile.py')
+    parser.add_argument('--hud', action='store_true', help='show the frame profiler HUD')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='write frame timings to PATH (.json or .csv) on quitting')
+    args = parser.parse_args(sys.argv[1:])
+
     # Initialise pygame
     pygame.init()
 
@@ -57,177 +71,155 @@ if __name__ == '__main__':
     # Create screen.
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 
+    # Load every sprite now, so that deploying enemies never has to load one from disk.
+    preload_sprites()
+
     # Create tiles for drawing later.
     tiles = {'normal': gameobjects.Tile('normal'),
              'goal': gameobjects.Tile('goal'),
              'obstacle': gameobjects.Tile('obstacle'),
              'slow': gameobjects.Tile('slow')}
+    tile_images = {tile_type: tile.image for tile_type, tile in tiles.items()}
 
     # Create UI images for frawing later.
-    ui_top_1 = pygame.image.load('assets/sprite_ui_top_1.png').convert()
-    ui_top_2 = pygame.image.load('assets/sprite_ui_top_2.png').convert()
-    ui_bottom_1 = pygame.image.load('assets/sprite_ui_bottom_1.png').convert()
-    warning_nodeploy = pygame.image.load('assets/sprite_warning_nodeploy.png').convert()
-    warning_nochange = pygame.image.load('assets/sprite_warning_nochange.png').convert()
-
-    # Create a dict-based grid representation of the game map to be used throughout the program.
-    # Randomly distribute tile types.
-    meta_grid = {}
-    for i in range(GRID_WIDTH):
-        for j in range(GRID_HEIGHT):
-            meta_grid[(i, j)] = random.choice(['normal', 'normal', 'slow', 'slow', 'obstacle'])
-    meta_grid[GOAL_LOC] = 'goal'
-
-    # Create graph-based representation of the game map to be used throughout the program.
-    meta_graph = vertex_graph.dict_to_graph(meta_grid)
-
-    # Create list for storing enemy instances.
-    meta_enemies = []
+    enemy_image = get_sprite('enemy')
+    ui_top_1 = get_sprite('ui_top_1')
+    ui_top_2 = get_sprite('ui_top_2')
+    ui_bottom_1 = get_sprite('ui_bottom_1')
+    warning_nodeploy = get_sprite('warning_nodeploy')
+    warning_nochange = get_sprite('warning_nochange')
+
+    # Create the game on the given map file, or on a map with randomly distributed tile types.
+    # The simulation holds the grid and graph-based representations of the map,
+    # the planner which all enemies follow to the goal, and every enemy unit.
+    # Paths are recomputed on a background thread, so that tile edits never stall a frame.
+    if args.map is not None:
+        # The graph is built straight from the map file's tile bytes.
+        map_file = open_map(args.map)
+        sim = Simulation(map_file, map_file.goal_loc, backend='grid', background=True)
+    else:
+        map_file = None
+        sim = Simulation(random_grid(GRID_WIDTH, GRID_HEIGHT, GOAL_LOC), GOAL_LOC,
+                         background=True)
+
+    # Create the renderer, which caches the drawn tiles and only redraws what changes.
+    renderer = Renderer(screen, tile_images, sim.grid)
+
+    # Time each phase of every frame.
+    profiler = FrameProfiler(trace_frames=TRACE_FRAMES if args.trace else 0)
+    show_hud = args.hud
+    text_font = pygame.font.SysFont('consolas,dejavusansmono,monospace', 14)
+
+    # The sample search statistics shown on screen, so its text is only rendered when they change.
+    shown_stats = None
 
     # Define runtime-critical variables which tells the game loop what to do in every frame.
     running = True  # The main loop is broken when this is False.
-    is_dstra = True  # Current pathfinding mode. True for Dijkstra, False for A*.
     drawcolour = (0, 0, 255)  # Current path-line draw colour. Blue for Dijkstra, Red for A*.
 
-    # Define timers for use in 2-second warning pop-ups.
-    warning_nodeploy_timer = 0
-    warning_nochange_timer = 0
-
     # Main loop starts here
     while running:
-        """
-        The Event Handling section below is rather long and has multiple nested statements.
-        However, it did not warrant a dedicated helper function because:
-        - the code block is only used once in the entire program
-        - the code is reasonably readable through the help of comments
-        - moving the code into a helper function would mean passing in 6 arguments (e.g. meta_grid),
-          which can become messy
-            - this problem can be avoided through global variables, but PythonTA doesn't like that.
-        """
+        profiler.begin_frame()
+
         # ------------Event Handling------------
         for event in pygame.event.get():
             if event.type == pygame.MOUSEBUTTONDOWN:
+                x = event.pos[0]
+                y = event.pos[1]
+                loc = convert_pos_to_loc((x, y))
+
                 # ------------Left Click (deploy new enemy unit)------------
                 if event.button == 1:
-                    x = event.pos[0]
-                    y = event.pos[1]
-                    loc = convert_pos_to_loc((x, y))
-
-                    ingrid = loc in meta_grid
                     # When clicked on a deployable tile
-                    if ingrid and (meta_grid[loc] == 'slow' or meta_grid[loc] == 'normal'):
-                        # If there exists a path from this location to the goal, add new enemy.
-                        if meta_graph.connected(loc, GOAL_LOC):
-                            if len(meta_enemies) < 5:  # Only add under the 5-enemy limit
-                                new_path = a_star_pathfinding(meta_graph, loc, is_dstra)
-                                new_enemy = gameobjects.Enemy(new_path, loc, meta_grid)
-                                meta_enemies.append(new_enemy)
-
-                        else:  # Show the "cannot deploy" warning message
-                            warning_nodeploy_timer = 120  # 2 seconds
+                    if sim.grid.get(loc) in {'normal', 'slow'}:
+                        # Deploys only if there exists a path from this location to the goal,
+                        # and shows the "cannot deploy" warning message otherwise.
+                        sim.deploy(loc)
 
                     # When the algorithm swap button is clicked
                     elif x >= 716 and y <= 64:
-                        is_dstra = not is_dstra
-                        refresh_enemies(meta_enemies, meta_grid, meta_graph)
+                        sim.toggle_algorithm()
 
                 # ------------Right Click (cycle through tile types)------------
                 elif event.button == 3:
-                    x = event.pos[0]
-                    y = event.pos[1]
-                    loc = convert_pos_to_loc((x, y))
-
-                    ingrid = loc in meta_grid
-                    # When clicked on a slow traversable tile, want to change into an obstacle.
-                    if ingrid and meta_grid[loc] == 'slow':
-                        # Test if this new obstacle tile allows for
-                        # deployed enemies to reach their goal.
-                        temp_grid = meta_grid.copy()
-                        temp_grid[loc] = 'obstacle'
-                        temp_graph = vertex_graph.dict_to_graph(temp_grid)
-
-                        # Get all current enemy locations
-                        enemy_loc_list = [enemy.get_loc() for enemy in meta_enemies]
-
-                        # Test if all enemies can reach their goal from their current location
-                        if all([temp_graph.connected(tloc, GOAL_LOC) for tloc in enemy_loc_list]):
-                            # If yes, apply the change in tile to the 'real' meta_grid.
-                            meta_grid[loc] = 'obstacle'
-
-                            # Update meta_graph with new meta_grid
-                            meta_graph = vertex_graph.dict_to_graph(meta_grid)
-                            refresh_enemies(meta_enemies, meta_grid, meta_graph)
-
-                        else:  # Show the "cannot block completely" warning message
-                            warning_nochange_timer = 120  # 2 seconds
-
-                    # Unlike above, changing to a traversable/non-obstacle tile
-                    # does not require checking.
-                    elif ingrid and meta_grid[loc] == 'normal':
-                        meta_grid[loc] = 'slow'
-
-                        # Update meta_graph with new meta_grid
-                        meta_graph = vertex_graph.dict_to_graph(meta_grid)
-                        refresh_enemies(meta_enemies, meta_grid, meta_graph)
-
-                    elif ingrid and meta_grid[loc] == 'obstacle':
-                        meta_grid[loc] = 'normal'
-
-                        # Update meta_graph with new meta_grid
-                        meta_graph = vertex_graph.dict_to_graph(meta_grid)
-                        refresh_enemies(meta_enemies, meta_grid, meta_graph)
+                    # Only succeeds if deployed enemies can still reach the goal,
+                    # and shows the "cannot block completely" warning message otherwise.
+                    if sim.edit_tile(loc):
+                        renderer.set_tile(loc, sim.grid[loc])
+
+            # F3 shows or hides the frame profiler HUD.
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_hud = not show_hud
+                if not show_hud:
+                    renderer.set_overlay(None)
 
             # When the player presses the quit window button.
             elif event.type == pygame.QUIT:
                 running = False
+        profiler.mark('events')
 
-        # ------------Drawing & Updates------------
-        # Draw all tiles.
-        for i in range(GRID_WIDTH):
-            for j in range(GRID_HEIGHT):
-                screen.blit(tiles[meta_grid[(i, j)]].image, (i * 64, 64 + j * 64))
-
-        # Update and draw all enemies.
-        for alive_enemy in meta_enemies:
-            alive_enemy.update()
-            alive_enemy.draw_pathline(screen, drawcolour)
-            screen.blit(alive_enemy.image, alive_enemy.rect)
-
-            # Remove enemy if reached goal tile.
-            if alive_enemy.get_loc() == GOAL_LOC:
-                meta_enemies.remove(alive_enemy)
+        # ------------Updates------------
+        # Run as many fixed-length ticks as the time since the last frame allows.
+        # This moves all enemies, removes the ones at the goal and counts down warning timers.
+        sim.advance(clock.get_time() / 1000)
+        profiler.mark('update')
 
+        # ------------Drawing------------
         # Draw upper UI section (one with the algorithm swap button).
-        if is_dstra:
-            screen.blit(ui_top_1, (0, 0))
+        # The renderer only redraws a UI section when its image changes.
+        if sim.is_dstra:
+            renderer.set_bar(ui_top_1, (0, 0))
         else:
-            screen.blit(ui_top_2, (0, 0))
+            renderer.set_bar(ui_top_2, (0, 0))
 
         # Draw lower UI section (warnings)
-        if warning_nochange_timer > warning_nodeploy_timer:  # Implies that at least one is nonzero
-            screen.blit(warning_nochange, (0, 640))
-        elif warning_nochange_timer < warning_nodeploy_timer:
-            screen.blit(warning_nodeploy, (0, 640))
+        if sim.warning_nochange_timer > sim.warning_nodeploy_timer:  # At least one is nonzero
+            renderer.set_bar(warning_nochange, (0, 640))
+        elif sim.warning_nochange_timer < sim.warning_nodeploy_timer:
+            renderer.set_bar(warning_nodeploy, (0, 640))
         else:
-            screen.blit(ui_bottom_1, (0, 640))
-
-        # Decrement warning timer per frame. This allows for timed pop-ups.
-        if warning_nodeploy_timer > 0:
-            warning_nodeploy_timer -= 1
-        if warning_nochange_timer > 0:
-            warning_nochange_timer -= 1
+            renderer.set_bar(ui_bottom_1, (0, 640))
 
         # Update path-line draw colour.
-        if is_dstra:
+        if sim.is_dstra:
             drawcolour = (0, 0, 255)
         else:
             drawcolour = (255, 0, 0)
 
-        # Update entire screen with the above changes.
-        pygame.display.flip()
+        # Run the current algorithm from where the last enemy was deployed (only after a change),
+        # and show how many tiles it expanded. Its path is highlighted below.
+        search_path, search_stats = sim.sample_search()
+        if search_stats is not shown_stats:
+            shown_stats = search_stats
+            if search_stats is None:
+                renderer.set_overlay(None, name='search')
+            else:
+                algorithm = 'Dijkstra' if sim.is_dstra else 'A*'
+                text = (f'{algorithm}: {search_stats.nodes_expanded} tiles expanded in '
+                        f'{search_stats.wall_time * 1000:.2f} ms')
+                renderer.set_overlay(render_text_panel(text_font, [text]), (8, 608), 'search')
+
+        # Redraw the profiler HUD every few frames, so that it stays readable.
+        if show_hud and profiler.frames % HUD_REFRESH_FRAMES == 0:
+            renderer.set_overlay(render_text_panel(text_font, profiler.hud_lines()), (8, 72))
+
+        # Draw all enemies and their paths, and update only the changed parts of the screen.
+        # The renderer marks the end of the 'draw' phase, before pushing to the display.
+        renderer.draw(sim.enemies, enemy_image, drawcolour, profiler, search_path)
+        profiler.mark('display')
 
         # Let this frame run such that the framerate becomes 60FPS.
         clock.tick(60)
+        profiler.mark('wait')
+        profiler.end_frame()
+
+    # Stop the background pathfinding thread, and close the map file (the grid being drawn).
+    sim.close()
+    if map_file is not None:
+        map_file.close()
+
+    if args.trace:
+        profiler.write_trace(args.trace)
 
     # Checking
     import doctest
@@ -238,7 +230,8 @@ if __name__ == '__main__':
         'max-line-length': 100,
         'disable': ['E1136', 'W0105'],
         'extra-imports':
-            ['random', 'pygame', 'vertex_graph', 'gameobjects', 'pathfinding', 'tools'],
+            ['argparse', 'sys', 'pygame', 'gameobjects', 'frame_profiler', 'mapfile', 'renderer',
+             'simulation', 'sprites', 'tools'],
         'allowed-io': [],
         'max-nested-blocks': 8,
         'generated-members': ['pygame.*']
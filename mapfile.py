@@ -0,0 +1,261 @@
+"""CSC111 Winter 2021 Project - mapfile.py
+
+OBJECTIVE: Define the map file format, for saving game maps and opening them again without
+creating a Python object per tile.
+
+A map file is a 24 byte header followed by one byte per tile:
+    - bytes 0-3: the magic number b'PFMP'
+    - byte 4: the format version, FORMAT_VERSION
+    - bytes 5-7: unused (zero)
+    - bytes 8-23: the width, height, goal x and goal y of the map, as little-endian 32-bit
+      unsigned integers
+    - bytes 24 onwards: the type of every tile, as an index into TILE_TYPES, in the same order as
+      GridGraph node ids (x * height + y)
+
+open_map opens a map file through mmap, so opening even a multi-megatile map only reads its
+header. The tiles are read by the operating system as they are accessed, and both
+vertex_graph.bytes_to_grid_graph and renderer.Renderer read them straight from the map file.
+
+Sample Usage (from the command line):
+    python mapfile.py big.map --size 4096x4096 --seed 0
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from __future__ import annotations
+import mmap
+import random
+import struct
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import vertex_graph
+
+MAGIC = b'PFMP'
+FORMAT_VERSION = 1
+
+# Every tile type, by the byte which stands for it in a map file.
+TILE_TYPES = ('obstacle', 'normal', 'slow', 'goal')
+
+_TYPE_TO_CODE = {tile_type: code for code, tile_type in enumerate(TILE_TYPES)}
+
+# Magic number, format version, 3 unused bytes, width, height, goal x, goal y.
+_HEADER = struct.Struct('<4sB3xIIII')
+
+
+class MapFile:
+    """A game map opened from a map file.
+
+    A MapFile can be used in place of the dict-based grid representation of the game map: it maps
+    every location on the map to its tile type. Changes to a MapFile are never written back to
+    the file; use save_map for that.
+
+    Instance Attributes:
+        - width: The number of tile columns in the map.
+        - height: The number of tile rows in the map.
+        - goal_loc: The location of the goal tile.
+        - tiles: The type of every tile as an index into TILE_TYPES, by node id (x * height + y).
+
+    Representation Invariants:
+        - self.width > 0 and self.height > 0
+        - len(self.tiles) == self.width * self.height
+    """
+    width: int
+    height: int
+    goal_loc: Tuple[int, int]
+    tiles: memoryview
+
+    # Private Instance Attributes:
+    #     - _file: The open map file.
+    #     - _mmap: The memory-mapped contents of the map file, as a private copy.
+    _file: object
+    _mmap: mmap.mmap
+
+    def __init__(self, path: str) -> None:
+        """Open the map file at path.
+
+        Raise ValueError if path is not a valid map file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            # ACCESS_COPY makes writes to the map change only this process's copy.
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        except ValueError:  # An empty file cannot be mapped
+            self._file.close()
+            raise ValueError(f'{path} is not a map file') from None
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a map file')
+        magic, version, width, height, goal_x, goal_y = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION \
+                or len(self._mmap) != _HEADER.size + width * height \
+                or not (goal_x < width and goal_y < height):
+            self.close()
+            raise ValueError(f'{path} is not a map file, or is of an unsupported version')
+
+        self.width = width
+        self.height = height
+        self.goal_loc = (goal_x, goal_y)
+        self.tiles = memoryview(self._mmap)[_HEADER.size:]
+
+    def __enter__(self) -> MapFile:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.width * self.height
+
+    def __contains__(self, loc: Tuple[int, int]) -> bool:
+        return 0 <= loc[0] < self.width and 0 <= loc[1] < self.height
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return ((x, y) for x in range(self.width) for y in range(self.height))
+
+    def __getitem__(self, loc: Tuple[int, int]) -> str:
+        if loc not in self:
+            raise KeyError(loc)
+        return TILE_TYPES[self.tiles[loc[0] * self.height + loc[1]]]
+
+    def __setitem__(self, loc: Tuple[int, int], tile_type: str) -> None:
+        if loc not in self:
+            raise KeyError(loc)
+        self.tiles[loc[0] * self.height + loc[1]] = _TYPE_TO_CODE[tile_type]
+
+    def get(self, loc: Tuple[int, int], default: Optional[str] = None) -> Optional[str]:
+        """Return the type of the tile at loc, or default if loc is outside of the map.
+        """
+        if loc not in self:
+            return default
+        return TILE_TYPES[self.tiles[loc[0] * self.height + loc[1]]]
+
+    def keys(self) -> Iterator[Tuple[int, int]]:
+        """Return an iterator over every location on the map.
+        """
+        return iter(self)
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int], str]]:
+        """Return an iterator over (location, tile type) pairs for every tile on the map.
+
+        This creates a tuple per tile; prefer reading self.tiles for large maps.
+        """
+        height, tiles = self.height, self.tiles
+        return (((node // height, node % height), TILE_TYPES[code])
+                for node, code in enumerate(tiles))
+
+    def to_grid_graph(self) -> vertex_graph.GridGraph:
+        """Return a GridGraph of this map, built straight from the tile bytes.
+        """
+        return vertex_graph.bytes_to_grid_graph(self.width, self.height, self.tiles, TILE_TYPES)
+
+    def close(self) -> None:
+        """Close the map file. The map can no longer be used afterwards.
+        """
+        if hasattr(self, 'tiles'):
+            self.tiles.release()
+        self._mmap.close()
+        self._file.close()
+
+
+def open_map(path: str) -> MapFile:
+    """Open the map file at path.
+
+    Raise ValueError if path is not a valid map file.
+    """
+    return MapFile(path)
+
+
+def write_map(path: str, width: int, height: int, goal_loc: Tuple[int, int],
+              tiles: bytes) -> None:
+    """Write a map file to path, for a width x height map with the goal at goal_loc and tile
+    types given as in MapFile.tiles.
+
+    Preconditions:
+        - width > goal_loc[0] >= 0 and height > goal_loc[1] >= 0
+        - len(tiles) == width * height
+        - all(code < len(TILE_TYPES) for code in tiles)
+    """
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, width, height, goal_loc[0], goal_loc[1]))
+        file.write(tiles)
+
+
+def save_map(path: str, grid: Union[Dict[Tuple[int, int], str], MapFile]) -> None:
+    """Write the game map grid to a map file at path.
+
+    Locations missing from a dict-based grid are saved as obstacles.
+
+    Preconditions:
+        - grid contains exactly one 'goal' tile
+    """
+    if isinstance(grid, MapFile):
+        write_map(path, grid.width, grid.height, grid.goal_loc, grid.tiles)
+        return
+
+    width = max(loc[0] for loc in grid) + 1
+    height = max(loc[1] for loc in grid) + 1
+    tiles = bytearray(width * height)  # Every tile starts as an obstacle (0)
+    goal_loc = (0, 0)
+    for loc, tile_type in grid.items():
+        tiles[loc[0] * height + loc[1]] = _TYPE_TO_CODE[tile_type]
+        if tile_type == 'goal':
+            goal_loc = loc
+    write_map(path, width, height, goal_loc, tiles)
+
+
+def random_tiles(width: int, height: int, goal_loc: Tuple[int, int],
+                 rng: random.Random = random, obstacle_density: float = 0.2) -> bytearray:
+    """Return the tile types of a random width x height map with the goal at goal_loc, as in
+    MapFile.tiles.
+
+    Each tile is an obstacle with probability obstacle_density (rounded to a multiple of 1/256),
+    and otherwise normal or slow with equal probability. This creates no Python object per tile.
+
+    Preconditions:
+        - width > goal_loc[0] >= 0 and height > goal_loc[1] >= 0
+        - 0 <= obstacle_density <= 1
+    """
+    num_tiles = width * height
+
+    # Split the 256 byte values into normal, slow and obstacle, in that order.
+    num_open = 256 - round(obstacle_density * 256)
+    byte_to_code = bytes(_TYPE_TO_CODE['obstacle'] if b >= num_open
+                         else _TYPE_TO_CODE['normal'] if 2 * b < num_open
+                         else _TYPE_TO_CODE['slow'] for b in range(256))
+
+    tiles = bytearray(rng.getrandbits(8 * num_tiles).to_bytes(num_tiles, 'little')
+                      .translate(byte_to_code))
+    tiles[goal_loc[0] * height + goal_loc[1]] = _TYPE_TO_CODE['goal']
+    return tiles
+
+
+def write_random_map(path: str, width: int, height: int, goal_loc: Tuple[int, int],
+                     rng: random.Random = random) -> None:
+    """Write a random width x height map to a map file at path, with tile types distributed as
+    in simulation.random_grid and the goal at goal_loc.
+
+    Preconditions:
+        - width > goal_loc[0] >= 0 and height > goal_loc[1] >= 0
+    """
+    write_map(path, width, height, goal_loc, random_tiles(width, height, goal_loc, rng))
+
+
+def main(argv: List[str]) -> None:
+    """Write the random map described by the command line arguments argv to a map file.
+    """
+    import argparse  # Only needed on the command line, and slow to import.
+
+    parser = argparse.ArgumentParser(description='Write a random map file.')
+    parser.add_argument('path', help='where to write the map file')
+    parser.add_argument('--size', default='16x9', help='map size as WIDTHxHEIGHT')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    write_random_map(args.path, width, height, (width - 1, height // 2),
+                     random.Random(args.seed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
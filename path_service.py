@@ -0,0 +1,546 @@
+"""CSC111 Winter 2021 Project - path_service.py
+
+OBJECTIVE: Define PathService, which loads a map once and answers path and distance queries from
+other processes over a local socket, and PathClient, which those processes use to query it.
+
+Every message, in either direction, is a frame: a 9 byte header (payload length as a 4 byte
+unsigned integer, message type as 1 byte and request id as a 4 byte unsigned integer, all
+big-endian) followed by the payload. A response has the same request id as its request.
+
+    Request         Payload                     Response payload
+    PATH            start x, y, goal x, y (H)   graph version (I), then x, y (H) of every location
+                                                on the path (none if there is no path)
+    DISTANCE        start x, y, goal x, y (H)   graph version (I), distance (i) or -1 if no path
+    EDIT            x, y (H), tile type (B)     graph version after the edit (I)
+    STATS           (empty)                     PathService.counters() as UTF-8 JSON
+    (any)                                       ERROR: an UTF-8 error message
+
+Tile types are numbered as in mapfile.TILE_TYPES. Responses to queries sent over the same
+connection without waiting may arrive in a different order; match them up by request id.
+
+Queries are not answered as soon as they arrive. They are collected until the event loop has
+read everything that arrived in the same tick (or for batch_window seconds), and then answered
+together against the same graph version. Queries in a batch sharing a goal (and any later queries
+for that goal, until the next edit) are answered from one FlowField when there are enough of them.
+An edit first answers every query received before it, so every response reflects exactly the
+edits made before its request was received.
+
+Batches are answered one at a time, with their searches and FlowFields computed on a worker
+thread, so that the event loop keeps reading every connection meanwhile; the queries received
+while a batch is answered make up the next batch. An edit waits for the batch being answered (if
+any) to finish before changing the graph. A connection is not read from again until the responses
+written to it so far have drained, so a client which stops reading its responses is not sent
+ever more of them.
+
+Sample Usage (from the command line):
+    python path_service.py --map big.map --listen unix:/tmp/paths.sock
+    python path_service.py --size 256x256 --listen 127.0.0.1:7878
+
+Sample Usage (from another process):
+    client = PathClient('unix:/tmp/paths.sock')
+    path = client.path((0, 0), (15, 4))
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import argparse
+import asyncio
+import json
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+import vertex_graph as vg
+from mapfile import TILE_TYPES, open_map
+from pathfinding import FlowField, SearchStats, a_star_pathfinding
+from simulation import random_grid
+
+# Message types.
+PATH = 1
+DISTANCE = 2
+EDIT = 3
+STATS = 4
+ERROR = 255
+
+# Payload length, message type, request id.
+_HEADER = struct.Struct('!IBI')
+_QUERY = struct.Struct('!HHHH')
+_EDIT = struct.Struct('!HHB')
+_VERSION = struct.Struct('!I')
+_DISTANCE = struct.Struct('!Ii')
+
+# Frames with longer payloads are rejected, and their connection closed.
+_MAX_PAYLOAD = 1 << 20
+
+# A goal needs at least this many queries in one batch to be answered from a FlowField.
+_FIELD_MIN_QUERIES = 4
+
+# The number of recent query latencies the latency percentiles are taken over.
+_LATENCY_SAMPLES = 10000
+
+# The tile types an EDIT message may set.
+_EDITABLE = {'normal', 'slow', 'obstacle'}
+
+# A query waiting to be answered: message type, request id, start, goal, the writer of its
+# connection and the time it was received.
+_Query = Tuple[int, int, Tuple[int, int], Tuple[int, int], asyncio.StreamWriter, float]
+
+
+class PathService:
+    """A pathfinding service for a single map, shared by every connected client.
+
+    Instance Attributes:
+        - graph: The graph of the map.
+        - batch_window: How long (in seconds) queries are collected before being answered.
+                        At 0, only queries read in the same event loop tick are batched.
+        - queries: The number of PATH and DISTANCE queries answered.
+        - batches: The number of batches those queries were answered in.
+        - edits: The number of EDIT messages applied.
+        - fields_computed: The number of FlowFields computed to answer batches.
+        - errors: The number of ERROR responses sent.
+
+    Representation Invariants:
+        - self.batch_window >= 0
+    """
+    graph: vg.GridGraph
+    batch_window: float
+    queries: int
+    batches: int
+    edits: int
+    fields_computed: int
+    errors: int
+
+    # Private Instance Attributes:
+    #     - _pending: The queries waiting to be answered, oldest first.
+    #     - _flush_handle: The scheduled call starting to answer _pending, or None if none is
+    #                      scheduled.
+    #     - _flush_task: The task answering batches until none are pending, or None if it is
+    #                    not running.
+    #     - _lock: Held while a batch is answered or an edit is applied, so that batches are
+    #              answered in order and the graph never changes under a running search.
+    #     - _fields: The FlowFields computed since the last edit, by goal location.
+    #     - _latencies: How long (in seconds) each recent query waited for its response.
+    #     - _started: When this service was created, as a time.perf_counter() value.
+    _pending: List[_Query]
+    _flush_handle: Optional[asyncio.Handle]
+    _flush_task: Optional[asyncio.Task]
+    _lock: asyncio.Lock
+    _fields: Dict[Tuple[int, int], FlowField]
+    _latencies: Deque[float]
+    _started: float
+
+    def __init__(self, graph: vg.GridGraph, batch_window: float = 0.0) -> None:
+        """Initialise a service answering queries on graph.
+
+        Preconditions:
+            - batch_window >= 0
+        """
+        self.graph = graph
+        self.batch_window = batch_window
+        self.queries = 0
+        self.batches = 0
+        self.edits = 0
+        self.fields_computed = 0
+        self.errors = 0
+        self._pending = []
+        self._flush_handle = None
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        self._fields = {}
+        self._latencies = deque(maxlen=_LATENCY_SAMPLES)
+        self._started = time.perf_counter()
+
+    async def start(self, address: str) -> asyncio.AbstractServer:
+        """Start accepting connections at address, which is either 'unix:PATH' or 'HOST:PORT',
+        and return the server.
+        """
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            return await asyncio.start_unix_server(self._handle_connection, path=target)
+        return await asyncio.start_server(self._handle_connection, target[0], target[1])
+
+    async def serve(self, address: str) -> None:
+        """Accept connections at address (as in start) until cancelled.
+        """
+        server = await self.start(address)
+        async with server:
+            await server.serve_forever()
+
+    def counters(self) -> Dict[str, Any]:
+        """Return the throughput and latency counters of this service.
+
+        Latencies are in milliseconds, over the last _LATENCY_SAMPLES queries.
+        """
+        uptime = time.perf_counter() - self._started
+        latencies = sorted(self._latencies)
+        return {'version': self.graph.version, 'uptime_seconds': uptime,
+                'queries': self.queries, 'batches': self.batches, 'edits': self.edits,
+                'fields_computed': self.fields_computed, 'errors': self.errors,
+                'queries_per_second': self.queries / uptime if uptime > 0 else None,
+                'mean_batch_size': self.queries / self.batches if self.batches > 0 else None,
+                'latency_p50_ms': _percentile(latencies, 50) * 1000 if latencies else None,
+                'latency_p99_ms': _percentile(latencies, 99) * 1000 if latencies else None}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """Read and handle frames from one client until it disconnects.
+        """
+        try:
+            while True:
+                length, message_type, request_id = _HEADER.unpack(
+                    await reader.readexactly(_HEADER.size))
+                if length > _MAX_PAYLOAD:
+                    self._send_error(writer, request_id, 'payload too long')
+                    break
+                payload = await reader.readexactly(length)
+                await self._handle_message(writer, message_type, request_id, payload)
+                # Wait for the responses written by this message and by every batch answered
+                # since the last one to drain, before reading the next request.
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # The client disconnected
+        finally:
+            writer.close()
+
+    async def _handle_message(self, writer: asyncio.StreamWriter, message_type: int,
+                              request_id: int, payload: bytes) -> None:
+        """Handle one request frame.
+        """
+        if message_type in (PATH, DISTANCE) and len(payload) == _QUERY.size:
+            start_x, start_y, goal_x, goal_y = _QUERY.unpack(payload)
+            self._pending.append((message_type, request_id, (start_x, start_y),
+                                  (goal_x, goal_y), writer, time.perf_counter()))
+            if self._flush_handle is None:
+                loop = asyncio.get_running_loop()
+                if self.batch_window > 0:
+                    self._flush_handle = loop.call_later(self.batch_window, self._start_flush)
+                else:
+                    self._flush_handle = loop.call_soon(self._start_flush)
+
+        elif message_type == EDIT and len(payload) == _EDIT.size:
+            x, y, code = _EDIT.unpack(payload)
+            if code >= len(TILE_TYPES) or TILE_TYPES[code] not in _EDITABLE \
+                    or not (x < self.graph.width and y < self.graph.height):
+                self._send_error(writer, request_id, 'invalid edit')
+                return
+            # Queries received before this edit are answered against the graph without it.
+            batch = self._take_pending()
+            async with self._lock:
+                await self._answer(batch)
+                self.graph.set_tile((x, y), TILE_TYPES[code])
+                self._fields.clear()
+                self.edits += 1
+            _send(writer, EDIT, request_id, _VERSION.pack(self.graph.version))
+
+        elif message_type == STATS and len(payload) == 0:
+            _send(writer, STATS, request_id, json.dumps(self.counters()).encode('utf-8'))
+
+        else:
+            self._send_error(writer, request_id, 'invalid request')
+
+    def _take_pending(self) -> List[_Query]:
+        """Return every pending query, and cancel the scheduled call answering them.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _start_flush(self) -> None:
+        """Start the task answering pending queries, unless it is already running.
+        """
+        self._flush_handle = None
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self) -> None:
+        """Answer the pending queries, one batch at a time, until none are left.
+        """
+        try:
+            while len(self._pending) > 0:
+                batch = self._take_pending()
+                async with self._lock:
+                    await self._answer(batch)
+        finally:
+            self._flush_task = None
+
+    async def _answer(self, batch: List[_Query]) -> None:
+        """Answer every query in batch against the current graph version.
+
+        The searches run on the event loop's default executor. The caller must hold self._lock,
+        so that the graph does not change until they are done.
+        """
+        if len(batch) == 0:
+            return
+        self.batches += 1
+        payloads = await asyncio.get_running_loop().run_in_executor(None, self._search, batch)
+
+        for (message_type, request_id, _, _, writer, received), payload in zip(batch, payloads):
+            if not writer.is_closing():
+                _send(writer, message_type, request_id, payload)
+            self.queries += 1
+            self._latencies.append(time.perf_counter() - received)
+
+    def _search(self, batch: List[_Query]) -> List[bytes]:
+        """Return the response payload of every query in batch, in order, against the current
+        graph version. Queries are grouped by goal, so that each goal's FlowField (if any) is
+        computed once.
+        """
+        by_goal = {}
+        for i, query in enumerate(batch):
+            by_goal.setdefault(query[3], []).append(i)
+
+        version = self.graph.version
+        payloads = [b''] * len(batch)
+        for goal_loc, indices in by_goal.items():
+            field = self._field_for(goal_loc, len(indices))
+            for i in indices:
+                message_type, _, start_loc = batch[i][:3]
+                if not (self.graph.has_vertex(start_loc) and self.graph.has_vertex(goal_loc)):
+                    path, distance = None, None
+                elif field is not None:
+                    path = field.path_from(start_loc) or None
+                    distance = field.distance.get(start_loc)
+                else:
+                    stats = SearchStats()
+                    path = a_star_pathfinding(self.graph, start_loc, False, stats,
+                                              goal=goal_loc)
+                    distance = stats.path_cost
+
+                if message_type == PATH:
+                    coords = [c for loc in path for c in loc] if path is not None else []
+                    payloads[i] = struct.pack(f'!I{len(coords)}H', version, *coords)
+                else:
+                    payloads[i] = _DISTANCE.pack(version, -1 if distance is None else distance)
+        return payloads
+
+    def _field_for(self, goal_loc: Tuple[int, int], num_queries: int) -> Optional[FlowField]:
+        """Return a FlowField towards goal_loc for answering num_queries queries, or None if they
+        are better answered by a_star_pathfinding.
+        """
+        if goal_loc in self._fields:
+            return self._fields[goal_loc]
+        if num_queries < _FIELD_MIN_QUERIES or not self.graph.has_vertex(goal_loc):
+            return None
+        field = FlowField(self.graph, goal_loc)
+        self._fields[goal_loc] = field
+        self.fields_computed += 1
+        return field
+
+    def _send_error(self, writer: asyncio.StreamWriter, request_id: int, message: str) -> None:
+        """Send an ERROR response with the given message.
+        """
+        self.errors += 1
+        _send(writer, ERROR, request_id, message.encode('utf-8'))
+
+
+class PathClient:
+    """A client of a PathService, keeping a pool of connections to it.
+
+    A PathClient may be shared by several threads: each call borrows a connection from the pool
+    (opening a new one if none is free and fewer than pool_size are open), and returns it when
+    done.
+
+    Instance Attributes:
+        - address: The address of the service, as given to PathService.start.
+        - pool_size: The most connections this client opens at once.
+
+    Representation Invariants:
+        - self.pool_size > 0
+    """
+    address: str
+    pool_size: int
+
+    # Private Instance Attributes:
+    #     - _idle: The open connections not currently in use.
+    #     - _slots: One token for every connection which may still be opened or borrowed.
+    #     - _next_id: The request id of the last request.
+    #     - _id_lock: Held while _next_id is advanced, since several threads may send requests.
+    _idle: queue.LifoQueue
+    _slots: queue.Queue
+    _next_id: int
+    _id_lock: threading.Lock
+
+    def __init__(self, address: str, pool_size: int = 4) -> None:
+        """Initialise a client for the service at address. Connections are opened when needed.
+
+        Preconditions:
+            - pool_size > 0
+        """
+        self.address = address
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(pool_size):
+            self._slots.put(None)
+        self._next_id = 0
+        self._id_lock = threading.Lock()
+
+    def path(self, start_loc: Tuple[int, int],
+             goal_loc: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        """Return a shortest path from start_loc to goal_loc, including both, or None if there is
+        none.
+        """
+        payload = self._request(PATH, _QUERY.pack(*start_loc, *goal_loc))
+        coords = struct.unpack(f'!{(len(payload) - _VERSION.size) // 2}H',
+                               payload[_VERSION.size:])
+        if len(coords) == 0:
+            return None
+        return [(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+
+    def distance(self, start_loc: Tuple[int, int], goal_loc: Tuple[int, int]) -> Optional[int]:
+        """Return the shortest distance from start_loc to goal_loc, or None if there is no path.
+        """
+        payload = self._request(DISTANCE, _QUERY.pack(*start_loc, *goal_loc))
+        _, distance = _DISTANCE.unpack(payload)
+        return None if distance < 0 else distance
+
+    def edit(self, loc: Tuple[int, int], tile_type: str) -> int:
+        """Change the tile at loc to tile_type, and return the graph version after the edit.
+
+        Preconditions:
+            - tile_type in {'normal', 'slow', 'obstacle'}
+        """
+        payload = self._request(EDIT, _EDIT.pack(loc[0], loc[1], TILE_TYPES.index(tile_type)))
+        return _VERSION.unpack(payload)[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the service's counters, as in PathService.counters.
+        """
+        return json.loads(self._request(STATS, b'').decode('utf-8'))
+
+    def close(self) -> None:
+        """Close every idle connection.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _request(self, message_type: int, payload: bytes) -> bytes:
+        """Send one request and return the payload of its response.
+
+        Raise RuntimeError if the service responds with an error.
+        """
+        with self._id_lock:
+            self._next_id = (self._next_id + 1) % (1 << 32)
+            request_id = self._next_id
+
+        with self._connection() as connection:
+            connection.sendall(_HEADER.pack(len(payload), message_type, request_id) + payload)
+            length, response_type, response_id = _HEADER.unpack(
+                _receive_exactly(connection, _HEADER.size))
+            response = _receive_exactly(connection, length)
+
+        if response_type == ERROR:
+            raise RuntimeError(f'path service error: {response.decode("utf-8")}')
+        assert response_id == request_id
+        return response
+
+    @contextmanager
+    def _connection(self) -> Iterator[socket.socket]:
+        """Borrow a connection from the pool for the duration of a with-block.
+
+        A connection which fails during the with-block is closed instead of being returned.
+        """
+        self._slots.get()  # Wait until a connection may be used
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                family, target = parse_address(self.address)
+                connection = socket.socket(family, socket.SOCK_STREAM)
+                connection.connect(target)
+
+            try:
+                yield connection
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.put(connection)
+        finally:
+            self._slots.put(None)
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """Return the socket family and socket address of an address given as 'unix:PATH' or
+    'HOST:PORT'.
+
+    >>> parse_address('unix:/tmp/paths.sock') == (socket.AF_UNIX, '/tmp/paths.sock')
+    True
+    >>> parse_address('127.0.0.1:7878') == (socket.AF_INET, ('127.0.0.1', 7878))
+    True
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, port = address.rsplit(':', 1)
+    return socket.AF_INET, (host, int(port))
+
+
+def _send(writer: asyncio.StreamWriter, message_type: int, request_id: int,
+          payload: bytes) -> None:
+    """Write one frame to writer.
+    """
+    writer.write(_HEADER.pack(len(payload), message_type, request_id) + payload)
+
+
+def _receive_exactly(connection: socket.socket, num_bytes: int) -> bytes:
+    """Read exactly num_bytes bytes from connection.
+
+    Raise ConnectionError if the connection is closed first.
+    """
+    data = bytearray()
+    while len(data) < num_bytes:
+        chunk = connection.recv(num_bytes - len(data))
+        if len(chunk) == 0:
+            raise ConnectionError('path service closed the connection')
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    """Return the given percentile of the sorted list ordered, using the nearest-rank method.
+
+    Preconditions:
+        - len(ordered) > 0
+        - 0 < percent <= 100
+    """
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def main(argv: List[str]) -> None:
+    """Run the path service described by the command line arguments argv until interrupted.
+    """
+    parser = argparse.ArgumentParser(description='Answer pathfinding queries over a socket.')
+    parser.add_argument('--listen', default='unix:/tmp/paths.sock',
+                        help="address to listen at, as 'unix:PATH' or 'HOST:PORT'")
+    parser.add_argument('--map', help='map file to load (default: a random map)')
+    parser.add_argument('--size', default='16x9', help='random map size as WIDTHxHEIGHT')
+    parser.add_argument('--batch-window', type=float, default=0.0,
+                        help='seconds to collect queries for before answering them')
+    args = parser.parse_args(argv)
+
+    if args.map is not None:
+        with open_map(args.map) as map_file:
+            graph = map_file.to_grid_graph()
+    else:
+        width, height = (int(n) for n in args.size.lower().split('x'))
+        graph = vg.dict_to_grid_graph(random_grid(width, height, (width - 1, height // 2)))
+
+    service = PathService(graph, args.batch_window)
+    try:
+        asyncio.run(service.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+"""CSC111 Winter 2021 Project - path_worker.py
+
+OBJECTIVE: Define PathWorker, which computes flow fields on a background thread so that tile
+edits never make the game loop wait for pathfinding.
+
+The worker keeps its own replica of the map's graph. Every tile edit made to the real graph is
+sent to the worker as a message, together with the real graph's version after the edit; the
+worker applies the edits to its replica in the same order, then computes a new FlowField for the
+latest version it has seen. The game loop polls for finished flow fields, and drops any whose
+version is no longer the real graph's version, since a newer one is already on its way.
+
+When edits arrive faster than flow fields can be computed, the worker applies every edit waiting
+in its queue before computing, so it only ever computes the flow field for the newest version.
+
+Since this is a thread, the computation still shares the interpreter with the game loop, but it
+is spread across many frames instead of stalling one of them.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import copy
+import queue
+import threading
+from typing import Optional, Tuple, Union
+import vertex_graph as vg
+from pathfinding import FlowField, GOAL_LOC
+
+
+class PathWorker:
+    """A background thread computing flow fields towards goal_loc for the latest version of
+    a graph.
+
+    Instance Attributes:
+        - goal_loc: The location every flow field leads to.
+        - computed: The number of flow fields computed so far.
+        - dropped: The number of flow fields dropped by poll because they were out of date.
+    """
+    goal_loc: Tuple[int, int]
+    computed: int
+    dropped: int
+
+    # Private Instance Attributes:
+    #     - _replica: The worker thread's own copy of the graph. Only the worker thread uses it.
+    #     - _requests: Messages for the worker thread, in the order they were sent:
+    #         ('edit', loc, tile_type, version) or ('stop',).
+    #     - _results: (version, flow field) pairs computed by the worker thread, oldest first.
+    #     - _thread: The worker thread.
+    _replica: vg.GridGraph
+    _requests: queue.Queue
+    _results: queue.Queue
+    _thread: threading.Thread
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 goal_loc: Tuple[int, int] = GOAL_LOC) -> None:
+        """Copy graph and start the worker thread.
+
+        Preconditions:
+            - graph was built by dict_to_graph or dict_to_grid_graph
+            - graph.has_vertex(goal_loc)
+        """
+        if isinstance(graph, vg.WeightedGraph):
+            self._replica = graph.to_grid_graph()
+        else:
+            self._replica = copy.deepcopy(graph)
+
+        self.goal_loc = goal_loc
+        self.computed = 0
+        self.dropped = 0
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def edit(self, loc: Tuple[int, int], tile_type: str, version: int) -> None:
+        """Tell the worker that the tile at loc was changed to tile_type, after which the real
+        graph's version was version. A new flow field will be computed.
+
+        Edits must be sent in the order they were made.
+        """
+        self._requests.put(('edit', loc, tile_type, version))
+
+    def poll(self, version: int) -> Optional[FlowField]:
+        """Return the newest finished flow field if it was computed for the given (current) graph
+        version, or None if there is none. Out of date flow fields are dropped.
+        """
+        latest = None
+        while True:
+            try:
+                result_version, field = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result_version == version:
+                latest = field
+            else:
+                self.dropped += 1
+        return latest
+
+    def stop(self) -> None:
+        """Stop the worker thread, after it finishes what it is currently computing.
+        """
+        self._requests.put(('stop',))
+        self._thread.join()
+
+    def _run(self) -> None:
+        """The body of the worker thread.
+        """
+        while True:
+            # Wait for a message, then take every other message already waiting.
+            messages = [self._requests.get()]
+            while True:
+                try:
+                    messages.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            version = None
+            for message in messages:
+                if message[0] == 'stop':
+                    return
+                _, loc, tile_type, version = message
+                self._replica.set_tile(loc, tile_type)
+
+            if version is not None and self._replica.has_vertex(self.goal_loc):
+                self._results.put((version, FlowField(self._replica, self.goal_loc)))
+                self.computed += 1
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['copy', 'queue', 'threading', 'vertex_graph', 'pathfinding'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -5,20 +5,87 @@ PLEASE REFER TO THE [COMPUTATIONAL OVERVIEW] SECTION IN THE REPORT BEFORE READIN
 OBJECTIVE: Define functions responsible for finding the shortest path between two locations,
 given a WeightedGraph representation of the 16x9 map.
 
+Also define SearchTask, an a_star_pathfinding search which can be spread across many frames,
+FlowField, a table of shortest paths from every location to the goal,
+which can be shared by every enemy unit heading to that goal,
+and PathCache, which remembers recent a_star_pathfinding results across tile edits.
+
+batch_pathfind runs many searches on the same graph across several processes,
+and bidirectional_pathfinding searches from both endpoints at once.
+
 The meat and bones of this project.
 
 This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang."""
 
-from typing import Tuple, List, Dict, Union
+from typing import Tuple, List, Dict, Union, Optional, Set, Callable, Iterable, FrozenSet
+from collections import OrderedDict
 from heapq import heappush, heappop
 import math
+import os
+import time
 import vertex_graph as vg
+import priority_queues as pq
+
+# Goal location used when no other goal is given.
+GOAL_LOC = (15, 4)
+
+# A single goal location, or a collection of goal locations (any one of which may be reached).
+Goals = Union[Tuple[int, int], Iterable[Tuple[int, int]]]
+
+
+class SearchStats:
+    """Statistics about a single call to a_star_pathfinding, for profiling.
+
+    Instance Attributes:
+        - nodes_expanded: The number of times a location was popped and its neighbours examined.
+        - heap_pushes: The number of entries pushed onto the priority queue.
+        - stale_pops: The number of popped entries for locations which had already been expanded.
+        - reopened: The number of times a cheaper path was found to an already expanded location.
+        - peak_open_size: The largest size of the priority queue during the search.
+        - path_cost: The total edge weight of the path found, or None if there was no path.
+        - wall_time: The time the search took, in seconds.
+    """
+    nodes_expanded: int
+    heap_pushes: int
+    stale_pops: int
+    reopened: int
+    peak_open_size: int
+    path_cost: Optional[float]
+    wall_time: float
+
+    def __init__(self) -> None:
+        """Initialise all statistics to zero (and path_cost to None)."""
+        self.nodes_expanded = 0
+        self.heap_pushes = 0
+        self.stale_pops = 0
+        self.reopened = 0
+        self.peak_open_size = 0
+        self.path_cost = None
+        self.wall_time = 0.0
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """Return these statistics as a dictionary, e.g. for writing out as JSON.
+        """
+        return {'nodes_expanded': self.nodes_expanded, 'heap_pushes': self.heap_pushes,
+                'stale_pops': self.stale_pops, 'reopened': self.reopened,
+                'peak_open_size': self.peak_open_size, 'path_cost': self.path_cost,
+                'wall_time': self.wall_time}
 
 
-def a_star_pathfinding(graph_representation: vg.WeightedGraph, start_loc: Tuple[int, int],
-                       is_dstra: bool = False) -> List[Tuple[int, int]]:
+def a_star_pathfinding(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                       start_loc: Tuple[int, int], is_dstra: bool = False,
+                       stats: Optional[SearchStats] = None,
+                       on_expand: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                       on_push: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                       queue: str = 'auto',
+                       heuristic: Optional[Callable[[Tuple[int, int]], float]] = None,
+                       goal: Goals = GOAL_LOC) -> List[Tuple[int, int]]:
     """Perform an A* path search on the given graph.
-    The search is done on start_loc to GOAL_LOC as endpoints.
+    The search is done on start_loc to goal as endpoints.
+
+    goal is either a single goal location or a collection of them. With several goals, a single
+    search finds the shortest path to whichever goal is closest, and stops as soon as any goal
+    is popped from the priority queue.
 
     Return a list of locations which make up the final shortest path,
     including the start and goal locations.
@@ -29,57 +96,743 @@ def a_star_pathfinding(graph_representation: vg.WeightedGraph, start_loc: Tuple[
     The Wikipedia Article for the A* Search Algorithm was referred to during the implementation of
     this function.
 
+    graph_representation may be either a WeightedGraph or a GridGraph.
+
+    For profiling, the following optional arguments may be given. When they are left as None,
+    the search only pays for a few "is None" checks.
+        - stats: a SearchStats object, which is filled in with statistics about this search
+        - on_expand: called with (location, cost from start) whenever a location is expanded
+        - on_push: called with (location, score) whenever a location is pushed onto the
+                   priority queue
+
+    queue chooses the priority queue used for the open list (see priority_queues.py):
+        - 'binary': a binary heap which skips stale entries
+        - 'indexed': a binary heap with decrease-key
+        - 'bucket': a bucket queue (Dial's algorithm), only for integer scores
+        - 'auto': 'bucket' when all scores are integers, and 'binary' otherwise
+
+    heuristic replaces the default Euclidean distance heuristic when is_dstra == False.
+    It must be consistent, such as a heuristics.ManhattanHeuristic or heuristics.LandmarkHeuristic
+    for goal. Scores are integers when all edge weights are integers and either is_dstra is True
+    or heuristic has an "integral" attribute which is True.
+
+    With several goals, the default heuristic is the Euclidean distance to the nearest goal,
+    which is worked out once per location reached. For many goals, pass a
+    heuristics.ManhattanHeuristic for them instead: it is a table of the distance to the nearest
+    goal, so each lookup costs the same however many goals there are.
+
     Preconditions:
         - start_loc in graph_representation.get_all_vertices()
+        - queue in {'auto', 'binary', 'indexed', 'bucket'}
+        - queue != 'bucket' or all scores are integers
+        - goal is a location or a non-empty collection of locations
+    """
+    return _a_star_search(graph_representation, start_loc, is_dstra,
+                          stats, on_expand, on_push, queue, heuristic, goal)[0]
+
+
+def _a_star_search(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                   start_loc: Tuple[int, int], is_dstra: bool,
+                   stats: Optional[SearchStats] = None,
+                   on_expand: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                   on_push: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                   queue: str = 'auto',
+                   heuristic: Optional[Callable[[Tuple[int, int]], float]] = None,
+                   goal: Goals = GOAL_LOC) \
+        -> Tuple[Optional[List[Tuple[int, int]]], Dict[Tuple[int, int], Optional[Tuple[int, int]]]]:
+    """Perform the search for a_star_pathfinding.
+
+    Return the path (or None, if the goal cannot be reached) together with the came_from
+    dictionary of the search, whose keys are every location the search reached.
     """
-    # Goal location is always (15, 4)
-    GOAL_LOC = (15, 4)
+    task = SearchTask(graph_representation, start_loc, is_dstra,
+                      stats, on_expand, on_push, queue, heuristic, goal)
+    task.step()
+    return task.path, task.came_from
+
+
+class SearchTask:
+    """An a_star_pathfinding search which can be run a few expansions at a time.
+
+    Every call to step expands at most a given number of locations, so a game loop can spend a
+    fixed budget on a search every frame however large the map is, and draw the search's open and
+    closed sets as they grow in between. Once done is True, path is exactly what
+    a_star_pathfinding returns for the same arguments.
+
+    The graph must not be edited until the search is done.
+
+    Sample Usage:
+        task = SearchTask(graph, start_loc)
+        while not task.step(200):  # Once per frame
+            ...
+
+    Instance Attributes:
+        - graph: The graph being searched.
+        - start_loc: The location the search started from.
+        - is_dstra: True for Dijkstra's Algorithm, False for A*.
+        - goals: The locations the search stops at, as soon as it reaches any of them.
+        - done: Whether the search has finished.
+        - path: The shortest path found, or None if the search is not done or there is no path.
+        - came_from: Maps every location reached so far to the location it was reached from
+                     (start_loc maps to None).
+        - cost_to_loc: Maps every location reached so far to the cost of the cheapest known path
+                       to it from start_loc.
+        - closed: Every location expanded so far.
+
+    Representation Invariants:
+        - self.came_from.keys() == self.cost_to_loc.keys()
+        - self.closed.issubset(self.came_from.keys())
+        - len(self.goals) > 0
+        - self.path is None or self.path[-1] in self.goals
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    start_loc: Tuple[int, int]
+    is_dstra: bool
+    goals: FrozenSet[Tuple[int, int]]
+    done: bool
+    path: Optional[List[Tuple[int, int]]]
+    came_from: Dict[Tuple[int, int], Optional[Tuple[int, int]]]
+    cost_to_loc: Dict[Tuple[int, int], float]
+    closed: Set[Tuple[int, int]]
+
+    # Private Instance Attributes:
+    #     - _stats, _on_expand, _on_push, _heuristic: As given to a_star_pathfinding.
+    #     - _priorityq: The open list.
+    _stats: Optional[SearchStats]
+    _on_expand: Optional[Callable[[Tuple[int, int], float], None]]
+    _on_push: Optional[Callable[[Tuple[int, int], float], None]]
+    _heuristic: Callable[[Tuple[int, int]], float]
+    _priorityq: Union[pq.BinaryHeapQueue, pq.IndexedHeapQueue, pq.BucketQueue]
+
+    def __init__(self, graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                 start_loc: Tuple[int, int], is_dstra: bool = False,
+                 stats: Optional[SearchStats] = None,
+                 on_expand: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                 on_push: Optional[Callable[[Tuple[int, int], float], None]] = None,
+                 queue: str = 'auto',
+                 heuristic: Optional[Callable[[Tuple[int, int]], float]] = None,
+                 goal: Goals = GOAL_LOC) -> None:
+        """Start a search with the same arguments as a_star_pathfinding, without expanding any
+        location yet.
+
+        stats is filled in as the search runs; its wall_time counts only the time spent in
+        step.
+
+        Preconditions:
+            - (same as a_star_pathfinding)
+        """
+        self.goals = goal_set(goal)
+        if heuristic is None:
+            heuristic = _euclidean_heuristic(self.goals)
+
+        # When a consistent heuristic is used, a neighbour's score is at most two edge weights
+        # more than the score of the location being expanded.
+        max_step = graph_representation.max_edge_weight()
+        integral = max_step is not None and (is_dstra or getattr(heuristic, 'integral', False))
+        if not is_dstra and max_step is not None:
+            max_step *= 2
+        if queue == 'auto':
+            queue = 'bucket' if integral else 'binary'
+
+        self.graph = graph_representation
+        self.start_loc = start_loc
+        self.is_dstra = is_dstra
+        self.done = False
+        self.path = None
+        self.came_from = {start_loc: None}
+        self.cost_to_loc = {start_loc: 0}
+        self.closed = set()
+        self._stats = stats
+        self._on_expand = on_expand
+        self._on_push = on_push
+        self._heuristic = heuristic
+
+        self._priorityq = pq.make_queue(queue, max_step)  # Our priority queue to be used in A*.
+        self._priorityq.push(start_loc, 0 if is_dstra else heuristic(start_loc))
+
+        if stats is not None:
+            stats.heap_pushes += 1  # For start_loc
+            stats.peak_open_size = max(stats.peak_open_size, 1)
+
+    def open_locs(self) -> Set[Tuple[int, int]]:
+        """Return every location reached but not yet expanded.
+        """
+        return self.came_from.keys() - self.closed
+
+    def step(self, max_expansions: Optional[int] = None) -> bool:
+        """Continue the search, expanding at most max_expansions locations (or as many as needed
+        if max_expansions is None). Return whether the search is done.
+
+        Preconditions:
+            - max_expansions is None or max_expansions > 0
+        """
+        if self.done:
+            return True
+
+        stats = self._stats
+        if stats is not None:
+            start_time = time.perf_counter()
 
-    priorityq = []  # Our priority queue to be used in A*.
-    heappush(priorityq, (0, start_loc))
+        # Local variables, since the loop below runs once per expanded location.
+        graph_representation, is_dstra, heuristic = self.graph, self.is_dstra, self._heuristic
+        on_expand, on_push = self._on_expand, self._on_push
+        priorityq, came_from, cost_to_loc, closed, goals = \
+            self._priorityq, self.came_from, self.cost_to_loc, self.closed, self.goals
+        budget = max_expansions if max_expansions is not None else math.inf
 
-    came_from = {start_loc: None}
-    cost_to_loc = {start_loc: 0}
+        while budget > 0:
+            if len(priorityq) == 0:  # The goal cannot be reached.
+                self.done = True
+                break
 
-    while len(priorityq) != 0:  # While priority queue is not empty
-        current_loc = heappop(priorityq)[1]  # Pick the topmost location in the priority queue
+            current_loc = priorityq.pop()[1]  # Pick the topmost location in the priority queue
 
-        if current_loc == GOAL_LOC:  # When the topmost location in the priority queue,
-            return _reconstruct_path(came_from, GOAL_LOC)  # We can safely terminate.
+            if current_loc in goals:  # When the topmost location in the priority queue,
+                self.path = _reconstruct_path(came_from, current_loc)  # We can safely terminate.
+                self.done = True
+                break
 
-        # Expand into neighbours
-        for neighbour_loc in graph_representation.get_neighbours(current_loc):
-            # Calculate cost to neighbour (without heuristic value)
-            # using currently known smallest cost
-            cost = cost_to_loc[current_loc] + graph_representation.get_weight(current_loc,
-                                                                              neighbour_loc)
+            budget -= 1
+            if stats is not None:
+                stats.nodes_expanded += 1
+            closed.add(current_loc)
+            if on_expand is not None:
+                on_expand(current_loc, cost_to_loc[current_loc])
 
-            if (neighbour_loc not in cost_to_loc) or (cost < cost_to_loc[neighbour_loc]):
-                # If cost from start to neighbour loc is infinity (not in cost_to_loc),
-                # or this path to neighbour_loc is better than any previous non-infinity path
+            # Expand into neighbours
+            for neighbour_loc, weight in graph_representation.iter_edges(current_loc):
+                # Calculate cost to neighbour (without heuristic value)
+                # using currently known smallest cost
+                cost = cost_to_loc[current_loc] + weight
 
-                # Update cost and came_from info for that neighbour_loc.
-                cost_to_loc[neighbour_loc] = cost
-                came_from[neighbour_loc] = current_loc
+                if (neighbour_loc not in cost_to_loc) or (cost < cost_to_loc[neighbour_loc]):
+                    # If cost from start to neighbour loc is infinity (not in cost_to_loc),
+                    # or this path to neighbour_loc is better than any previous non-infinity path
+
+                    # Update cost and came_from info for that neighbour_loc.
+                    cost_to_loc[neighbour_loc] = cost
+                    came_from[neighbour_loc] = current_loc
+
+                    # Calculate new score (cost + heuristic value) for neighbour_loc
+                    score = cost
+                    if not is_dstra:
+                        score += heuristic(neighbour_loc)  # For Dijkstra's, heuristic(x) = 0
+
+                    priorityq.push(neighbour_loc, score)  # Push into priority queue.
+
+                    if stats is not None:
+                        stats.heap_pushes += 1
+                        stats.peak_open_size = max(stats.peak_open_size, len(priorityq))
+                        if neighbour_loc in closed:
+                            stats.reopened += 1
+                    if on_push is not None:
+                        on_push(neighbour_loc, score)
+
+        if stats is not None:
+            stats.stale_pops = priorityq.stale_pops
+            if self.path is not None:
+                stats.path_cost = cost_to_loc[self.path[-1]]
+            stats.wall_time += time.perf_counter() - start_time
+
+        return self.done
+
+
+def bidirectional_pathfinding(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                              start_loc: Tuple[int, int], is_dstra: bool = False,
+                              stats: Optional[SearchStats] = None,
+                              goal_loc: Tuple[int, int] = GOAL_LOC) \
+        -> Optional[List[Tuple[int, int]]]:
+    """Perform a bidirectional search on the given graph, from start_loc and goal_loc at once.
+
+    Return a shortest path in the same format as a_star_pathfinding, or None if there is none.
+    On long routes this expands far fewer locations, since each search only needs to cover about
+    half of the distance.
+
+    The search on the side with the smaller priority value is expanded each time. mu is the cost
+    of the best path found so far, through a location or edge where the two searches have met.
+    The searches stop once the two smallest priority values add up to at least mu, since no
+    unexplored path can be shorter than mu after that.
+
+    When is_dstra == False, the priority value of a location is its cost plus half of
+    (Euclidean distance to the opposite endpoint - Euclidean distance to its own endpoint).
+    These "average" heuristics of the two searches cancel out along any path, which keeps the
+    stopping rule above correct. This relies on the Euclidean distance being consistent,
+    which holds since every edge weight (at least 2) is at least the length (1) of the edge.
+
+    Preconditions:
+        - start_loc in graph_representation.get_all_vertices()
+    """
+    if stats is not None:
+        start_time = time.perf_counter()
+
+    endpoints = (start_loc, goal_loc)
+    # Index 0 is the search forward from start_loc; index 1 is the search back from goal_loc.
+    initial = 0 if is_dstra else _euclidean_distance(start_loc, goal_loc) / 2
+    priorityqs = ([(initial, start_loc)], [(initial, goal_loc)])
+    came_from = ({start_loc: None}, {goal_loc: None})
+    cost_to_loc = ({start_loc: 0}, {goal_loc: 0})
+    done = (set(), set())
+
+    best_cost = math.inf  # mu
+    meeting_loc = start_loc if start_loc == goal_loc else None
+    if meeting_loc is not None:
+        best_cost = 0
+
+    while len(priorityqs[0]) != 0 and len(priorityqs[1]) != 0:
+        # Throw away stale entries, so that the smallest priority values are accurate.
+        for side in (0, 1):
+            while len(priorityqs[side]) != 0 and priorityqs[side][0][1] in done[side]:
+                heappop(priorityqs[side])
+                if stats is not None:
+                    stats.stale_pops += 1
+        if len(priorityqs[0]) == 0 or len(priorityqs[1]) == 0:
+            break
+
+        top = (priorityqs[0][0][0], priorityqs[1][0][0])
+        if top[0] + top[1] >= best_cost:
+            break
+
+        side = 0 if top[0] <= top[1] else 1
+        other = 1 - side
+        current_loc = heappop(priorityqs[side])[1]
+        done[side].add(current_loc)
+        if stats is not None:
+            stats.nodes_expanded += 1
+
+        for neighbour_loc, weight in graph_representation.iter_edges(current_loc):
+            cost = cost_to_loc[side][current_loc] + weight
+
+            if neighbour_loc not in cost_to_loc[side] or cost < cost_to_loc[side][neighbour_loc]:
+                cost_to_loc[side][neighbour_loc] = cost
+                came_from[side][neighbour_loc] = current_loc
 
-                # Calculate new score (cost + heuristic value) for neighbour_loc
                 score = cost
                 if not is_dstra:
-                    score += _heuristic(neighbour_loc)  # For Dijkstra's Algorithm, heuristic(x) = 0
+                    score += (_euclidean_distance(neighbour_loc, endpoints[other])
+                              - _euclidean_distance(neighbour_loc, endpoints[side])) / 2
+                heappush(priorityqs[side], (score, neighbour_loc))
+
+                if stats is not None:
+                    stats.heap_pushes += 1
+                    stats.peak_open_size = max(stats.peak_open_size,
+                                               len(priorityqs[0]) + len(priorityqs[1]))
+
+            # Check whether the two searches meet at neighbour_loc.
+            if neighbour_loc in cost_to_loc[other] and \
+                    cost_to_loc[side][neighbour_loc] + cost_to_loc[other][neighbour_loc] < best_cost:
+                best_cost = cost_to_loc[side][neighbour_loc] + cost_to_loc[other][neighbour_loc]
+                meeting_loc = neighbour_loc
+
+    path = None
+    if meeting_loc is not None:
+        # Join the path from start_loc to meeting_loc with the path from meeting_loc to goal_loc.
+        path = [meeting_loc]
+        while came_from[0][path[-1]] is not None:
+            path.append(came_from[0][path[-1]])
+        path.reverse()
+        while came_from[1][path[-1]] is not None:
+            path.append(came_from[1][path[-1]])
+
+    if stats is not None:
+        stats.heap_pushes += 2  # For start_loc and goal_loc
+        stats.path_cost = best_cost if path is not None else None
+        stats.wall_time = time.perf_counter() - start_time
+
+    return path
+
+
+class FlowField:
+    """A table of shortest distances and next steps from every location to a single goal.
+
+    It is computed by a single run of Dijkstra's Algorithm outward from the goal.
+    Since the graph is undirected, following next_loc from any location traces out a
+    shortest path from that location to the goal.
+
+    Instance Attributes:
+        - graph: The graph this flow field was computed on.
+        - version: The value of graph.version when this flow field was computed.
+        - goal_loc: The location every path in this flow field leads to.
+        - distance: Maps each location connected to goal_loc to its shortest distance from it.
+        - next_step: Maps each location connected to goal_loc to the next location on a shortest
+                     path towards goal_loc. goal_loc itself maps to None.
+
+    Representation Invariants:
+        - self.distance.keys() == self.next_step.keys()
+        - self.next_step[self.goal_loc] is None
+    """
+    graph: Union[vg.WeightedGraph, vg.GridGraph]
+    version: int
+    goal_loc: Tuple[int, int]
+    distance: Dict[Tuple[int, int], int]
+    next_step: Dict[Tuple[int, int], Optional[Tuple[int, int]]]
+
+    def __init__(self, graph: Union[vg.WeightedGraph, vg.GridGraph],
+                 goal_loc: Tuple[int, int]) -> None:
+        """Compute the flow field towards goal_loc on the given graph.
+
+        Preconditions:
+            - goal_loc in graph.get_all_vertices()
+        """
+        self.graph = graph
+        self.version = graph.version
+        self.goal_loc = goal_loc
+        self.distance = {goal_loc: 0}
+        self.next_step = {goal_loc: None}
+
+        priorityq = [(0, goal_loc)]
+        done = set()
+
+        while len(priorityq) != 0:
+            dist, current_loc = heappop(priorityq)
+            if current_loc in done:  # A shorter distance was already found for this location
+                continue
+            done.add(current_loc)
+
+            for neighbour_loc, weight in graph.iter_edges(current_loc):
+                new_dist = dist + weight
+                if neighbour_loc not in self.distance or new_dist < self.distance[neighbour_loc]:
+                    self.distance[neighbour_loc] = new_dist
+                    self.next_step[neighbour_loc] = current_loc  # Step back towards the goal
+                    heappush(priorityq, (new_dist, neighbour_loc))
+
+    def is_current(self) -> bool:
+        """Return whether this flow field is still valid for self.graph.
+        """
+        return self.version == self.graph.version
 
-                heappush(priorityq, (score, neighbour_loc))  # Push into priority queue.
+    def next_loc(self, loc: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+        """Return the next location on a shortest path from loc to the goal.
 
+        Return None if loc is the goal, or is not connected to the goal.
+        """
+        return self.next_step.get(loc)
 
-def _heuristic(loc: Tuple[int]) -> float:
-    """Return the Euclidian distance from a given location to GOAL_LOC.
+    def path_from(self, loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Return a shortest path from loc to the goal, including both endpoints,
+        in the same format as a_star_pathfinding.
+
+        Return an empty list if loc is not connected to the goal.
+        """
+        if loc not in self.next_step:
+            return []
+
+        full_path = [loc]
+        while self.next_step[loc] is not None:
+            loc = self.next_step[loc]
+            full_path.append(loc)
+        return full_path
+
+
+# The most recently computed flow field for each goal location, used by get_flow_field.
+_flow_fields: Dict[Tuple[int, int], FlowField] = {}
+
+
+def get_flow_field(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                   goal_loc: Tuple[int, int] = GOAL_LOC) -> FlowField:
+    """Return the flow field towards goal_loc on the given graph.
+
+    The flow field is cached per (graph version, goal), so this only recomputes it
+    after the graph has been edited, no matter how many times it is called.
+
+    Preconditions:
+        - goal_loc in graph_representation.get_all_vertices()
+    """
+    field = _flow_fields.get(goal_loc)
+    if field is None or field.graph is not graph_representation or not field.is_current():
+        field = FlowField(graph_representation, goal_loc)
+        _flow_fields[goal_loc] = field
+    return field
+
+
+# The most recently built HierarchicalGraph for each cluster size, used by
+# hierarchical_pathfinding.
+_hierarchies: Dict[int, object] = {}
+
+
+def hierarchical_pathfinding(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                             start_loc: Tuple[int, int], goal_loc: Tuple[int, int] = GOAL_LOC,
+                             cluster_size: int = 16,
+                             refine: bool = True) -> Optional[List[Tuple[int, int]]]:
+    """Return a path from start_loc to goal_loc found by hierarchical pathfinding (HPA*), in the
+    same format as a_star_pathfinding, or None if there is no path.
+
+    The paths are not always shortest paths; see hierarchical.py for how far from shortest they
+    can be. The hierarchical.HierarchicalGraph is cached per (graph, cluster size), and only the
+    clusters touched by tile edits are rebuilt, so repeated calls on a large map only pay for
+    the abstract search and the refinement.
+
+    Preconditions:
+        - graph_representation.has_vertex(start_loc) and graph_representation.has_vertex(goal_loc)
+        - cluster_size > 0
+        - graph_representation is a GridGraph, or a WeightedGraph built by dict_to_graph
+    """
+    # Imported here, since hierarchical imports this module.
+    from hierarchical import HierarchicalGraph
+
+    hierarchy = _hierarchies.get(cluster_size)
+    if hierarchy is None or hierarchy.graph is not graph_representation:
+        hierarchy = HierarchicalGraph(graph_representation, cluster_size)
+        _hierarchies[cluster_size] = hierarchy
+    return hierarchy.find_path(start_loc, goal_loc, refine)
+
+
+class PathCache:
+    """A bounded, least-recently-used cache of a_star_pathfinding results on a single graph.
+
+    Each entry remembers every location its search reached. When the graph is edited with
+    set_tile, only the entries whose search reached an edited tile or one of its neighbours are
+    thrown away; all other cached paths are still shortest paths.
+    (A search which never reached a tile never expanded any of its neighbours, and A* only stops
+    once every unexpanded path is known to be no shorter than the one it found.)
+
+    Instance Attributes:
+        - capacity: The maximum number of paths kept in this cache.
+        - hits: The number of get_path calls answered from this cache.
+        - misses: The number of get_path calls which had to run a search.
+        - evictions: The number of entries thrown away to stay within capacity.
+        - invalidations: The number of entries thrown away because of tile edits.
+
+    Representation Invariants:
+        - self.capacity > 0
+        - len(self._entries) <= self.capacity
+    """
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+    # Private Instance Attributes:
+    #     - _graph: The graph which the cached paths were found on, or None if nothing is cached.
+    #     - _version: The version of _graph which the cached paths are valid for.
+    #     - _entries: Maps (start_loc, goal locations, is_dstra) to the path found and the set of
+    #         locations its search reached, least recently used first.
+    #     - _by_loc: Maps each location to the keys of the entries whose search reached it.
+    _graph: Optional[Union[vg.WeightedGraph, vg.GridGraph]]
+    _version: int
+    _entries: OrderedDict
+    _by_loc: Dict[Tuple[int, int], Set[tuple]]
+
+    def __init__(self, capacity: int = 256) -> None:
+        """Initialize an empty cache holding at most capacity paths.
+
+        Preconditions:
+            - capacity > 0
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._graph = None
+        self._version = 0
+        self._entries = OrderedDict()
+        self._by_loc = {}
+
+    def get_path(self, graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                 start_loc: Tuple[int, int], is_dstra: bool = False,
+                 goal: Goals = GOAL_LOC) -> Optional[List[Tuple[int, int]]]:
+        """Return a_star_pathfinding(graph_representation, start_loc, is_dstra, goal=goal),
+        reusing a cached result when it is still valid.
+
+        Preconditions:
+            - start_loc in graph_representation.get_all_vertices()
+        """
+        self._sync(graph_representation)
+
+        goals = goal_set(goal)
+        key = (start_loc, goals, is_dstra)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            path = self._entries[key][0]
+        else:
+            self.misses += 1
+            path, came_from = _a_star_search(graph_representation, start_loc, is_dstra,
+                                             goal=goals)
+            self._entries[key] = (path, came_from.keys())
+            for loc in came_from:
+                self._by_loc.setdefault(loc, set()).add(key)
+
+            if len(self._entries) > self.capacity:
+                self.evictions += 1
+                self._discard(next(iter(self._entries)))
+
+        if path is None:
+            return None
+        return list(path)  # Copy, so that callers cannot modify the cached path
+
+    def counters(self) -> Dict[str, int]:
+        """Return the hit, miss, eviction and invalidation counters of this cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
+
+    def clear(self) -> None:
+        """Remove every entry from this cache. The counters are not reset.
+        """
+        self._entries.clear()
+        self._by_loc.clear()
+
+    def _sync(self, graph_representation: Union[vg.WeightedGraph, vg.GridGraph]) -> None:
+        """Throw away every entry which is no longer valid for graph_representation.
+        """
+        if graph_representation is not self._graph:
+            self.clear()
+            self._graph = graph_representation
+
+        elif graph_representation.version != self._version:
+            changed = graph_representation.changes_since(self._version)
+            if changed is None:  # Too many edits to tell which ones happened
+                self.invalidations += len(self._entries)
+                self.clear()
+            else:
+                for loc in changed:
+                    for nearby_loc in [loc] + vg.lattice_neighbours(loc):
+                        for key in list(self._by_loc.get(nearby_loc, ())):
+                            self.invalidations += 1
+                            self._discard(key)
+
+        self._version = graph_representation.version
+
+    def _discard(self, key: tuple) -> None:
+        """Remove the entry with the given key from this cache.
+        """
+        _, reached = self._entries.pop(key)
+        for loc in reached:
+            keys = self._by_loc[loc]
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._by_loc[loc]
+
+
+def batch_pathfind(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                   starts: List[Tuple[int, int]], is_dstra: bool = False,
+                   workers: Optional[int] = None, costs_only: bool = False,
+                   goal: Goals = GOAL_LOC) -> list:
+    """Run a_star_pathfinding from every location in starts, using a pool of worker processes.
+
+    Return a list with one result per start location, in the same order as starts.
+    Each result is the path found, or its total cost if costs_only is True.
+    A start location which cannot reach goal (or any of its locations) gets None.
+
+    The graph is sent to each worker process only once, as a GridGraph (a WeightedGraph is
+    converted first). The start locations are split into chunks, several per worker,
+    so that workers which finish early can pick up more work.
+
+    When workers is None, one worker per CPU core is used.
+    When workers is 1, the searches are run in this process instead.
+
+    Preconditions:
+        - workers is None or workers >= 1
+        - all(start in graph_representation.get_all_vertices() for start in starts)
+        - graph_representation is a GridGraph, or a WeightedGraph built by dict_to_graph
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    goals = goal_set(goal)
+
+    if workers == 1 or len(starts) <= 1:
+        return _batch_chunk_on(graph_representation, starts, is_dstra, costs_only, goals)
+
+    if isinstance(graph_representation, vg.WeightedGraph):
+        graph_representation = graph_representation.to_grid_graph()
+
+    # Imported here, as importing multiprocessing takes longer than the rest of this module.
+    import multiprocessing
+
+    # About 4 chunks per worker balances the load without too much messaging.
+    chunk_size = max(1, -(-len(starts) // (workers * 4)))
+    chunks = [starts[i:i + chunk_size] for i in range(0, len(starts), chunk_size)]
+
+    with multiprocessing.Pool(workers, initializer=_init_batch_worker,
+                              initargs=(graph_representation,)) as pool:
+        chunk_results = pool.starmap(_batch_chunk,
+                                     [(chunk, is_dstra, costs_only, goals)
+                                      for chunk in chunks])
+
+    return [result for chunk_result in chunk_results for result in chunk_result]
+
+
+# Holds the graph searched by a batch_pathfind worker process, under the key 'graph'.
+# It is set once per process by _init_batch_worker.
+_batch_worker_state: Dict[str, vg.GridGraph] = {}
+
+
+def _init_batch_worker(graph_representation: vg.GridGraph) -> None:
+    """Store the graph sent to this batch_pathfind worker process.
+    """
+    _batch_worker_state['graph'] = graph_representation
+
+
+def _batch_chunk(starts: List[Tuple[int, int]], is_dstra: bool, costs_only: bool,
+                 goals: FrozenSet[Tuple[int, int]]) -> list:
+    """Run one chunk of batch_pathfind in a worker process.
+    """
+    return _batch_chunk_on(_batch_worker_state['graph'], starts, is_dstra, costs_only, goals)
+
+
+def _batch_chunk_on(graph_representation: Union[vg.WeightedGraph, vg.GridGraph],
+                    starts: List[Tuple[int, int]], is_dstra: bool, costs_only: bool,
+                    goals: FrozenSet[Tuple[int, int]]) -> list:
+    """Return the batch_pathfind results for starts on the given graph.
+    """
+    results = []
+    for start_loc in starts:
+        path = a_star_pathfinding(graph_representation, start_loc, is_dstra, goal=goals)
+        if path is not None and costs_only:
+            results.append(sum(graph_representation.get_weight(path[i], path[i + 1])
+                               for i in range(len(path) - 1)))
+        else:
+            results.append(path)
+    return results
+
+
+def goal_set(goal: Goals) -> FrozenSet[Tuple[int, int]]:
+    """Return the set of goal locations described by goal, which is either a single location or
+    a collection of locations.
+
+    >>> goal_set((15, 4)) == {(15, 4)}
+    True
+    >>> goal_set([(15, 4), (0, 0)]) == {(15, 4), (0, 0)}
+    True
+    """
+    if isinstance(goal, tuple) and len(goal) == 2 and isinstance(goal[0], int):
+        return frozenset([goal])
+    return frozenset(goal)
+
+
+def _euclidean_heuristic(goals: FrozenSet[Tuple[int, int]]) \
+        -> Callable[[Tuple[int, int]], float]:
+    """Return a function giving the Euclidian distance from a given location to the nearest
+    location in goals.
 
     In theory, the heuristic function for A* can be any consistent function which estimates
     the direction/distance from any given point to the goal.
     In our situation, Euclidian distance is good enough.
+
+    With several goals, the distance from each location is worked out once and remembered,
+    since a search asks for it again whenever it finds a cheaper path to that location.
+    """
+    if len(goals) == 1:
+        goal_x, goal_y = next(iter(goals))
+        return lambda loc: math.sqrt((goal_x - loc[0]) ** 2 + (goal_y - loc[1]) ** 2)
+
+    table = {}
+
+    def nearest_goal_distance(loc: Tuple[int, int]) -> float:
+        if loc not in table:
+            table[loc] = min(_euclidean_distance(loc, goal_loc) for goal_loc in goals)
+        return table[loc]
+
+    return nearest_goal_distance
+
+
+def _euclidean_distance(loc1: Tuple[int, int], loc2: Tuple[int, int]) -> float:
+    """Return the Euclidian distance between two locations.
     """
-    # Use Pythagorean theorem to calculate Euclidian distance
-    GOAL_LOC = (15, 4)
-    return math.sqrt(math.pow((GOAL_LOC[0] - loc[0]), 2) + math.pow((GOAL_LOC[1] - loc[1]), 2))
+    return math.sqrt((loc1[0] - loc2[0]) ** 2 + (loc1[1] - loc2[1]) ** 2)
 
 
 def _reconstruct_path(came_from: Dict[Tuple[int, int], Union[None, Tuple[int, int]]],
@@ -90,16 +843,13 @@ def _reconstruct_path(came_from: Dict[Tuple[int, int], Union[None, Tuple[int, in
     This is simply looking at the fastest location to current_loc,
     then looking at the fastest location to that location, and so on.
     """
-    GOAL_LOC = (15, 4)
-    full_path = []
+    full_path = [current_loc]
 
-    while current_loc in came_from:
+    while came_from[current_loc] is not None:
         current_loc = came_from[current_loc]
         full_path.append(current_loc)
 
-    full_path.remove(None)
     full_path.reverse()
-    full_path.append(GOAL_LOC)
     return full_path
 
 
@@ -111,7 +861,8 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 100,
         'disable': ['E1136'],
-        'extra-imports': ['vertex_graph', 'math', 'heapq'],
+        'extra-imports': ['vertex_graph', 'priority_queues', 'math', 'heapq', 'collections',
+                          'multiprocessing', 'os', 'time'],
         'allowed-io': [],
         'max-nested-blocks': 4
     })
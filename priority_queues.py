@@ -0,0 +1,260 @@
+"""CSC111 Winter 2021 Project - priority_queues.py
+
+OBJECTIVE: Define the priority queues which pathfinding can use as its open list.
+
+Every queue has the same interface:
+    - push(item, priority) adds item, or changes its priority if it is already queued
+    - pop() removes and returns the (priority, item) with the smallest priority
+    - len(queue) is the number of items queued
+    - stale_pops counts entries that were skipped because their item had been pushed again
+
+BinaryHeapQueue is the heapq-based queue pathfinding has always used, but it skips stale entries.
+IndexedHeapQueue is a binary heap with a true decrease-key operation, so it never has stale
+entries. BucketQueue is Dial's algorithm: for small integer priorities, every operation is O(1).
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import Any, Dict, List, Tuple, Optional, Union
+from heapq import heappush, heappop
+
+
+class BinaryHeapQueue:
+    """A binary heap (heapq) priority queue.
+
+    Changing the priority of a queued item pushes a second entry for it. The old entry is left in
+    the heap and skipped when it is popped.
+
+    Instance Attributes:
+        - stale_pops: The number of stale entries skipped so far.
+    """
+    stale_pops: int
+
+    # Private Instance Attributes:
+    #     - _heap: The heap of (priority, item) entries, including stale ones.
+    #     - _priority: Maps each queued item to its current priority.
+    _heap: List[Tuple[Union[int, float], Any]]
+    _priority: Dict[Any, Union[int, float]]
+
+    def __init__(self) -> None:
+        """Initialise an empty queue."""
+        self.stale_pops = 0
+        self._heap = []
+        self._priority = {}
+
+    def __len__(self) -> int:
+        return len(self._priority)
+
+    def push(self, item: Any, priority: Union[int, float]) -> None:
+        """Add item with the given priority, or change its priority if it is already queued.
+        """
+        self._priority[item] = priority
+        heappush(self._heap, (priority, item))
+
+    def pop(self) -> Tuple[Union[int, float], Any]:
+        """Remove and return the (priority, item) with the smallest priority.
+
+        Preconditions:
+            - len(self) > 0
+        """
+        while True:
+            priority, item = heappop(self._heap)
+            if self._priority.get(item) == priority:
+                del self._priority[item]
+                return priority, item
+            self.stale_pops += 1
+
+
+class IndexedHeapQueue:
+    """A binary heap priority queue which keeps track of where each item is in the heap,
+    so that changing an item's priority moves its one entry instead of adding another.
+
+    Ties are broken by comparing items, as with heapq.
+
+    Instance Attributes:
+        - stale_pops: Always 0, since this queue never has stale entries.
+    """
+    stale_pops: int
+
+    # Private Instance Attributes:
+    #     - _heap: The heap of (priority, item) entries.
+    #     - _index: Maps each queued item to the index of its entry in _heap.
+    _heap: List[Tuple[Union[int, float], Any]]
+    _index: Dict[Any, int]
+
+    def __init__(self) -> None:
+        """Initialise an empty queue."""
+        self.stale_pops = 0
+        self._heap = []
+        self._index = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Any, priority: Union[int, float]) -> None:
+        """Add item with the given priority, or change its priority if it is already queued.
+        """
+        if item in self._index:
+            i = self._index[item]
+            old_priority = self._heap[i][0]
+            self._heap[i] = (priority, item)
+            if priority < old_priority:
+                self._sift_up(i)
+            else:
+                self._sift_down(i)
+        else:
+            self._heap.append((priority, item))
+            self._index[item] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+
+    def pop(self) -> Tuple[Union[int, float], Any]:
+        """Remove and return the (priority, item) with the smallest priority.
+
+        Preconditions:
+            - len(self) > 0
+        """
+        top = self._heap[0]
+        last = self._heap.pop()
+        del self._index[top[1]]
+        if len(self._heap) != 0:
+            self._heap[0] = last
+            self._index[last[1]] = 0
+            self._sift_down(0)
+        return top
+
+    def _sift_up(self, i: int) -> None:
+        """Move the entry at index i up until its parent is no larger.
+        """
+        entry = self._heap[i]
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[parent] <= entry:
+                break
+            self._heap[i] = self._heap[parent]
+            self._index[self._heap[i][1]] = i
+            i = parent
+        self._heap[i] = entry
+        self._index[entry[1]] = i
+
+    def _sift_down(self, i: int) -> None:
+        """Move the entry at index i down until its children are no smaller.
+        """
+        entry = self._heap[i]
+        size = len(self._heap)
+        while 2 * i + 1 < size:
+            child = 2 * i + 1
+            if child + 1 < size and self._heap[child + 1] < self._heap[child]:
+                child += 1
+            if entry <= self._heap[child]:
+                break
+            self._heap[i] = self._heap[child]
+            self._index[self._heap[i][1]] = i
+            i = child
+        self._heap[i] = entry
+        self._index[entry[1]] = i
+
+
+class BucketQueue:
+    """A bucket priority queue for integer priorities (Dial's algorithm).
+
+    There is one bucket per priority value, reused cyclically. This works as long as every queued
+    priority is within max_step of the smallest one, and nothing is pushed below the last popped
+    priority. Both hold for Dijkstra's Algorithm when max_step is the largest edge weight.
+
+    Instance Attributes:
+        - max_step: The largest allowed difference between queued priorities.
+        - stale_pops: The number of stale entries skipped so far.
+
+    Representation Invariants:
+        - self.max_step >= 0
+    """
+    max_step: int
+    stale_pops: int
+
+    # Private Instance Attributes:
+    #     - _buckets: _buckets[p % len(_buckets)] holds the (priority, item) entries with priority
+    #         p, plus possibly some stale entries.
+    #     - _priority: Maps each queued item to its current priority.
+    #     - _cursor: No queued priority is smaller than this. It is the last popped priority
+    #         (or smaller), so that pushes made right after a pop are never rejected, and is None
+    #         before the first push.
+    _buckets: List[List[Tuple[int, Any]]]
+    _priority: Dict[Any, int]
+    _cursor: Optional[int]
+
+    def __init__(self, max_step: int) -> None:
+        """Initialise an empty queue.
+
+        Preconditions:
+            - max_step >= 0
+        """
+        self.max_step = max_step
+        self.stale_pops = 0
+        self._buckets = [[] for _ in range(max_step + 1)]
+        self._priority = {}
+        self._cursor = None
+
+    def __len__(self) -> int:
+        return len(self._priority)
+
+    def push(self, item: Any, priority: int) -> None:
+        """Add item with the given priority, or change its priority if it is already queued.
+
+        Raise a ValueError if priority is outside of the range this queue can hold.
+        """
+        if self._cursor is None or (len(self._priority) == 0 and priority < self._cursor):
+            self._cursor = priority
+        elif not self._cursor <= priority <= self._cursor + self.max_step:
+            raise ValueError
+
+        self._priority[item] = priority
+        self._buckets[priority % len(self._buckets)].append((priority, item))
+
+    def pop(self) -> Tuple[int, Any]:
+        """Remove and return the (priority, item) with the smallest priority.
+
+        Preconditions:
+            - len(self) > 0
+        """
+        while True:
+            bucket = self._buckets[self._cursor % len(self._buckets)]
+            while len(bucket) != 0:
+                priority, item = bucket.pop()
+                # Since queued priorities span at most max_step + 1 values, any other entry
+                # in this bucket must be stale.
+                if priority == self._cursor and self._priority.get(item) == priority:
+                    del self._priority[item]
+                    return priority, item
+                self.stale_pops += 1
+            self._cursor += 1
+
+
+def make_queue(kind: str, max_step: Optional[int] = None) \
+        -> Union[BinaryHeapQueue, IndexedHeapQueue, BucketQueue]:
+    """Return a new, empty priority queue of the given kind.
+
+    max_step is only used by (and required for) 'bucket' queues.
+
+    Preconditions:
+        - kind in {'binary', 'indexed', 'bucket'}
+        - kind != 'bucket' or max_step is not None
+    """
+    if kind == 'binary':
+        return BinaryHeapQueue()
+    elif kind == 'indexed':
+        return IndexedHeapQueue()
+    else:
+        return BucketQueue(max_step)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['heapq'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -0,0 +1,225 @@
+"""CSC111 Winter 2021 Project - renderer.py
+
+OBJECTIVE: Define Renderer, which draws the game map and enemy units for main.py while only
+pushing the parts of the screen that changed to the display.
+
+Tiles and UI bars are drawn onto a cached background surface, which is only redrawn where a tile
+or bar changes. Every frame, the areas covered by enemy units and path lines in the previous frame
+are restored from the background, the enemy units and path lines are drawn again, and only those
+areas are passed to pygame.display.update.
+
+Units all follow the same field, so their paths to the goal form a tree. Each unit only draws the
+short line to the tile it is moving towards, and every tile's onward path is drawn once per frame
+as one polyline per branch, at most _MAX_PATH_TILES tiles in total. The work done per frame
+therefore depends on the number of enemy units, not on the size of the map or the length of
+their paths.
+
+Only the tiles which fit on the screen are ever looked up, so a map opened from a map file
+(mapfile.MapFile) of any size is drawn without reading the rest of it.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import List, Tuple, Dict, Optional, Sequence, Union
+import pygame
+from frame_profiler import FrameProfiler
+from mapfile import MapFile
+from swarm import Swarm
+from tools import TILE_SIZE, convert_loc_to_pos
+
+# The most path tiles drawn per frame, beyond which the rest of the path lines are left out.
+_MAX_PATH_TILES = 2048
+
+
+class Renderer:
+    """Draws the game onto a screen surface using dirty rectangles.
+
+    Instance Attributes:
+        - screen: The display surface being drawn to.
+        - background: The cached surface holding every tile and UI bar.
+    """
+    screen: pygame.Surface
+    background: pygame.Surface
+
+    # Private Instance Attributes:
+    #     - _tile_images: Maps each tile type to the image drawn for it.
+    #     - _bars: Maps each UI bar position (its top-left pixel) to the image drawn there.
+    #     - _background_dirty: The areas of background changed since the last frame.
+    #     - _sprite_rects: The areas drawn over by enemy units and path lines in the last frame.
+    #     - _full_redraw: Whether the whole screen must be pushed on the next frame.
+    #     - _overlays: Maps the name of each image drawn over everything else every frame (such
+    #                  as the profiler HUD) to that image and its top-left pixel.
+    _tile_images: Dict[str, pygame.Surface]
+    _bars: Dict[Tuple[int, int], pygame.Surface]
+    _background_dirty: List[pygame.Rect]
+    _sprite_rects: List[pygame.Rect]
+    _full_redraw: bool
+    _overlays: Dict[str, Tuple[pygame.Surface, Tuple[int, int]]]
+
+    def __init__(self, screen: pygame.Surface, tile_images: Dict[str, pygame.Surface],
+                 grid: Union[Dict[Tuple[int, int], str], MapFile]) -> None:
+        """Draw every tile of grid which fits on screen onto a new background surface for screen.
+
+        tile_images maps each tile type in grid to the image drawn for it.
+        """
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self._tile_images = tile_images
+        self._bars = {}
+        self._background_dirty = []
+        self._sprite_rects = []
+        self._full_redraw = True
+        self._overlays = {}
+
+        screen_width, screen_height = screen.get_size()
+        for x in range(-(-screen_width // TILE_SIZE)):
+            for y in range(-(-screen_height // TILE_SIZE)):
+                tile_type = grid.get((x, y))
+                if tile_type is not None:
+                    self.set_tile((x, y), tile_type)
+
+    def set_tile(self, loc: Tuple[int, int], tile_type: str) -> None:
+        """Redraw the tile at loc on the background, as the given tile type.
+        """
+        rect = self.background.blit(self._tile_images[tile_type],
+                                    convert_loc_to_pos(loc, 'topleft'))
+        self._background_dirty.append(rect)
+
+    def set_bar(self, image: pygame.Surface, topleft: Tuple[int, int]) -> None:
+        """Draw image on the background with its top-left corner at the given pixel position,
+        unless it is already the image drawn there.
+        """
+        if self._bars.get(topleft) is not image:
+            self._bars[topleft] = image
+            self._background_dirty.append(self.background.blit(image, topleft))
+
+    def set_overlay(self, image: Optional[pygame.Surface],
+                    topleft: Tuple[int, int] = (0, 0), name: str = 'hud') -> None:
+        """Draw image over everything else on every frame from now on, with its top-left corner
+        at the given pixel position, in place of the last overlay with the same name. When image
+        is None, stop drawing the overlay with that name.
+        """
+        if image is None:
+            self._overlays.pop(name, None)
+        else:
+            self._overlays[name] = (image, topleft)
+
+    def draw(self, enemies: Swarm, enemy_image: pygame.Surface,
+             colour: Tuple[int, int, int], profiler: Optional[FrameProfiler] = None,
+             highlight: Sequence[Tuple[int, int]] = ()) -> None:
+        """Draw one frame: every enemy unit as enemy_image, and its path line in the given colour,
+        over the background. Only the areas which changed since the last frame are pushed to the
+        display.
+
+        The path of locations highlight (such as Simulation.sample_search's path) is drawn as a
+        thicker line in the same colour.
+
+        When profiler is given, the drawing is marked as its 'draw' phase, so that the rest of
+        this call is the time taken to push the changes to the display.
+        """
+        # Erase the last frame's enemy units and path lines, and copy over background changes.
+        if self._full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            restored = []
+        else:
+            restored = self._sprite_rects + self._background_dirty
+            for rect in restored:
+                self.screen.blit(self.background, rect, rect)
+
+        # Path lines are drawn first, so that enemy units are drawn over them.
+        sprite_rects = self._draw_pathlines(enemies, colour)
+        if len(highlight) > 1:
+            sprite_rects.append(pygame.draw.lines(
+                self.screen, colour, False,
+                [convert_loc_to_pos(loc, 'centre') for loc in highlight], 6))
+        sprite_rects.extend(self.screen.blits([(enemy_image, topleft)
+                                               for topleft in enemies.topleft_positions()],
+                                              doreturn=True))
+        for image, topleft in self._overlays.values():
+            sprite_rects.append(self.screen.blit(image, topleft))
+
+        if profiler is not None:
+            profiler.mark('draw')
+        if self._full_redraw:
+            pygame.display.flip()
+            self._full_redraw = False
+        else:
+            pygame.display.update(restored + sprite_rects)
+
+        self._sprite_rects = sprite_rects
+        self._background_dirty = []
+
+    def _draw_pathlines(self, enemies: Swarm,
+                        colour: Tuple[int, int, int]) -> List[pygame.Rect]:
+        """Draw the path line of every unit in enemies in the given colour, and return the areas
+        drawn over.
+
+        Every unit gets a line from its centre to the tile it is moving towards. From there, the
+        path is followed along enemies.field only until it joins a path already drawn this frame,
+        so every path tile is drawn once, by a single pygame.draw.lines call per branch.
+        """
+        rects = []
+        field = enemies.field
+        drawn = set()  # The tiles whose onward path has been drawn this frame
+        budget = _MAX_PATH_TILES
+        for centre, target in zip(zip(enemies.x, enemies.y), enemies.target_locs()):
+            if target is None:
+                continue
+            target_pos = convert_loc_to_pos(target, 'centre')
+            rects.append(pygame.draw.line(self.screen, colour, centre, target_pos, 2))
+            if target in drawn or budget <= 0:
+                continue
+
+            # Follow the path towards the goal, up to the first tile already drawn.
+            points = [target_pos]
+            loc = target
+            drawn.add(loc)
+            while budget > 0:
+                loc = field.next_loc(loc)
+                if loc is None:
+                    break
+                points.append(convert_loc_to_pos(loc, 'centre'))
+                budget -= 1
+                if loc in drawn:
+                    break
+                drawn.add(loc)
+            if len(points) > 1:
+                rects.append(pygame.draw.lines(self.screen, colour, False, points, 2))
+        return rects
+
+    def invalidate(self, rect: Optional[pygame.Rect] = None) -> None:
+        """Force rect (or the whole screen, if rect is None) to be pushed on the next frame,
+        such as after something else drew onto the screen.
+        """
+        if rect is None:
+            self._full_redraw = True
+        else:
+            self._background_dirty.append(rect)
+
+
+def render_text_panel(font: pygame.font.Font, lines: List[str]) -> pygame.Surface:
+    """Return an image of lines of text in font, in white on a dark background, such as for
+    Renderer.set_overlay.
+    """
+    rendered = [font.render(line, True, (255, 255, 255)) for line in lines]
+    line_height = font.get_linesize()
+    panel = pygame.Surface((max((text.get_width() for text in rendered), default=0) + 8,
+                            line_height * len(rendered) + 8)).convert()
+    panel.fill((16, 16, 16))
+    for i, text in enumerate(rendered):
+        panel.blit(text, (4, 4 + i * line_height))
+    return panel
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['pygame', 'frame_profiler', 'mapfile', 'swarm', 'tools'],
+        'allowed-io': [],
+        'max-nested-blocks': 4,
+        'generated-members': ['pygame.*']
+    })
@@ -0,0 +1,180 @@
+"""CSC111 Winter 2021 Project - route.py
+
+OBJECTIVE: Print shortest paths and their costs on a map file, from the command line, without
+starting the game.
+
+Only the headless modules are imported (mapfile, vertex_graph, pathfinding and priority_queues),
+none of which import pygame, so a route command starts in tens of milliseconds. Every start
+location prints one line: the start, the cost of its shortest path to the goal and the path
+itself, as space separated x,y locations. Starts which cannot reach the goal print a cost of -1
+and no path.
+
+By default, a few starts are searched one at a time with a_star_pathfinding, and many starts
+share a single FlowField towards the goal.
+
+Locations are written X,Y, and must lie on the map. Since argparse reads an argument starting
+with '-' as an option, a (negative, so off the map) location such as -1,0 has to be given as
+--from=-1,0 to be reported as off the map.
+
+Sample Usage (from the command line):
+    python -m route big.map --from 0,0 --from 10,3
+    python -m route big.map --random 1000 --seed 0 --costs-only
+    python -m route big.map --random 5 --goal 0,0 --method a_star
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import argparse
+import random
+import sys
+import time
+from typing import List, Optional, Tuple, Union
+
+import vertex_graph as vg
+from mapfile import MapFile, open_map
+from pathfinding import FlowField, SearchStats, a_star_pathfinding
+
+# With method 'auto', at least this many starts share a FlowField instead of separate searches.
+_FIELD_MIN_STARTS = 16
+
+# A route: the start location, the cost of its shortest path (None if the goal cannot be
+# reached) and the path itself, including both endpoints (empty if the goal cannot be reached).
+Route = Tuple[Tuple[int, int], Optional[int], List[Tuple[int, int]]]
+
+
+def find_routes(graph: Union[vg.WeightedGraph, vg.GridGraph], starts: List[Tuple[int, int]],
+                goal_loc: Tuple[int, int], method: str = 'auto') -> List[Route]:
+    """Return the route from every location in starts to goal_loc on graph, in order.
+
+    method chooses how the routes are found:
+        - 'a_star': a separate a_star_pathfinding search per start
+        - 'flow_field': a single FlowField towards goal_loc, shared by every start
+        - 'auto': 'flow_field' for at least _FIELD_MIN_STARTS starts, and 'a_star' otherwise
+
+    Preconditions:
+        - method in {'auto', 'a_star', 'flow_field'}
+        - graph.has_vertex(goal_loc)
+    """
+    if method == 'auto':
+        method = 'flow_field' if len(starts) >= _FIELD_MIN_STARTS else 'a_star'
+
+    routes = []
+    if method == 'flow_field':
+        field = FlowField(graph, goal_loc)
+        for start in starts:
+            routes.append((start, field.distance.get(start), field.path_from(start)))
+        return routes
+
+    for start in starts:
+        if not graph.has_vertex(start):
+            routes.append((start, None, []))
+            continue
+        stats = SearchStats()
+        path = a_star_pathfinding(graph, start, stats=stats, goal=goal_loc)
+        routes.append((start, stats.path_cost, path or []))  # None when there is no path
+    return routes
+
+
+def random_starts(map_file: MapFile, num_starts: int,
+                  rng: random.Random = random) -> List[Tuple[int, int]]:
+    """Return num_starts random locations on map_file which are not obstacles.
+
+    Return fewer locations if num_starts * 100 random picks found fewer than that.
+    """
+    width, height, tiles = map_file.width, map_file.height, map_file.tiles
+    starts = []
+    for _ in range(num_starts * 100):
+        if len(starts) == num_starts:
+            break
+        node = rng.randrange(width * height)
+        if tiles[node] != 0:  # 0 is an obstacle in mapfile.TILE_TYPES
+            starts.append((node // height, node % height))
+    return starts
+
+
+def format_route(route: Route, costs_only: bool = False) -> str:
+    """Return the line printed for route.
+
+    >>> format_route(((0, 0), 2, [(0, 0), (1, 0)]))
+    '0,0 2 0,0 1,0'
+    >>> format_route(((0, 0), None, []))
+    '0,0 -1'
+    >>> format_route(((0, 0), 2, [(0, 0), (1, 0)]), costs_only=True)
+    '0,0 2'
+    """
+    start, cost, path = route
+    line = f'{start[0]},{start[1]} {-1 if cost is None else cost}'
+    if costs_only or not path:
+        return line
+    return line + ' ' + ' '.join(f'{x},{y}' for x, y in path)
+
+
+def _parse_loc(text: str) -> Tuple[int, int]:
+    """Return the location written as X,Y in text.
+
+    Raise argparse.ArgumentTypeError if text is not of that form, or either coordinate is
+    negative (and so off every map).
+
+    >>> _parse_loc('10,3')
+    (10, 3)
+    >>> _parse_loc('-1,0')
+    Traceback (most recent call last):
+    argparse.ArgumentTypeError: -1,0 is off the map (coordinates start at 0)
+    """
+    try:
+        x, y = (int(coordinate) for coordinate in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'{text} is not a location written as X,Y') from None
+    if x < 0 or y < 0:
+        raise argparse.ArgumentTypeError(f'{text} is off the map (coordinates start at 0)')
+    return (x, y)
+
+
+def main(argv: List[str]) -> None:
+    """Print the routes described by the command line arguments argv.
+    """
+    parser = argparse.ArgumentParser(prog='python -m route',
+                                     description='Print shortest paths on a map file.',
+                                     epilog="A location starting with '-' must be given as "
+                                            '--from=X,Y (or --goal=X,Y).')
+    parser.add_argument('map', help='a map file written by mapfile.py')
+    parser.add_argument('--from', dest='starts', type=_parse_loc, action='append', default=[],
+                        metavar='X,Y', help='a start location (may be repeated)')
+    parser.add_argument('--random', type=int, default=0, metavar='N',
+                        help='also route from N random non-obstacle locations')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--goal', type=_parse_loc, default=None, metavar='X,Y',
+                        help="the goal location (default: the map file's goal)")
+    parser.add_argument('--method', choices=['auto', 'a_star', 'flow_field'], default='auto')
+    parser.add_argument('--costs-only', action='store_true', help='do not print the paths')
+    parser.add_argument('--timing', action='store_true',
+                        help='print how long loading and routing took to stderr')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        map_file = open_map(args.map)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    with map_file:
+        for loc in args.starts + ([] if args.goal is None else [args.goal]):
+            if not (loc[0] < map_file.width and loc[1] < map_file.height):
+                parser.error(f'{loc[0]},{loc[1]} is off the '
+                             f'{map_file.width}x{map_file.height} map')
+        goal_loc = map_file.goal_loc if args.goal is None else args.goal
+        starts = args.starts + random_starts(map_file, args.random, random.Random(args.seed))
+        graph = map_file.to_grid_graph()
+    if not graph.has_vertex(goal_loc):
+        parser.error(f'the goal {goal_loc[0]},{goal_loc[1]} is not a traversable tile')
+    loaded = time.perf_counter()
+
+    routes = find_routes(graph, starts, goal_loc, args.method)
+    routed = time.perf_counter()
+
+    sys.stdout.write(''.join(format_route(route, args.costs_only) + '\n' for route in routes))
+    if args.timing:
+        print(f'load {(loaded - started) * 1000:.1f} ms, '
+              f'route {(routed - loaded) * 1000:.1f} ms, {len(routes)} routes', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
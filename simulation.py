@@ -0,0 +1,358 @@
+"""CSC111 Winter 2021 Project - simulation.py
+
+OBJECTIVE: Define Simulation, the game state of main.py (the map, the enemy units heading to the
+goal and the warning pop-up timers) advanced in fixed time steps, without any display.
+
+main.py feeds player input into a Simulation, advances it by the real time passed each frame and
+draws the result. Without a display, a Simulation runs as fast as the CPU allows, which is used
+for soak tests and evaluating scenarios in bulk:
+
+Sample Usage (from the command line):
+    python simulation.py --size 64x48 --units 10000 --ticks 36000 --edit-every 60
+    python simulation.py --map big.map --backend grid --units 10000
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import vertex_graph
+from pathfinding import FlowField, GOAL_LOC, SearchStats, a_star_pathfinding
+from incremental import IncrementalPlanner
+from mapfile import MapFile, open_map
+from path_worker import PathWorker
+from swarm import Swarm
+
+# The number of simulation steps (ticks) per simulated second.
+TICK_RATE = 60
+
+# The number of ticks a warning pop-up is shown for.
+WARNING_TICKS = 2 * TICK_RATE
+
+# The most ticks advance runs at once, so that a long stall does not have to be caught up on.
+_MAX_CATCH_UP = 10
+
+
+class Simulation:
+    """The state of one game, advanced one fixed-length tick at a time.
+
+    Instance Attributes:
+        - grid: The dict-based grid representation of the game map, or the map file it was
+                opened from.
+        - graph: The graph-based representation of the same map.
+        - goal_loc: The location every enemy unit heads to.
+        - planner: The incremental planner every enemy unit follows to the goal, or in
+                   background mode, the latest flow field received from worker.
+        - worker: In background mode, the PathWorker computing flow fields after tile edits.
+                  None otherwise.
+        - enemies: Every enemy unit on the map.
+        - is_dstra: The pathfinding mode chosen by the player. True for Dijkstra, False for A*.
+                    Units follow the same flow field in either mode; the mode chooses the
+                    algorithm of sample_search.
+        - ticks: The number of ticks simulated so far.
+        - warning_nodeploy_timer: The number of ticks the "cannot deploy" warning is still shown.
+        - warning_nochange_timer: The number of ticks the "cannot block completely" warning is
+                                  still shown.
+
+    Representation Invariants:
+        - self.warning_nodeploy_timer >= 0 and self.warning_nochange_timer >= 0
+    """
+    grid: Union[Dict[Tuple[int, int], str], MapFile]
+    graph: Union[vertex_graph.WeightedGraph, vertex_graph.GridGraph]
+    goal_loc: Tuple[int, int]
+    planner: Union[IncrementalPlanner, FlowField]
+    worker: Optional[PathWorker]
+    enemies: Swarm
+    is_dstra: bool
+    ticks: int
+    warning_nodeploy_timer: int
+    warning_nochange_timer: int
+
+    # Private Instance Attributes:
+    #     - _time_behind: The simulated time (in seconds) that advance has yet to run ticks for.
+    #     - _search_start: The start location of sample_search (where the most recently deployed
+    #                      unit started), or None if no unit has been deployed yet.
+    #     - _search: The (start, graph version, is_dstra) the last sample_search was run for,
+    #                and its path and statistics.
+    _time_behind: float
+    _search_start: Optional[Tuple[int, int]]
+    _search: Optional[Tuple[Tuple[Any, int, bool], List[Tuple[int, int]], SearchStats]]
+
+    def __init__(self, grid: Union[Dict[Tuple[int, int], str], MapFile],
+                 goal_loc: Tuple[int, int] = GOAL_LOC,
+                 backend: str = 'weighted', background: bool = False) -> None:
+        """Initialise a game on the map grid, with no enemy units.
+
+        backend is 'weighted' for WeightedGraph (dict_to_graph) or 'grid' for GridGraph
+        (dict_to_grid_graph). A GridGraph of a MapFile is built straight from its tile bytes.
+
+        In background mode, paths are recomputed after tile edits by a PathWorker thread instead
+        of during the next tick. Until the new flow field arrives, enemy units keep following the
+        old one, and wait in front of any tile it leads them to which has become an obstacle.
+        close must be called when a background mode simulation is no longer needed.
+
+        Preconditions:
+            - grid[goal_loc] == 'goal'
+            - backend in {'weighted', 'grid'}
+        """
+        self.grid = grid
+        if backend == 'weighted':
+            self.graph = vertex_graph.dict_to_graph(grid)
+        elif isinstance(grid, MapFile):
+            self.graph = grid.to_grid_graph()
+        else:
+            self.graph = vertex_graph.dict_to_grid_graph(grid)
+        self.goal_loc = goal_loc
+        if background:
+            self.planner = FlowField(self.graph, goal_loc)
+            self.worker = PathWorker(self.graph, goal_loc)
+        else:
+            self.planner = IncrementalPlanner(self.graph, goal_loc)
+            self.worker = None
+        self.enemies = Swarm(self.graph, self.planner)
+        self.is_dstra = True
+        self.ticks = 0
+        self.warning_nodeploy_timer = 0
+        self.warning_nochange_timer = 0
+        self._time_behind = 0.0
+        self._search_start = None
+        self._search = None
+
+    def deploy(self, loc: Tuple[int, int]) -> bool:
+        """Deploy a new enemy unit at loc, as when the player left-clicks it.
+
+        Return whether a unit was deployed. When loc is a traversable tile which is not
+        connected to the goal, the "cannot deploy" warning is shown.
+        """
+        if self.grid.get(loc) not in {'normal', 'slow'}:
+            return False
+
+        if not self.graph.connected(loc, self.goal_loc):
+            self.warning_nodeploy_timer = WARNING_TICKS
+            return False
+
+        self.enemies.spawn(loc)
+        self._search_start = loc
+        return True
+
+    def edit_tile(self, loc: Tuple[int, int]) -> bool:
+        """Cycle the type of the tile at loc, as when the player right-clicks it:
+        normal becomes slow, slow becomes obstacle and obstacle becomes normal.
+
+        Return whether the tile was changed. A slow tile is only made an obstacle if every enemy
+        unit can still reach the goal afterwards; otherwise the "cannot block completely" warning
+        is shown.
+        """
+        tile_type = self.grid.get(loc)
+
+        if tile_type == 'slow':
+            # Test if this new obstacle tile allows for
+            # deployed enemies to reach their goal from their current location.
+            # The tile change is rolled back when the with-block exits.
+            with self.graph.preview_tile(loc, 'obstacle'):
+                can_block = all(self.graph.connected(enemy_loc, self.goal_loc)
+                                for enemy_loc in set(self.enemies.locs()))
+            if not can_block:
+                self.warning_nochange_timer = WARNING_TICKS
+                return False
+            new_type = 'obstacle'
+        elif tile_type == 'normal':
+            new_type = 'slow'
+        elif tile_type == 'obstacle':
+            new_type = 'normal'
+        else:  # The goal tile, or outside of the map
+            return False
+
+        self.grid[loc] = new_type
+        self.graph.set_tile(loc, new_type)  # Update only the changed tile in the graph
+        if self.worker is not None:
+            self.worker.edit(loc, new_type, self.graph.version)
+        self.enemies.refresh()
+        return True
+
+    def toggle_algorithm(self) -> None:
+        """Swap between Dijkstra's Algorithm and A* pathfinding, as when the player clicks the
+        algorithm swap button.
+
+        Both algorithms find equally short paths, so enemy units keep sharing their flow field;
+        the difference shows in sample_search, as the number of tiles each one expands.
+        """
+        self.is_dstra = not self.is_dstra
+
+    def sample_search(self) -> Tuple[List[Tuple[int, int]], Optional[SearchStats]]:
+        """Return the path from the tile the most recently deployed enemy unit started on to the
+        goal, found by a_star_pathfinding (as Dijkstra's Algorithm when self.is_dstra), and the
+        statistics of that search.
+
+        The path is empty if there is no path, and the statistics are None if no unit has been
+        deployed yet. The search is only rerun after a deploy, a tile edit or an algorithm swap.
+        """
+        start = self._search_start
+        if start is None:
+            return ([], None)
+        key = (start, self.graph.version, self.is_dstra)
+        if self._search is None or self._search[0] != key:
+            stats = SearchStats()
+            path = []
+            if self.graph.has_vertex(start):
+                path = a_star_pathfinding(self.graph, start, self.is_dstra, stats,
+                                          goal=self.goal_loc) or []
+            self._search = (key, path, stats)
+        return (self._search[1], self._search[2])
+
+    def tick(self) -> None:
+        """Advance the game by one tick: move every enemy unit, remove the ones which reached the
+        goal, and count down the warning timers.
+
+        In background mode, first switch to the worker's newest flow field, if it is up to date.
+        """
+        if self.worker is not None:
+            field = self.worker.poll(self.graph.version)
+            if field is not None:
+                self.planner = field
+                self.enemies.refresh(field)
+
+        self.enemies.step()
+
+        if self.warning_nodeploy_timer > 0:
+            self.warning_nodeploy_timer -= 1
+        if self.warning_nochange_timer > 0:
+            self.warning_nochange_timer -= 1
+
+        self.ticks += 1
+
+    def advance(self, seconds: float) -> int:
+        """Run as many ticks as fit into the given number of seconds of real time, carrying the
+        remainder over to the next call. Return the number of ticks run.
+
+        At most _MAX_CATCH_UP ticks are run per call; any time beyond that is dropped.
+        """
+        self._time_behind += seconds
+        num_ticks = int(self._time_behind * TICK_RATE)
+        if num_ticks > _MAX_CATCH_UP:
+            num_ticks = _MAX_CATCH_UP
+            self._time_behind = 0.0
+        else:
+            self._time_behind -= num_ticks / TICK_RATE
+
+        for _ in range(num_ticks):
+            self.tick()
+        return num_ticks
+
+    def close(self) -> None:
+        """Stop the background worker thread, if there is one.
+        """
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+    def run(self, num_ticks: int) -> float:
+        """Run num_ticks ticks as fast as possible, and return the number of ticks run per second.
+        """
+        start = time.perf_counter()
+        for _ in range(num_ticks):
+            self.tick()
+        elapsed = time.perf_counter() - start
+        return num_ticks / elapsed if elapsed > 0 else float('inf')
+
+
+def random_grid(width: int, height: int, goal_loc: Tuple[int, int] = GOAL_LOC,
+                rng: random.Random = random) -> Dict[Tuple[int, int], str]:
+    """Return a random dict-based grid representation of a width x height game map,
+    with tile types distributed as in main.py and the goal at goal_loc.
+
+    Preconditions:
+        - width > goal_loc[0] >= 0 and height > goal_loc[1] >= 0
+    """
+    grid = {}
+    for i in range(width):
+        for j in range(height):
+            grid[(i, j)] = rng.choice(['normal', 'normal', 'slow', 'slow', 'obstacle'])
+    grid[goal_loc] = 'goal'
+    return grid
+
+
+def run_scenario(width: int, height: int, units: int, num_ticks: int, edit_every: int = 0,
+                 seed: int = 0, backend: str = 'weighted',
+                 background: bool = False, map_path: Optional[str] = None) -> Dict[str, Any]:
+    """Run a headless scenario, and return a report on it.
+
+    units enemy units are deployed at random locations, and then num_ticks ticks are run. If
+    edit_every > 0, a random tile is edited (as with a right-click) every edit_every ticks.
+    backend and background are passed on to Simulation.
+
+    If map_path is given, the map is opened from that map file and width and height are ignored.
+    Otherwise, a random map is used.
+
+    Preconditions:
+        - map_path is not None or (width > GOAL_LOC[0] and height > GOAL_LOC[1])
+        - units >= 0 and num_ticks > 0 and edit_every >= 0
+    """
+    rng = random.Random(seed)
+    if map_path is not None:
+        grid = open_map(map_path)
+        width, height, goal_loc = grid.width, grid.height, grid.goal_loc
+    else:
+        grid = random_grid(width, height, GOAL_LOC, rng)
+        goal_loc = GOAL_LOC
+    sim = Simulation(grid, goal_loc, backend, background)
+
+    deployable = [loc for loc in sorted(sim.graph.get_all_vertices())
+                  if loc != goal_loc and sim.graph.connected(loc, goal_loc)]
+    if len(deployable) > 0:
+        for _ in range(units):
+            sim.deploy(rng.choice(deployable))
+
+    edits = 0
+    start = time.perf_counter()
+    while sim.ticks < num_ticks:
+        if edit_every > 0 and sim.ticks % edit_every == 0:
+            edits += sim.edit_tile((rng.randrange(width), rng.randrange(height)))
+        sim.tick()
+    elapsed = time.perf_counter() - start
+
+    report = {'width': width, 'height': height, 'seed': seed, 'backend': backend,
+              'units': len(sim.enemies) + sim.enemies.arrived, 'ticks': sim.ticks,
+              'simulated_seconds': sim.ticks / TICK_RATE, 'wall_seconds': elapsed,
+              'ticks_per_second': sim.ticks / elapsed if elapsed > 0 else None,
+              'tile_edits': edits, 'arrived': sim.enemies.arrived, 'remaining': len(sim.enemies)}
+    if sim.worker is not None:
+        report['fields_computed'] = sim.worker.computed
+        report['fields_dropped'] = sim.worker.dropped
+        sim.close()
+    if isinstance(grid, MapFile):
+        grid.close()
+    return report
+
+
+def main(argv: List[str]) -> None:
+    """Run the headless scenario described by the command line arguments argv,
+    and print its report as JSON.
+    """
+    parser = argparse.ArgumentParser(description='Run the game without a display.')
+    parser.add_argument('--size', default='16x9', help='map size as WIDTHxHEIGHT')
+    parser.add_argument('--map', help='map file to use instead of a random map')
+    parser.add_argument('--units', type=int, default=1000, help='number of enemy units deployed')
+    parser.add_argument('--ticks', type=int, default=60 * TICK_RATE,
+                        help='number of ticks to simulate')
+    parser.add_argument('--edit-every', type=int, default=0,
+                        help='edit a random tile every this many ticks (0 for never)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', choices=['weighted', 'grid'], default='weighted')
+    parser.add_argument('--background', action='store_true',
+                        help='recompute paths on a background thread')
+    args = parser.parse_args(argv)
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    report = run_scenario(width, height, args.units, args.ticks, args.edit_every,
+                          args.seed, args.backend, args.background, args.map)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+"""CSC111 Winter 2021 Project - sprites.py
+
+OBJECTIVE: Define SpriteRegistry, which loads every sprite image in assets/ at most once and
+shares the loaded surface between every enemy unit, Tile and UI section that draws it.
+
+Sprites are named after their file: 'enemy' is assets/sprite_enemy.png, 'ui_top_1' is
+assets/sprite_ui_top_1.png, and so on. They are loaded the first time they are asked for, or all
+at once with preload. The loaded sprites can also be packed into a single atlas surface, in which
+case every sprite becomes a subsurface of the atlas.
+
+get_sprite and preload_sprites use one registry shared by the whole program.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import Dict, List, Optional
+import os
+import pygame
+
+# The directory sprites are loaded from, and the prefix and suffix of their file names.
+ASSET_DIR = 'assets'
+_PREFIX = 'sprite_'
+_SUFFIX = '.png'
+
+
+class SpriteRegistry:
+    """Loaded sprite images, by name.
+
+    A display mode must be set (pygame.display.set_mode) before any sprite is loaded,
+    since sprites are converted to the display's pixel format.
+
+    Instance Attributes:
+        - directory: The directory sprites are loaded from.
+        - atlas: The surface every sprite was packed into by build_atlas, if it has been called.
+        - loads: The number of image files loaded from disk so far.
+    """
+    directory: str
+    atlas: Optional[pygame.Surface]
+    loads: int
+
+    # Private Instance Attributes:
+    #     - _surfaces: Maps each loaded sprite's name to its surface.
+    _surfaces: Dict[str, pygame.Surface]
+
+    def __init__(self, directory: str = ASSET_DIR) -> None:
+        """Initialise a registry with no sprites loaded."""
+        self.directory = directory
+        self.atlas = None
+        self.loads = 0
+        self._surfaces = {}
+
+    def get(self, name: str) -> pygame.Surface:
+        """Return the sprite with the given name, loading it if it has not been loaded yet.
+
+        The same surface is returned every time, so it must not be drawn onto.
+        """
+        if name not in self._surfaces:
+            path = os.path.join(self.directory, _PREFIX + name + _SUFFIX)
+            self._surfaces[name] = pygame.image.load(path).convert()
+            self.loads += 1
+        return self._surfaces[name]
+
+    def names(self) -> List[str]:
+        """Return the names of every sprite in self.directory, in sorted order.
+        """
+        return sorted(file_name[len(_PREFIX):-len(_SUFFIX)]
+                      for file_name in os.listdir(self.directory)
+                      if file_name.startswith(_PREFIX) and file_name.endswith(_SUFFIX))
+
+    def preload(self) -> None:
+        """Load every sprite in self.directory which has not been loaded yet.
+        """
+        for name in self.names():
+            self.get(name)
+
+    def build_atlas(self, max_width: int = 1024) -> pygame.Surface:
+        """Pack every loaded sprite into one surface, and replace each loaded sprite with the
+        subsurface of the atlas it was copied to. Return the atlas.
+
+        Sprites are packed into rows (shelves) no wider than max_width, or the widest sprite if it
+        is wider, tallest sprites first. Sprites loaded later are not added to the atlas.
+
+        Preconditions:
+            - len(self._surfaces) > 0
+        """
+        order = sorted(self._surfaces, key=lambda name: (-self._surfaces[name].get_height(), name))
+        max_width = max([max_width] + [self._surfaces[name].get_width() for name in order])
+
+        # Work out where each sprite goes.
+        positions = {}
+        x, y, shelf_height = 0, 0, 0
+        for name in order:
+            width, height = self._surfaces[name].get_size()
+            if x + width > max_width:  # Start a new shelf
+                x, y, shelf_height = 0, y + shelf_height, 0
+            positions[name] = (x, y)
+            x += width
+            shelf_height = max(shelf_height, height)
+
+        atlas_width = max(positions[name][0] + self._surfaces[name].get_width() for name in order)
+        self.atlas = pygame.Surface((atlas_width, y + shelf_height)).convert()
+        for name in order:
+            rect = self.atlas.blit(self._surfaces[name], positions[name])
+            self._surfaces[name] = self.atlas.subsurface(rect)
+        return self.atlas
+
+
+# The registry used by get_sprite and preload_sprites.
+_registry = SpriteRegistry()
+
+
+def get_sprite(name: str) -> pygame.Surface:
+    """Return the shared sprite with the given name, such as 'enemy' or 'ui_top_1'.
+    """
+    return _registry.get(name)
+
+
+def preload_sprites(atlas: bool = False) -> None:
+    """Load every sprite in ASSET_DIR into the shared registry now, instead of on first use.
+    If atlas is True, also pack them into a single atlas surface.
+    """
+    _registry.preload()
+    if atlas:
+        _registry.build_atlas()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': ['pygame', 'os'],
+        'allowed-io': [],
+        'max-nested-blocks': 4,
+        'generated-members': ['pygame.*']
+    })
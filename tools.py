@@ -0,0 +1,60 @@
+"""CSC111 Winter 2021 Project - tools.py
+
+OBJECTIVE: Convert between grid locations and pixel positions on the game screen.
+
+The map is drawn in TILE_SIZE x TILE_SIZE pixel tiles, below a MAP_TOP pixel high UI bar. This
+file does not import pygame, so headless code (route, simulation, benchmark, path_service) can use
+it as well as the game.
+
+This file is Copyright (c) 2021 Hyun Jo (Joshua) Jang.
+"""
+from typing import Tuple
+
+# The size of a tile in pixels, and the pixel y-coordinate of the top of the map (below the UI).
+TILE_SIZE = 64
+MAP_TOP = 64
+
+
+def convert_loc_to_pos(loc: Tuple[int, int], point: str = 'centre') -> Tuple[int, int]:
+    """Return the pixel position of the given point of the tile at grid location loc.
+
+    Preconditions:
+        - point in {'topleft', 'centre'}
+
+    >>> convert_loc_to_pos((0, 0), 'topleft')
+    (0, 64)
+    >>> convert_loc_to_pos((15, 4), 'centre')
+    (992, 352)
+    """
+    x = loc[0] * TILE_SIZE
+    y = MAP_TOP + loc[1] * TILE_SIZE
+    if point == 'centre':
+        return (x + TILE_SIZE // 2, y + TILE_SIZE // 2)
+    return (x, y)
+
+
+def convert_pos_to_loc(pos: Tuple[int, int]) -> Tuple[int, int]:
+    """Return the grid location of the tile containing the pixel position pos.
+
+    Positions on the UI bar above the map have a negative y-coordinate.
+
+    >>> convert_pos_to_loc((992, 352))
+    (15, 4)
+    >>> convert_pos_to_loc((63, 127))
+    (0, 0)
+    """
+    return (int(pos[0]) // TILE_SIZE, (int(pos[1]) - MAP_TOP) // TILE_SIZE)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'extra-imports': [],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -6,6 +6,10 @@ OBJECTIVE: Define the classes _WeightedVertex and WeightedGraph for use in pathf
 Define the function nested_list_to_graph for converting a list-based representation of the game map
 into a graph-based one.
 
+Also define GridGraph, an array-backed alternative to WeightedGraph for large maps,
+along with dict_to_grid_graph for building one from the same dictionary representation,
+and bytes_to_grid_graph for building one straight from the tile bytes of a map file.
+
 The implementations for _WeightedVertex and WeightedGraph were copied over from CSC111 Assignment 3.
 Minor modifications were made such as removing ValueError returns for certain methods.
 
@@ -16,7 +20,18 @@ This file is Copyright (c)
 2021 Hyun Jo (Joshua) Jang."""
 
 from __future__ import annotations
-from typing import Any, Union, Dict, Tuple
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Union, Dict, Tuple, Iterator, List, Callable, Iterable, Optional
+
+# Weight contributed by each tile type to the edges touching it.
+# A normal-normal edge will have weight 1 + 1 = 2, a normal-slow edge will have 1 + 5 = 6, etc.
+_TYPE_TO_WEIGHT = {'normal': 1, 'slow': 5, 'goal': 1, 'obstacle': 0}
+_WEIGHT_TO_TYPE = {1: 'normal', 5: 'slow', 0: 'obstacle'}
+
+# How many set_tile edits each graph remembers for changes_since.
+_EDIT_LOG_SIZE = 1024
 
 
 class _WeightedVertex:
@@ -45,34 +60,218 @@ class _WeightedVertex:
         """Return whether this vertex is connected to a vertex corresponding to the target_item,
         WITHOUT using any of the vertices in visited.
 
+        This is an iterative depth-first search, so it does not hit Python's recursion limit
+        on large maps.
+
         Preconditions:
             - self not in visited
         """
-        if self.item == target_item:
-            # Our base case: the target_item is the current vertex
-            return True
-        else:
-            visited.add(self)  # Add self to the set of visited vertices
-            for u in self.neighbours:
-                if u not in visited:  # Only recurse on vertices that haven't been visited
-                    if u.check_connected(target_item, visited):
-                        return True
+        visited.add(self)  # Add self to the set of visited vertices
+        stack = [self]
 
-            return False
+        while len(stack) != 0:
+            v = stack.pop()
+            if v.item == target_item:
+                # The target_item is the current vertex
+                return True
+
+            for u in v.neighbours:
+                if u not in visited:  # Only visit vertices that haven't been visited
+                    visited.add(u)
+                    stack.append(u)
+
+        return False
+
+
+class _ComponentIndex:
+    """A labelling of every vertex in a graph with the id of its connected component,
+    so that two vertices are connected if and only if they have the same label.
+
+    The labels are kept up to date as vertices and edges are added and removed,
+    touching only the vertices whose component actually changed.
+
+    Representation Invariants:
+        - all(self._sizes[label] > 0 for label in self._sizes)
+        - sum(self._sizes.values()) == len(self._labels)
+    """
+    # Private Instance Attributes:
+    #     - _neighbours: A function returning the neighbours of a vertex in the graph.
+    #     - _labels: Maps each vertex to its component label.
+    #     - _sizes: Maps each component label to the number of vertices with that label.
+    #     - _next_label: The smallest label that has never been used.
+    _neighbours: Callable[[Any], Iterable[Any]]
+    _labels: Dict[Any, int]
+    _sizes: Dict[int, int]
+    _next_label: int
+
+    def __init__(self, neighbours: Callable[[Any], Iterable[Any]],
+                 vertices: Iterable[Any]) -> None:
+        """Label all of the given vertices by flood filling from each unlabelled one.
+        """
+        self._neighbours = neighbours
+        self._labels = {}
+        self._sizes = {}
+        self._next_label = 0
+
+        for v in vertices:
+            if v not in self._labels:
+                self._sizes[self._next_label] = self._relabel(v, None, self._next_label)
+                self._next_label += 1
+
+    def label(self, item: Any) -> Optional[int]:
+        """Return the component label of item, or None if it is not a labelled vertex.
+        """
+        return self._labels.get(item)
+
+    def vertex_added(self, item: Any) -> None:
+        """Record that item was added to the graph as a new vertex with no edges.
+        """
+        self._labels[item] = self._next_label
+        self._sizes[self._next_label] = 1
+        self._next_label += 1
+
+    def edge_added(self, item1: Any, item2: Any) -> None:
+        """Record that an edge was added between item1 and item2.
+
+        If this joins two components, the smaller one is relabelled to match the larger one.
+        """
+        label1 = self._labels[item1]
+        label2 = self._labels[item2]
+        if label1 != label2:
+            if self._sizes[label1] < self._sizes[label2]:
+                item2, label1, label2 = item1, label2, label1
+
+            # Only vertices still carrying label2 are visited, so the new edge is not crossed.
+            self._sizes[label1] += self._relabel(item2, label2, label1)
+            del self._sizes[label2]
+
+    def vertex_removed(self, item: Any, former_neighbours: List[Any]) -> None:
+        """Record that item, which was adjacent to former_neighbours, was removed from the graph.
+
+        Removing a vertex can only split its component if it had at least two neighbours.
+        In that case, a flood fill is run from every former neighbour at once, one vertex at a
+        time each, and flood fills that meet are merged. Whenever a flood fill runs out of
+        vertices while others are still going, it has found a split-off component, which gets a
+        new label. So the work done is about the size of everything but the largest piece.
+        """
+        label = self._labels.pop(item)
+        self._sizes[label] -= 1
+        if self._sizes[label] == 0:
+            del self._sizes[label]
+
+        if len(former_neighbours) <= 1:
+            return
+
+        owner = {}  # Maps each visited vertex to the index of the flood fill that reached it
+        frontiers = []
+        visited = []
+        group = list(range(len(former_neighbours)))  # Union-find parent of each flood fill
+        for i, v in enumerate(former_neighbours):
+            owner[v] = i
+            frontiers.append([v])
+            visited.append([v])
+
+        def find(i: int) -> int:
+            while group[i] != i:
+                i = group[i]
+            return i
+
+        remaining = set(range(len(former_neighbours)))  # Flood fills not yet split off
+        while len({find(i) for i in remaining}) > 1:
+            # Advance every unfinished flood fill by one vertex.
+            for i in remaining:
+                if len(frontiers[i]) != 0:
+                    for u in self._neighbours(frontiers[i].pop()):
+                        if u not in owner:
+                            owner[u] = i
+                            frontiers[i].append(u)
+                            visited[i].append(u)
+                        elif find(owner[u]) != find(i):
+                            group[find(owner[u])] = find(i)  # These flood fills have met
+
+            # Any group of flood fills which has run out of vertices is a separate component.
+            roots = {find(i) for i in remaining}
+            for root in roots:
+                members = [i for i in remaining if find(i) == root]
+                if len(roots) > 1 and all(len(frontiers[i]) == 0 for i in members):
+                    new_label = self._next_label
+                    self._next_label += 1
+                    self._sizes[new_label] = 0
+                    for i in members:
+                        for v in visited[i]:
+                            self._labels[v] = new_label
+                        self._sizes[new_label] += len(visited[i])
+                        remaining.remove(i)
+                    self._sizes[label] -= self._sizes[new_label]
+                    roots = {find(i) for i in remaining}
+
+    def _relabel(self, start: Any, old_label: Optional[int], new_label: int) -> int:
+        """Give new_label to start and every vertex reachable from it through vertices labelled
+        old_label (or unlabelled vertices, when old_label is None).
+
+        Return the number of vertices relabelled.
+        """
+        self._labels[start] = new_label
+        stack = [start]
+        count = 1
+
+        while len(stack) != 0:
+            v = stack.pop()
+            for u in self._neighbours(v):
+                if self._labels.get(u) == old_label:
+                    self._labels[u] = new_label
+                    stack.append(u)
+                    count += 1
+
+        return count
 
 
 class WeightedGraph:
     """A weighted graph used to represent the grid representation of the 16x9 tile map.
+
+    Instance Attributes:
+        - version: A counter which is incremented every time a tile is changed with set_tile.
     """
+    version: int
+
     # Private Instance Attributes:
     #     - _vertices:
     #         A collection of the vertices contained in this graph.
     #         Maps item to _WeightedVertex object.
+    #     - _tile_types:
+    #         Maps grid location to tile type, as in the dictionary given to dict_to_graph.
+    #         Used by set_tile to work out the weights of re-added edges.
+    #     - _components:
+    #         The connected component of every vertex, used by connected.
+    #         None until connected is first called, after which it is kept up to date.
+    #     - _edit_log:
+    #         The locations changed by the most recent calls to set_tile, oldest first.
+    #     - _max_weight:
+    #         The largest weight of any edge ever added to this graph, or None if any edge
+    #         weight was not an integer.
+    #     - _min_weight:
+    #         The smallest weight of any edge ever added to this graph, or None if no edge has
+    #         been added yet.
     _vertices: dict[Any, _WeightedVertex]
+    _tile_types: dict[Any, str]
+    _components: Optional[_ComponentIndex]
+    _edit_log: deque[Tuple[int, int]]
+    _max_weight: Optional[int]
+    _min_weight: Optional[Union[int, float]]
+
+    def __init__(self, tile_types: Optional[Dict[Tuple[int, int], str]] = None) -> None:
+        """Initialize an empty graph (no vertices or edges).
 
-    def __init__(self) -> None:
-        """Initialize an empty graph (no vertices or edges)."""
+        tile_types is the dictionary representation of the map the graph is built from, as given
+        to dict_to_graph, which set_tile starts from.
+        """
         self._vertices = {}
+        self._tile_types = {} if tile_types is None else dict(tile_types)
+        self._components = None
+        self._edit_log = deque(maxlen=_EDIT_LOG_SIZE)
+        self._max_weight = 0
+        self._min_weight = None
+        self.version = 0
 
     def add_vertex(self, item: Any) -> None:
         """Add a vertex with the given item and kind to this graph.
@@ -82,6 +281,8 @@ class WeightedGraph:
         """
         if item not in self._vertices:
             self._vertices[item] = _WeightedVertex(item)
+            if self._components is not None:
+                self._components.vertex_added(item)
 
     def add_edge(self, item1: Any, item2: Any, weight: Union[int, float] = 1) -> None:
         """Add an edge between the two vertices with the given items in this graph,
@@ -100,6 +301,26 @@ class WeightedGraph:
             v1.neighbours[v2] = weight
             v2.neighbours[v1] = weight
 
+            if self._max_weight is not None:
+                self._max_weight = max(self._max_weight, weight) if isinstance(weight, int) \
+                    else None
+            if self._min_weight is None or weight < self._min_weight:
+                self._min_weight = weight
+            if self._components is not None:
+                self._components.edge_added(item1, item2)
+
+    def remove_vertex(self, item: Any) -> None:
+        """Remove the vertex with the given item from this graph, along with all of its edges.
+
+        Do nothing if the given item is not in this graph.
+        """
+        if item in self._vertices:
+            v = self._vertices.pop(item)
+            for u in v.neighbours:
+                del u.neighbours[v]
+            if self._components is not None:
+                self._components.vertex_removed(item, [u.item for u in v.neighbours])
+
     def get_weight(self, item1: Any, item2: Any) -> Union[int, float]:
         """Return the weight of the edge between the given items.
 
@@ -125,23 +346,465 @@ class WeightedGraph:
         else:
             raise ValueError
 
+    def iter_edges(self, item: Any) -> Iterator[Tuple[Any, Union[int, float]]]:
+        """Return an iterator of (neighbour item, edge weight) pairs for the given item.
+
+        Unlike get_neighbours followed by get_weight, this does not build any intermediate set
+        and looks up each edge only once.
+
+        Preconditions:
+            - item is a vertex in this graph
+        """
+        for neighbour, weight in self._vertices[item].neighbours.items():
+            yield neighbour.item, weight
+
+    def max_edge_weight(self) -> Optional[int]:
+        """Return an upper bound on the weight of any edge in this graph,
+        or None if some edge weights are not integers.
+        """
+        return self._max_weight
+
+    def min_edge_weight(self) -> Union[int, float]:
+        """Return a lower bound on the weight of any edge in this graph.
+        """
+        return 0 if self._min_weight is None else self._min_weight
+
     def get_all_vertices(self) -> set:
         """Return a set of all vertex items in this graph.
         """
         return set(self._vertices.keys())
 
+    def has_vertex(self, item: Any) -> bool:
+        """Return whether the given item is a vertex in this graph.
+        """
+        return item in self._vertices
+
+    def get_dimension(self) -> Tuple[int, int]:
+        """Return the (width, height) of the tile map this graph was built from.
+
+        Preconditions:
+            - this graph was built by dict_to_graph
+        """
+        return _grid_dimension(self._tile_types)
+
     def connected(self, item1: Any, item2: Any) -> bool:
         """Return whether item1 and item2 are connected vertices in this graph.
 
         Return False if item1 or item2 do not appear as vertices in this graph.
+
+        This compares the component labels of item1 and item2. The labels are computed on the
+        first call and then kept up to date as the graph changes.
         """
+        if self._components is None:
+            self._components = _ComponentIndex(self._neighbour_items, self._vertices)
 
         if item1 in self._vertices and item2 in self._vertices:
-            v1 = self._vertices[item1]
-            return v1.check_connected(item2, set())  # Pass in an empty "visited" set
+            return self._components.label(item1) == self._components.label(item2)
+        else:
+            return False
+
+    def _neighbour_items(self, item: Any) -> Iterator[Any]:
+        """Return an iterator of the neighbours of the given item.
+        """
+        return (u.item for u in self._vertices[item].neighbours)
+
+    def get_tile(self, loc: Tuple[int, int]) -> str:
+        """Return the tile type at the given grid location.
+
+        Locations outside of the map are treated as obstacles.
+        """
+        return self._tile_types.get(loc, 'obstacle')
+
+    def set_tile(self, loc: Tuple[int, int], tile_type: str) -> str:
+        """Change the tile at the given grid location to tile_type, and return its previous type.
+
+        Only the vertex at loc and its (at most 4) edges are touched, instead of rebuilding the
+        whole graph with dict_to_graph. Edge weights follow the same rules as dict_to_graph.
+        When neither the previous nor the new tile type is 'obstacle', connectivity cannot
+        change, so only the edge weights are updated in place.
+
+        Preconditions:
+            - loc is a location on the map given to dict_to_graph
+            - tile_type in {'normal', 'slow', 'goal', 'obstacle'}
+        """
+        previous = self.get_tile(loc)
+        self._tile_types[loc] = tile_type
+
+        if previous != 'obstacle' and tile_type != 'obstacle':
+            self._reweigh_edges(loc)
+        else:
+            # Obstacles have no vertex, so start from a vertex-less location either way.
+            self.remove_vertex(loc)
+
+            if tile_type != 'obstacle':
+                self.add_vertex(loc)
+                for neighbour in lattice_neighbours(loc):
+                    # Obstacle or off-map neighbours have no vertex, so add_edge does nothing.
+                    self.add_edge(loc, neighbour, _TYPE_TO_WEIGHT[tile_type]
+                                  + _TYPE_TO_WEIGHT[self.get_tile(neighbour)])
+
+        self._edit_log.append(loc)
+        self.version += 1
+        return previous
+
+    def _reweigh_edges(self, loc: Tuple[int, int]) -> None:
+        """Set the weight of every edge of the vertex at loc from the current tile types,
+        without removing or adding any vertex or edge.
+
+        Preconditions:
+            - self.has_vertex(loc)
+        """
+        v = self._vertices[loc]
+        loc_weight = _TYPE_TO_WEIGHT[self._tile_types[loc]]
+        for u in v.neighbours:
+            weight = loc_weight + _TYPE_TO_WEIGHT[self.get_tile(u.item)]
+            v.neighbours[u] = weight
+            u.neighbours[v] = weight
+
+            if self._max_weight is not None:
+                self._max_weight = max(self._max_weight, weight) if isinstance(weight, int) \
+                    else None
+            if self._min_weight is None or weight < self._min_weight:
+                self._min_weight = weight
+
+    def changes_since(self, version: int) -> Optional[set]:
+        """Return the set of locations changed by set_tile since this graph had the given version.
+
+        Return None if version is too old for this graph to remember.
+        """
+        return _changes_since(self._edit_log, self.version - version)
+
+    def to_grid_graph(self) -> GridGraph:
+        """Return a GridGraph with the same tiles as this graph.
+
+        GridGraphs are much smaller, and so much cheaper to copy or send to another process.
+
+        Preconditions:
+            - this graph was built by dict_to_graph
+        """
+        return dict_to_grid_graph(self._tile_types)
+
+    @contextmanager
+    def preview_tile(self, loc: Tuple[int, int], tile_type: str) -> Iterator[WeightedGraph]:
+        """Temporarily change the tile at loc to tile_type, for checking a "what-if" edit.
+
+        The previous tile type is restored when the with-block exits.
+
+        Sample Usage:
+            with graph.preview_tile(loc, 'obstacle'):
+                still_connected = graph.connected(start_loc, goal_loc)
+        """
+        previous = self.set_tile(loc, tile_type)
+        try:
+            yield self
+        finally:
+            self.set_tile(loc, previous)
+
+
+class GridGraph:
+    """A weighted graph representing a tile map of any size, stored in compact arrays.
+
+    Every tile (x, y) is identified by the integer node id x * height + y.
+    Every node has exactly 4 edge slots, for its left, upper, lower and right neighbour in that
+    order: the weights of the edges leaving node n are _weights[4 * n:4 * n + 4], and the node id
+    at the other end of slot k is n + _deltas[k]. Since targets can be worked out, only the
+    weights are stored.
+
+    An edge touching an obstacle tile, or leading out of the map, has weight 0, which marks it as
+    absent; this way a tile can change type without reallocating the arrays.
+
+    Instance Attributes:
+        - width: The number of tile columns in the map.
+        - height: The number of tile rows in the map.
+        - version: A counter which is incremented every time a tile is changed with set_tile.
+
+    Representation Invariants:
+        - self.width > 0 and self.height > 0
+        - len(self._weights) == 4 * self.width * self.height
+    """
+    width: int
+    height: int
+    version: int
+
+    # Private Instance Attributes:
+    #     - _tile_weights: The weight of each node's tile type, indexed by node id.
+    #         0 means the tile is an obstacle (i.e. not a vertex of this graph).
+    #     - _deltas: The difference between the node ids at the two ends of each edge slot.
+    #     - _weights: The weight of each edge slot, or 0 if the edge is absent.
+    #     - _components: The connected component of every node id, used by connected.
+    #         None until connected is first called, after which it is kept up to date.
+    #     - _edit_log: The locations changed by the most recent calls to set_tile, oldest first.
+    _tile_weights: array
+    _deltas: Tuple[int, int, int, int]
+    _weights: array
+    _components: Optional[_ComponentIndex]
+    _edit_log: deque[Tuple[int, int]]
+
+    def __init__(self, width: int, height: int, tile_weights: array) -> None:
+        """Initialize a graph over a width x height lattice with the given tile weights.
+
+        The edge weights are computed with whole-array operations rather than a loop over tiles,
+        so that maps of millions of tiles are built quickly.
+
+        Preconditions:
+            - len(tile_weights) == width * height
+            - all(weight in _WEIGHT_TO_TYPE for weight in tile_weights)
+        """
+        self.width = width
+        self.height = height
+        self.version = 0
+        self._tile_weights = tile_weights
+        self._components = None
+        self._edit_log = deque(maxlen=_EDIT_LOG_SIZE)
+        self._deltas = (-height, -1, 1, height)
+        self._weights = _lattice_edge_weights(width, height, bytes(tile_weights))
+
+    def __getstate__(self) -> dict:
+        """Return the state of this graph to be pickled.
+
+        The component labels are left out, since they are larger than the graph itself and are
+        rebuilt on demand by connected.
+        """
+        state = self.__dict__.copy()
+        state['_components'] = None
+        return state
+
+    def node_id(self, item: Tuple[int, int]) -> int:
+        """Return the node id of the given grid location.
+        """
+        return item[0] * self.height + item[1]
+
+    def node_loc(self, node: int) -> Tuple[int, int]:
+        """Return the grid location of the given node id.
+        """
+        return divmod(node, self.height)
+
+    def has_vertex(self, item: Tuple[int, int]) -> bool:
+        """Return whether the given grid location is a (non-obstacle) vertex in this graph.
+        """
+        return 0 <= item[0] < self.width and 0 <= item[1] < self.height \
+            and self._tile_weights[item[0] * self.height + item[1]] != 0
+
+    def get_dimension(self) -> Tuple[int, int]:
+        """Return the (width, height) of the tile map this graph represents.
+        """
+        return (self.width, self.height)
+
+    def max_edge_weight(self) -> int:
+        """Return an upper bound on the weight of any edge in this graph.
+
+        Edge weights are always integers in a GridGraph.
+        """
+        return 2 * max(_TYPE_TO_WEIGHT.values())
+
+    def min_edge_weight(self) -> int:
+        """Return a lower bound on the weight of any edge in this graph.
+        """
+        return 2 * min(weight for weight in _TYPE_TO_WEIGHT.values() if weight != 0)
+
+    def iter_node_edges(self, node: int) -> Iterator[Tuple[int, int]]:
+        """Return an iterator of (neighbour node id, edge weight) pairs for the given node id.
+
+        The weights are read straight out of a memoryview slice of the edge weight array,
+        so no lists, sets or tuples of locations are built.
+        """
+        start = 4 * node
+        for delta, weight in zip(self._deltas, memoryview(self._weights)[start:start + 4]):
+            if weight:
+                yield node + delta, weight
+
+    def iter_edges(self, item: Tuple[int, int]) -> Iterator[Tuple[Tuple[int, int], int]]:
+        """Return an iterator of (neighbour location, edge weight) pairs for the given location.
+
+        This mirrors WeightedGraph.iter_edges, so pathfinding can use either graph directly.
+
+        Preconditions:
+            - self.has_vertex(item)
+        """
+        height = self.height
+        for target, weight in self.iter_node_edges(item[0] * height + item[1]):
+            yield divmod(target, height), weight
+
+    def get_weight(self, item1: Tuple[int, int], item2: Tuple[int, int]) -> int:
+        """Return the weight of the edge between the given locations.
+
+        Return 0 if item1 and item2 are not adjacent.
+        """
+        target = self.node_id(item2)
+        for neighbour, weight in self.iter_node_edges(self.node_id(item1)):
+            if neighbour == target:
+                return weight
+        return 0
+
+    def get_neighbours(self, item: Tuple[int, int]) -> set:
+        """Return a set of the neighbours of the given location.
+
+        Raise a ValueError if item does not appear as a vertex in this graph.
+        """
+        if self.has_vertex(item):
+            return {loc for loc, _ in self.iter_edges(item)}
+        else:
+            raise ValueError
+
+    def get_all_vertices(self) -> set:
+        """Return a set of all (non-obstacle) locations in this graph.
+        """
+        return {self.node_loc(node) for node in range(len(self._tile_weights))
+                if self._tile_weights[node] != 0}
+
+    def connected(self, item1: Tuple[int, int], item2: Tuple[int, int]) -> bool:
+        """Return whether item1 and item2 are connected vertices in this graph.
+
+        Return False if item1 or item2 do not appear as vertices in this graph.
+        """
+        if self._components is None:
+            self._components = _ComponentIndex(
+                self._neighbour_nodes,
+                (node for node in range(len(self._tile_weights)) if self._tile_weights[node]))
+
+        if self.has_vertex(item1) and self.has_vertex(item2):
+            return self._components.label(self.node_id(item1)) \
+                == self._components.label(self.node_id(item2))
         else:
             return False
 
+    def _neighbour_nodes(self, node: int) -> Iterator[int]:
+        """Return an iterator of the neighbouring node ids of the given node id.
+        """
+        return (target for target, _ in self.iter_node_edges(node))
+
+    def get_tile(self, loc: Tuple[int, int]) -> str:
+        """Return the tile type at the given grid location.
+
+        Locations outside of the map are treated as obstacles, and 'goal' tiles are reported
+        as 'normal', as in set_tile.
+        """
+        if not (0 <= loc[0] < self.width and 0 <= loc[1] < self.height):
+            return 'obstacle'
+        return _WEIGHT_TO_TYPE[self._tile_weights[self.node_id(loc)]]
+
+    def set_tile(self, loc: Tuple[int, int], tile_type: str) -> str:
+        """Change the tile at the given grid location to tile_type, and return its previous type.
+
+        Only the weights of the (at most 4) edges of loc, and their reverse edges,
+        are rewritten in place.
+
+        Since this graph only stores weights, 'goal' tiles are reported back as 'normal'.
+
+        Preconditions:
+            - self.width > loc[0] >= 0 and self.height > loc[1] >= 0
+            - tile_type in {'normal', 'slow', 'goal', 'obstacle'}
+        """
+        node = self.node_id(loc)
+        previous = _WEIGHT_TO_TYPE[self._tile_weights[node]]
+        former_neighbours = list(self._neighbour_nodes(node))
+        self._tile_weights[node] = _TYPE_TO_WEIGHT[tile_type]
+
+        tile_weights = self._tile_weights
+        in_map = (loc[0] > 0, loc[1] > 0, loc[1] < self.height - 1, loc[0] < self.width - 1)
+        for k in range(4):
+            if in_map[k]:
+                target = node + self._deltas[k]
+                if tile_weights[node] and tile_weights[target]:
+                    weight = tile_weights[node] + tile_weights[target]
+                else:
+                    weight = 0
+                self._weights[4 * node + k] = weight
+
+                # Rewrite the reverse edge (target -> node) as well, which is in the opposite slot.
+                self._weights[4 * target + 3 - k] = weight
+
+        # Keep the component labels up to date when a vertex appears or disappears.
+        if self._components is not None and (previous == 'obstacle') != (tile_type == 'obstacle'):
+            if tile_type == 'obstacle':
+                self._components.vertex_removed(node, former_neighbours)
+            else:
+                self._components.vertex_added(node)
+                for target in self._neighbour_nodes(node):
+                    self._components.edge_added(node, target)
+
+        self._edit_log.append(loc)
+        self.version += 1
+        return previous
+
+    def changes_since(self, version: int) -> Optional[set]:
+        """Return the set of locations changed by set_tile since this graph had the given version.
+
+        Return None if version is too old for this graph to remember.
+        """
+        return _changes_since(self._edit_log, self.version - version)
+
+    @contextmanager
+    def preview_tile(self, loc: Tuple[int, int], tile_type: str) -> Iterator[GridGraph]:
+        """Temporarily change the tile at loc to tile_type, for checking a "what-if" edit.
+
+        The previous tile type is restored when the with-block exits.
+        """
+        previous = self.set_tile(loc, tile_type)
+        try:
+            yield self
+        finally:
+            self.set_tile(loc, previous)
+
+
+def lattice_neighbours(loc: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Return the 4 locations above, below, left and right of loc.
+
+    Some of these may lie outside of the map.
+    """
+    return [(loc[0] - 1, loc[1]), (loc[0], loc[1] - 1), (loc[0], loc[1] + 1), (loc[0] + 1, loc[1])]
+
+
+def _changes_since(edit_log: deque[Tuple[int, int]], num_edits: int) -> Optional[set]:
+    """Return the set of locations in the last num_edits entries of edit_log,
+    or None if edit_log has fewer than num_edits entries.
+    """
+    if num_edits > len(edit_log):
+        return None
+    return {edit_log[-i] for i in range(1, num_edits + 1)}
+
+
+def _lattice_edge_weights(width: int, height: int, tile_weights: bytes) -> array:
+    """Return the edge weights of a GridGraph with the given tile weights, 4 slots per node.
+
+    Each direction is handled for every node at once. The weights of both ends of every edge are
+    packed into one byte as 8 * a + b, by adding the two byte strings as big integers (no byte
+    overflows, so there are no carries), and bytes.translate turns those into edge weights.
+    """
+    num_nodes = width * height
+    pair_weight = bytes(((code // 8 + code % 8) if code // 8 and code % 8 else 0)
+                        if code < 64 else 0 for code in range(256))
+    shifted = tile_weights.translate(bytes(min(8 * b, 255) for b in range(256)))
+
+    def edge_weights(ends1: bytes, ends2: bytes) -> bytes:
+        packed = int.from_bytes(ends1, 'little') + int.from_bytes(ends2, 'little')
+        return packed.to_bytes(len(ends1), 'little').translate(pair_weight)
+
+    # The edge leaving node n to the right is the same edge as the one leaving node n + height to
+    # the left, and likewise for down and up, so each direction pair is only computed once.
+    right = edge_weights(shifted[:-height], tile_weights[height:])
+    down = edge_weights(shifted[:-1], tile_weights[1:])
+
+    weights = bytearray(4 * num_nodes)
+    weights[4 * height::4] = right  # Left
+    weights[5::4] = down  # Up
+    weights[2:4 * (num_nodes - 1):4] = down
+    weights[3:4 * (num_nodes - height):4] = right
+
+    # The up and down slots above also joined the ends of neighbouring columns; remove those.
+    weights[1::4 * height] = bytes(width)
+    weights[4 * (height - 1) + 2::4 * height] = bytes(width)
+    return array('B', weights)
+
+
+def _grid_dimension(representation: Dict[Tuple[int, int], str]) -> Tuple[int, int]:
+    """Return the (width, height) of the smallest grid containing every location in
+    the given dictionary representation of the game map.
+    """
+    width = max(location[0] for location in representation) + 1
+    height = max(location[1] for location in representation) + 1
+    return (width, height)
+
 
 def dict_to_graph(representation: Dict[Tuple[int, int], str]) -> WeightedGraph:
     """Take a dictionary representation of the game map and convert it into a WeightedGraph.
@@ -156,10 +819,10 @@ def dict_to_graph(representation: Dict[Tuple[int, int], str]) -> WeightedGraph:
 
     This implies that blocked off path <=> start and goal locations are not connected
     """
-    DIMENSION = (16, 9)
+    dimension = _grid_dimension(representation)
 
-    graph = WeightedGraph()
-    type_to_weight = {'normal': 1, 'slow': 5, 'goal': 1, 'obstacle': 0}  # dict for weights
+    graph = WeightedGraph(representation)
+    type_to_weight = _TYPE_TO_WEIGHT  # dict for weights
 
     # First, add vertices.
     for location in representation:
@@ -167,8 +830,8 @@ def dict_to_graph(representation: Dict[Tuple[int, int], str]) -> WeightedGraph:
             graph.add_vertex(location)
 
     # Connect all vertices with adjacent ones.
-    for i in range(DIMENSION[0]):
-        for j in range(DIMENSION[1]):
+    for i in range(dimension[0]):
+        for j in range(dimension[1]):
             v0 = (i, j)
             v1 = (i + 1, j)  # vertex to the right
             v2 = (i, j + 1)  # vertex below
@@ -186,6 +849,40 @@ def dict_to_graph(representation: Dict[Tuple[int, int], str]) -> WeightedGraph:
     return graph
 
 
+def dict_to_grid_graph(representation: Dict[Tuple[int, int], str]) -> GridGraph:
+    """Take a dictionary representation of the game map and convert it into a GridGraph.
+
+    This takes the same representation as dict_to_graph and produces a graph with the same
+    vertices and edge weights, but without creating a _WeightedVertex per tile.
+
+    Locations missing from the representation are treated as obstacles.
+    """
+    width, height = _grid_dimension(representation)
+
+    tile_weights = array('B', bytes(width * height))
+    for location, tile_type in representation.items():
+        tile_weights[location[0] * height + location[1]] = _TYPE_TO_WEIGHT[tile_type]
+
+    return GridGraph(width, height, tile_weights)
+
+
+def bytes_to_grid_graph(width: int, height: int, tiles: bytes,
+                        tile_types: Tuple[str, ...]) -> GridGraph:
+    """Take a byte representation of the game map and convert it into a GridGraph.
+
+    tiles[x * height + y] is the index into tile_types of the type of the tile at (x, y), as in
+    a mapfile.MapFile. No Python object is created per tile, so this is much faster than
+    dict_to_grid_graph for large maps.
+
+    Preconditions:
+        - len(tiles) == width * height
+        - all(code < len(tile_types) for code in tiles)
+    """
+    code_to_weight = bytes(_TYPE_TO_WEIGHT[tile_type] for tile_type in tile_types)
+    tile_weights = array('B', bytes(tiles).translate(code_to_weight.ljust(256, b'\0')))
+    return GridGraph(width, height, tile_weights)
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()